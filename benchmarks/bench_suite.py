@@ -0,0 +1,248 @@
+"""
+Scaling benchmark of every Solver model over a grid of n, d, k and graph density (p, q),
+plus micro-benchmarks of generate_graph, the head/tail projection (one row, and a batch of
+rows one call each against one algo_head_tail_bisearch_batch call) and the adaptive grace
+coordinate descent. Each run is split into phases:
+    setup  - data and graph generation, conversion of A to edges
+    io     - handing X, y and the graph to MATLAB (MATLAB models only, measured on its own
+             with the transport of the Solver; it is part of the solver call)
+    solve  - the solver call minus io
+Peak RSS is the high-water mark of this process during the phase (MATLAB engines run in
+their own processes and are not included); engines are started before any timing.
+MATLAB models are skipped when the engine is not installed. Results are written as JSON
+so that runs of different commits can be compared:
+
+    python benchmarks/bench_suite.py --n 100 200 --d 500 1000 --k 20 --out bench_a.json
+    python benchmarks/bench_suite.py --compare bench_a.json bench_b.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from solver import Solver
+from solvers.adaptive_grace import _grace_setup, _grace_cd
+from solvers import signal_family as sf
+from utils.graph import generate_graph
+from utils.communication import A_to_edges, save_data, to_matlab_double, to_matlab_triplets
+from utils import matlab_engine
+
+MODELS = ["lasso", "adaptive_grace", "gfl_pqn_native", "gfl_proximal_native", "signal_family", "gfl_pqn",
+          "gfl_proximal"]
+MATLAB_MODELS = {"gfl_pqn": "pqn", "gfl_proximal": "fgfl"}
+# rows of the batched head/tail projection micro-benchmark
+_BATCH = 16
+
+
+def _reset_peak_rss():
+    # Linux >= 4.0 resets VmHWM on writing 5 to clear_refs, elsewhere the peak is cumulative
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 1024.
+
+
+def _measure(fn, reps):
+    """ min/median wall time over reps and the peak RSS of the runs, plus the last result. """
+    times = []
+    _reset_peak_rss()
+    for _ in range(reps):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return {'min_s': min(times), 'median_s': float(np.median(times)), 'peak_rss_mb': _peak_rss_mb()}, result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _setup(n, d, k, p, q, seed):
+    rng = np.random.default_rng(seed)
+    L, A = generate_graph(d, k, p, q, seed=seed)
+    X = rng.standard_normal((n, d))
+    w = np.zeros(d)
+    w[:k] = rng.choice([-1., 1.], size=k)
+    y = X @ w + 0.1 * rng.standard_normal(n)
+    edges, costs = A_to_edges(A)
+    return L, A, X, y, edges, costs
+
+
+def _io(model, X, y, L, A, transport):
+    graph = L if model == 'gfl_pqn' else A
+    if transport == 'memory':
+        return lambda: (to_matlab_double(X), to_matlab_double(y), to_matlab_triplets(graph))
+
+    def file_io():
+        with tempfile.TemporaryDirectory() as tmp:
+            save_data(X=X, y=y, **{'L' if model == 'gfl_pqn' else 'A': graph},
+                      filename=os.path.join(tmp, 'data.mat'))
+    return file_io
+
+
+def bench_models(n, d, k, p, q, models, reps, seed, transport):
+    rows = []
+    setup, (L, A, X, y, edges, costs) = _measure(lambda: _setup(n, d, k, p, q, seed), 1)
+    config = {'n': n, 'd': d, 'k': k, 'p': p, 'q': q, 'nnz_A': int(A.nnz)}
+    rows.append({'bench': 'setup', **config, **setup})
+    solver = Solver(models, transport=transport)
+    solver.n, solver.d, solver.k = n, d, k
+    for model in models:
+        row = {'bench': 'model', 'model': model, **config}
+        if model in MATLAB_MODELS and matlab_engine.matlab is None:
+            rows.append({**row, 'status': 'skipped: MATLAB engine not installed'})
+            continue
+        io = {'min_s': 0., 'median_s': 0.}
+        if model in MATLAB_MODELS:
+            io, _ = _measure(_io(model, X, y, L, A, transport), reps)
+        call, _ = _measure(lambda: solver.solver(model, X, y, k, L=L, A=A, i=0), reps)
+        rows.append({**row, 'status': 'ok', 'io_s': io['min_s'],
+                     'solve_s': max(call['min_s'] - io['min_s'], 0.),
+                     'solve_median_s': max(call['median_s'] - io['median_s'], 0.),
+                     'peak_rss_mb': call['peak_rss_mb']})
+    return rows
+
+
+def bench_micro(n, d, k, p, q, reps, seed):
+    config = {'n': n, 'd': d, 'k': k, 'p': p, 'q': q}
+    rows = []
+    gen, (_, A) = _measure(lambda: generate_graph(d, k, p, q, seed=seed), reps)
+    rows.append({'bench': 'generate_graph', **config, **gen})
+
+    edges, costs = A_to_edges(A)
+    rng = np.random.default_rng(seed)
+    x = rng.standard_normal(d)
+    prizes = x * x
+    # both are missing when sparse_module is not built
+    if getattr(sf, 'wrap_head_tail_bisearch', None) is not None:
+        legacy, _ = _measure(lambda: sf.wrap_head_tail_bisearch(
+            edges, prizes, costs, 1, -1, k, int(k * 1.05), 50, 0), reps)
+        rows.append({'bench': 'wrap_head_tail_bisearch', **config, **legacy})
+    if getattr(sf, 'Graph', None) is not None:
+        graph = sf.build_graph(edges, costs, d)
+        handle, _ = _measure(lambda: graph.head_tail_bisearch(prizes, 1, -1, k, int(k * 1.05), 50, 0), reps)
+        rows.append({'bench': 'Graph.head_tail_bisearch', **config, **handle})
+        # a batch of projections, one call per row against one call on all OpenMP threads
+        x_batch = rng.standard_normal((_BATCH, d))
+        loop, _ = _measure(lambda: [graph.head_tail_bisearch(row * row, 1, -1, k, int(k * 1.05), 50, 0)
+                                    for row in x_batch], reps)
+        rows.append({'bench': 'Graph.head_tail_bisearch loop', **config, 'rows': _BATCH, **loop})
+        batch, _ = _measure(lambda: sf.algo_head_tail_bisearch_batch(
+            graph, x_batch, 1, -1, k, int(k * 1.05), 50), reps)
+        rows.append({'bench': 'algo_head_tail_bisearch_batch', **config, 'rows': _BATCH, **batch,
+                     'speedup': loop['min_s'] / max(batch['min_s'], 1e-12)})
+
+    L, _ = generate_graph(d, k, p, q, seed=seed)
+    X = rng.standard_normal((n, d))
+    y = X[:, :k].sum(axis=1) + 0.1 * rng.standard_normal(n)
+    Xs, ys, Lstar = _grace_setup(X, y, L)
+    grace, _ = _measure(lambda: _grace_cd(Xs, ys, Lstar, 1., 1., 1000, 1e-4), reps)
+    rows.append({'bench': 'adaptive_grace_cd', **config, **grace})
+    return rows
+
+
+def compare(old_file, new_file):
+    def key(row):
+        return (row['bench'], row.get('model'), row['n'], row['d'], row['k'], row['p'], row['q'])
+
+    def seconds(row):
+        return row.get('solve_s', row.get('min_s'))
+
+    with open(old_file) as f:
+        old = {key(row): row for row in json.load(f)['results']}
+    with open(new_file) as f:
+        new = json.load(f)['results']
+    print(f"{'bench':>24} {'model':>15} {'n':>6} {'d':>6} {'k':>5} {'old [s]':>10} {'new [s]':>10} {'speedup':>8}")
+    for row in new:
+        before = old.get(key(row))
+        if before is None or seconds(row) is None or seconds(before) is None:
+            continue
+        print(f"{row['bench']:>24} {str(row.get('model', '')):>15} {row['n']:>6} {row['d']:>6} {row['k']:>5} "
+              f"{seconds(before):>10.4f} {seconds(row):>10.4f} {seconds(before) / max(seconds(row), 1e-12):>7.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n', type=int, nargs='+', default=[200])
+    parser.add_argument('--d', type=int, nargs='+', default=[500, 1000])
+    parser.add_argument('--k', type=int, nargs='+', default=[50])
+    parser.add_argument('--p', type=float, nargs='+', default=[0.95])
+    parser.add_argument('--q', type=float, nargs='+', default=[0.01])
+    parser.add_argument('--models', nargs='+', default=MODELS)
+    parser.add_argument('--reps', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--transport', choices=['memory', 'file'], default='memory')
+    parser.add_argument('--no-micro', action='store_true', help='skip the micro-benchmarks')
+    parser.add_argument('--out', default='bench_suite.json')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files and exit')
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if matlab_engine.matlab is not None:
+        for model in args.models:
+            if model in MATLAB_MODELS:
+                matlab_engine.get_engine_pool(MATLAB_MODELS[model])  # start the engines outside the timings
+
+    results = []
+    try:
+        for n, d, k, p, q in itertools.product(args.n, args.d, args.k, args.p, args.q):
+            k = min(k, d)
+            print(f"n={n} d={d} k={k} p={p} q={q}", flush=True)
+            results.extend(bench_models(n, d, k, p, q, args.models, args.reps, args.seed, args.transport))
+            if not args.no_micro:
+                results.extend(bench_micro(n, d, k, p, q, args.reps, args.seed))
+    finally:
+        matlab_engine.shutdown_engine_pools()
+
+    meta = {
+        'commit': _git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'args': vars(args),
+    }
+    with open(args.out, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=1)
+    for row in results:
+        seconds = row.get('solve_s', row.get('min_s'))
+        label = row['bench'] if row['bench'] != 'model' else row['model']
+        status = f"{seconds:10.4f} s {row.get('peak_rss_mb', float('nan')):8.1f} MB" if seconds is not None \
+            else row.get('status', '')
+        print(f"{label:>26} n={row['n']:<5} d={row['d']:<6} k={row['k']:<4} {status}")
+    print(f"wrote {args.out}")
+
+
+if __name__ == '__main__':
+    main()
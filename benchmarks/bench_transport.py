@@ -0,0 +1,100 @@
+"""
+Compare the two ways of handing X, y and L to the MATLAB solvers:
+    file   - save_data() to a .mat file, then load() on the MATLAB side
+    memory - matlab.double arrays with L in sparse triplet form
+Without the MATLAB engine only the Python-side cost is measured (the .mat round trip
+versus building the triplets).
+
+    python benchmarks/bench_transport.py --d 1000 2000 5000 --n 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import scipy.io as sio
+import scipy.sparse as sp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.graph import generate_graph
+from utils.communication import save_data, to_matlab_double, to_matlab_triplets
+
+try:
+    import matlab.engine
+except ImportError:
+    matlab = None
+
+
+def _best_of(fn, reps):
+    times = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench(n, d, k, p, q, reps, eng=None):
+    L, _ = generate_graph(d, k, p, q)
+    X = np.random.randn(n, d)
+    y = np.random.randn(n)
+    row = {'n': n, 'd': d, 'nnz_L': L.nnz}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'data.mat')
+
+        def file_transport():
+            save_data(X=X, y=y, L=L, filename=filename)
+            if eng is None:
+                sio.loadmat(filename)
+            else:
+                eng.load(filename, nargout=0)
+
+        row['file_s'] = _best_of(file_transport, reps)
+        row['file_bytes'] = os.path.getsize(filename)
+
+    if eng is None:
+        def memory_transport():
+            M = sp.coo_matrix(L)
+            return M.row + 1., M.col + 1., M.data
+        triplets = memory_transport()
+        row['memory_bytes'] = X.nbytes + y.nbytes + sum(a.nbytes for a in triplets)
+    else:
+        def memory_transport():
+            Li, Lj, Lv, dd = to_matlab_triplets(L)
+            eng.workspace['X'] = to_matlab_double(X)
+            eng.workspace['y'] = to_matlab_double(y)
+            eng.workspace['L'] = eng.sparse(Li, Lj, Lv, dd, dd)
+    row['memory_s'] = _best_of(memory_transport, reps)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n', type=int, default=200)
+    parser.add_argument('--d', type=int, nargs='+', default=[500, 1000, 2000])
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--p', type=float, default=0.95)
+    parser.add_argument('--q', type=float, default=0.01)
+    parser.add_argument('--reps', type=int, default=3)
+    parser.add_argument('--no-engine', action='store_true', help='skip MATLAB even if it is installed')
+    args = parser.parse_args()
+
+    eng = None
+    if matlab is not None and not args.no_engine:
+        eng = matlab.engine.start_matlab()
+    try:
+        print(f"{'d':>7} {'nnz(L)':>10} {'file [s]':>10} {'memory [s]':>11} {'speedup':>8}")
+        for d in args.d:
+            row = bench(args.n, d, min(args.k, d), args.p, args.q, args.reps, eng)
+            print(f"{row['d']:>7} {row['nnz_L']:>10} {row['file_s']:>10.4f} {row['memory_s']:>11.4f} "
+                  f"{row['file_s'] / row['memory_s']:>7.1f}x")
+    finally:
+        if eng is not None:
+            eng.quit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Number of PCST runs per head/tail projection of the graph-structured signal family
+methods, with the lambda bisection started from scratch (cold) and from the lambda of
+the previous iteration (warm). Needs sparse_module.so with the Graph type.
+
+    python benchmarks/bench_warm_bisearch.py --d 1000 --n 200 --epochs 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.graph import generate_graph
+from utils.communication import A_to_edges
+from solvers import signal_family as sf
+
+GRAPH_METHODS = {
+    'graph-iht': lambda X, y, x0, G, c, g, s, **kw: sf.algo_graph_iht(
+        X, y, kw['epochs'], x0, x0, 0., 1, G, c, g, s, **kw['opts']),
+    'graph-cosamp': lambda X, y, x0, G, c, g, s, **kw: sf.algo_graph_cosamp(
+        X, y, kw['epochs'], x0, x0, 0., 1, G, c, h_g=g, t_g=g, s=s, **kw['opts']),
+    'gen-mp': lambda X, y, x0, G, c, g, s, **kw: sf.algo_gen_mp(
+        X, y, 1., kw['epochs'], x0, x0, 0., 1, G, c, g, s, **kw['opts']),
+    'dmo-fw': lambda X, y, x0, G, c, g, s, **kw: sf.algo_dmo_fw(
+        X, y, 1., kw['epochs'], x0, x0, 0., 1, G, c, g, s, **kw['opts']),
+    'dmo-acc-fw': lambda X, y, x0, G, c, g, s, **kw: sf.algo_dmo_acc_fw(
+        X, y, 1., kw['epochs'], x0, x0, 0., 1, G, c, g, s, **kw['opts']),
+}
+
+
+def bench(method, X, y, G, costs, g, s, epochs, warm_start):
+    stats = {}
+    x0 = np.zeros(X.shape[1])
+    start = time.perf_counter()
+    _, x_hat, _, list_loss, _ = GRAPH_METHODS[method](
+        X, y, x0, G, costs, g, s, epochs=epochs,
+        opts=dict(warm_start=warm_start, proj_stats=stats))
+    elapsed = time.perf_counter() - start
+    runs = np.concatenate([np.asarray(v, dtype=float) for v in stats.values()])
+    return runs, list_loss[-1], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n', type=int, default=200)
+    parser.add_argument('--d', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=50)
+    parser.add_argument('--p', type=float, default=0.3)
+    parser.add_argument('--q', type=float, default=0.005)
+    parser.add_argument('--g', type=int, default=1)
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--methods', nargs='+', default=list(GRAPH_METHODS))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if sf.Graph is None:
+        sys.exit('sparse_module has no Graph type, rebuild it first.')
+
+    rng = np.random.default_rng(args.seed)
+    _, A = generate_graph(args.d, args.k, args.p, args.q, seed=args.seed)
+    edges, costs = A_to_edges(A)
+    G = sf.build_graph(edges, costs, args.d)
+    X = rng.standard_normal((args.n, args.d)) / np.sqrt(args.n)
+    w = np.zeros(args.d)
+    w[:args.k] = rng.choice([-1., 1.], size=args.k) / np.sqrt(args.k)
+    y = X @ w + 0.01 * rng.standard_normal(args.n)
+
+    print(f"{'method':>12} {'projections':>12} {'pcst cold':>10} {'pcst warm':>10} "
+          f"{'saved/proj':>11} {'time cold':>10} {'time warm':>10} {'loss cold':>10} {'loss warm':>10}")
+    for method in args.methods:
+        cold, loss_cold, t_cold = bench(method, X, y, G, costs, args.g, args.k, args.epochs, False)
+        warm, loss_warm, t_warm = bench(method, X, y, G, costs, args.g, args.k, args.epochs, True)
+        print(f"{method:>12} {len(warm):>12} {cold.mean():>10.2f} {warm.mean():>10.2f} "
+              f"{cold.mean() - warm.mean():>11.2f} {t_cold:>10.3f} {t_warm:>10.3f} "
+              f"{loss_cold:>10.2e} {loss_warm:>10.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import hashlib
 import numpy as np
 import os, random, sys
 from collections import defaultdict
@@ -6,10 +7,30 @@ from abc import ABC, abstractmethod
 from solver import Solver
 from utils.graph import generate_graph 
 from utils.omse import compute_omse
+from utils.metrics import support_metrics
+from utils.parallel import run_replications, current_seed
+from utils.dataset_store import DatasetStore
+
+
+def _config_value(name, value):
+    # an attribute as part of the store key; arrays by a hash of their contents
+    if value is None or isinstance(value, (int, float, str, bool, np.number)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [_config_value(name, v) for v in value]
+    if isinstance(value, np.ndarray):
+        digest = hashlib.blake2b(np.ascontiguousarray(value).tobytes(), digest_size=16).hexdigest()
+        return {"dtype": str(value.dtype), "shape": list(value.shape), "blake2b": digest}
+    raise TypeError(f"attribute {name!r} of type {type(value).__name__} cannot be part of the "
+                    f"key of the dataset store, use scalars, sequences or numpy arrays")
+
+
 class RandomEnsemble(ABC):
-    def __init__(self, n, d, k, gamma, p=0.95, q=0.01):
+    def __init__(self, n, d, k, gamma, p=0.95, q=0.01, store=None):
         self.n , self.d, self.k, self.gamma = n, d, k, gamma
         self.p, self.q = p, q
+        # DatasetStore (or its directory) that keeps the data of seeded replications on disk
+        self.store = DatasetStore(store) if isinstance(store, (str, os.PathLike)) else store
 
     @abstractmethod
     def _generate_X(self):
@@ -28,7 +49,19 @@ class RandomEnsemble(ABC):
     def _generate_graph(self):
         return generate_graph(self.d, self.k, self.p, self.q)
     
+    def _config(self):
+        # everything the generated data depends on besides the seed
+        config = {name: _config_value(name, value) for name, value in vars(self).items() if name != "store"}
+        return {"class": type(self).__name__, **config}
+
     def _generate_data(self):
+        # seeded replications are read from the store (memory-mapped) once they are in it
+        seed = current_seed()
+        if self.store is not None and seed is not None:
+            return self.store.get(self._config(), seed, self._generate_new_data)
+        return self._generate_new_data()
+
+    def _generate_new_data(self):
         L, A = self._generate_graph()
         w = self._generate_w()
         X = self._generate_X()
@@ -36,12 +69,8 @@ class RandomEnsemble(ABC):
         return L, w, X, y, A
 
     def _recovery_accuracy(self, u):
-        # evaluate the support recovery accuracy
-        selected_features_true = np.arange(self.k)
-        selected_features_pred = np.argsort(np.abs(u))[-self.k:] 
-        correct_pred = np.intersect1d(selected_features_true, selected_features_pred)
-        accuracy = len(correct_pred) / self.k
-        return accuracy
+        # evaluate the support recovery accuracy, u may be a stack of shape (..., d)
+        return support_metrics(u, self.k)["recovery"]
     
     def _report(self, model_accuracy):
         for model, accuracy in model_accuracy.items():
@@ -49,44 +78,79 @@ class RandomEnsemble(ABC):
             std_accuracy = np.std(accuracy)
             print(f"Model: {model}, Avg. Accuracy: {avg_accuracy}, Std. Accuracy: {std_accuracy}")
 
+    def _collect(self, replications, num_replications):
+        # stream results as replications finish, return them in replication order
+        results, failed = {}, []
+        for i, result, error in replications:
+            if error is not None:
+                failed.append(i)
+                print(f"Replication {i+1} failed: {error!r}")
+                continue
+            results[i] = result
+            print(f"Replication {i+1} completed.")
+        if failed:
+            print(f"{len(failed)} of {num_replications} replications failed: {sorted(failed)}")
+        return [results[i] for i in sorted(results)]
+
+    def _runtime_replication(self, i, models):
+        L, w, X, y, A = self._generate_data()
+        single_runtimes = {}
+        for model in models:
+            solver = Solver(models=[model])
+            single_runtimes[model] = solver._single_runtime(model, X, y, self.k, L=L, A=A, i=i)
+        return single_runtimes
+
     def runtime(self, num_replications=10,
-                models=["gfl_pqn", "gfl_proximal", "lasso", "adaptive_grace", "signal_family"]):          
+                models=["gfl_pqn", "gfl_proximal", "lasso", "adaptive_grace", "signal_family"],
+                n_jobs=1, seed=None, blas_threads=1):          
+        # see utils.parallel.run_replications for n_jobs, seed and blas_threads
         runtime_results = {model: [] for model in models}  # Store runtimes
-
-        for i in range(num_replications):
-            L, w, X, y, A = self._generate_data()
-            
-            for model in models:
-                solver = Solver(models=[model])
-                single_runtime = solver._single_runtime(model, X, y, self.k, L=L, A=A, i=i)
-                runtime_results[model].append(single_runtime)          
-            print(f"Replication {i+1} completed.")
+        replications = run_replications(self._runtime_replication, num_replications, args=(models,),
+                                        n_jobs=n_jobs, seed=seed, blas_threads=blas_threads)
+        for single_runtimes in self._collect(replications, num_replications):
+            for model, single_runtime in single_runtimes.items():
+                runtime_results[model].append(single_runtime)
 
         # compute mean and standard deviation for each method
         runtime_summary = {model: (np.mean(times), np.std(times)) for model, times in runtime_results.items()}
         return runtime_summary
 
-    def out_of_sample(self, k_values=np.arange(30, 100, 10), num_replications=10, model="gfl_pqn"):
+    def _out_of_sample_replication(self, i, k_values, num_replications, model):
+        L, w, X, y, A = self._generate_data()
+        return compute_omse(X, y, w, L, A, model, k_values, i, num_replications)
+
+    def out_of_sample(self, k_values=np.arange(30, 100, 10), num_replications=10, model="gfl_pqn",
+                      n_jobs=1, seed=None, blas_threads=1):
         # out-of-sample MSE for proposed method
         mse_results = defaultdict(list)
-        for i in range(num_replications):
-            L, w, X, y, A = self._generate_data()
-            omse = compute_omse(X, y, w, L, A, model, k_values, i, num_replications)
+        replications = run_replications(self._out_of_sample_replication, num_replications,
+                                        args=(k_values, num_replications, model),
+                                        n_jobs=n_jobs, seed=seed, blas_threads=blas_threads)
+        for omse in self._collect(replications, num_replications):
             for k in k_values:
                 mse_results[k].append(omse[k])
 
         return mse_results
     
+    def _run_replication(self, i, models):
+        L, w, X, y, A = self._generate_data()
+        solver = Solver(models=models)
+        return solver.fit(X, y, L, A, k=self.k, i=i, verbose=1)
 
-    def run(self, num_replications=10, models=["gfl_pqn", "gfl_proximal", "lasso", "adaptive_grace", "signal_family"]):
+    def run(self, num_replications=10, models=["gfl_pqn", "gfl_proximal", "lasso", "adaptive_grace", "signal_family"],
+            n_jobs=1, seed=None, blas_threads=1):
+        # n_jobs > 1 runs the replications on a process pool, see utils.parallel.run_replications
         model_accuracy = defaultdict(list)
-        solver = Solver(models=models)
-        for i in range(num_replications):
-            L, w, X, y, A = self._generate_data()
-            results = solver.fit(X, y, L, A, k=self.k, i=i, verbose=1)
-            for model, u in results.items():
-                accuracy = self._recovery_accuracy(u)
-                model_accuracy[model].append(accuracy)
+        replications = run_replications(self._run_replication, num_replications, args=(models,),
+                                        n_jobs=n_jobs, seed=seed, blas_threads=blas_threads)
+        results = self._collect(replications, num_replications)
+        if results:
+            # (replications x models x d), scored in one pass; signal_family expands to its methods
+            names = list(results[0].keys())
+            coefs = np.stack([[np.ravel(result[model]) for model in names] for result in results])
+            accuracy = self._recovery_accuracy(coefs)
+            for j, model in enumerate(names):
+                model_accuracy[model] = list(accuracy[:, j])
         
         self._report(model_accuracy)
         return model_accuracy
@@ -3,18 +3,24 @@ import os, time, sys
 import numpy as np
 from collections import defaultdict
 
-from solvers.adaptive_grace import adaptive_grace
-from solvers.lasso import lasso
+from solvers.adaptive_grace import adaptive_grace, adaptive_grace_path
+from solvers.lasso import lasso, lasso_path
 from solvers.gfl_pqn import gfl_pqn
+from solvers.gfl_pqn_native import gfl_pqn_native, gfl_pqn_native_path
 from solvers.gfl_proximal import gfl_proximal
 from utils.communication import A_to_edges
+from utils.graph import get_graph
 
 # need to import the sparse_module.so in ./src/
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
-from solvers.signal_family import sparse_learning_solver
+from solvers.signal_family import sparse_learning_solver, sparse_learning_path
+from solvers.gfl_proximal_native import gfl_proximal_native, gfl_proximal_native_path
 
 class Solver:    
-    def __init__(self, models, c=1):   
+    # models whose fit depends on the sparsity level k
+    K_MODELS = ("gfl_pqn", "gfl_pqn_native", "signal_family")
+
+    def __init__(self, models, c=1, transport="memory", recorder=None, warm_start=False):
         
         self.res = defaultdict(list)
         self.models = models
@@ -22,6 +28,9 @@ class Solver:
         self.d = None
         self.k = None
         self.c = c
+        self.transport = transport # how data reaches the MATLAB solvers: "memory" or "file"
+        self.recorder = recorder # utils.trace.TraceRecorder that gets a trace of every fit, or None
+        self.warm_start = warm_start # warm-start the lambda bisection of the signal family projections (changes their estimates)
         self.datafile = os.path.abspath('./data/data_gfl/')
         self.resultfile = os.path.abspath('./data/result_gfl/') 
         self.datafile_pqn = os.path.abspath('./data/data_PQN/')
@@ -36,24 +45,35 @@ class Solver:
         if not os.path.exists(resultfile):
             os.makedirs(resultfile)
 
-    def _solver_lasso(self, X, y, alpha=0.1):
-        return lasso(X, y, alpha=alpha)
+    def _solver_lasso(self, X, y, alpha=0.1, trace=None):
+        return lasso(X, y, alpha=alpha, trace=trace)
 
-    def _solver_adaptive_grace(self, X, y, W, lambda1=1.0, lambda2=1.0, max_iter=1000, tol=1e-4):
-        return adaptive_grace(X, y, W, lambda1=lambda1, lambda2=lambda2, max_iter=max_iter, tol=tol)
+    def _solver_adaptive_grace(self, X, y, W, lambda1=1.0, lambda2=1.0, max_iter=1000, tol=1e-4, trace=None):
+        return adaptive_grace(X, y, W, lambda1=lambda1, lambda2=lambda2, max_iter=max_iter, tol=tol, trace=trace)
     
-    def _solver_gfl_proximal(self, X, y, A, i, rho1=0.5, rho2=0.5):
-        return gfl_proximal(X, y, A, i, datafile=self.datafile, resultfile=self.resultfile, rho1=rho1, rho2=rho2)
+    def _solver_gfl_proximal(self, X, y, A, i, rho1=0.5, rho2=0.5, trace=None):
+        return gfl_proximal(X, y, A, i, datafile=self.datafile, resultfile=self.resultfile, rho1=rho1, rho2=rho2, transport=self.transport, trace=trace)
     
-    def _solver_gfl_pqn(self, X, y, L, i, k, rho=None, mu=0.01):
+    def _solver_gfl_proximal_native(self, X, y, A, rho1=0.5, rho2=0.5, trace=None):
+        return gfl_proximal_native(X, y, A, rho1=rho1, rho2=rho2, trace=trace)
+
+    def _solver_gfl_pqn(self, X, y, L, i, k, rho=None, mu=0.01, trace=None):
         if rho is None:
-            return gfl_pqn(X, y, L, i, rho=np.sqrt(self.n), mu=mu, k=k, datafile=self.datafile_pqn, resultfile=self.resultfile_pqn)
+            return gfl_pqn(X, y, L, i, rho=np.sqrt(self.n), mu=mu, k=k, datafile=self.datafile_pqn, resultfile=self.resultfile_pqn, transport=self.transport, trace=trace)
         else:
-            return gfl_pqn(X, y, L, i, rho=rho, mu=mu, k=k, datafile=self.datafile_pqn, resultfile=self.resultfile_pqn)
+            return gfl_pqn(X, y, L, i, rho=rho, mu=mu, k=k, datafile=self.datafile_pqn, resultfile=self.resultfile_pqn, transport=self.transport, trace=trace)
+
+    def _solver_gfl_pqn_native(self, X, y, L, k, rho=None, mu=0.01, trace=None):
+        if rho is None:
+            rho = np.sqrt(self.n)
+        return gfl_pqn_native(X, y, L, k, rho=rho, mu=mu, trace=trace)
 
-    def _solver_signal_family(self, X, y, i, s, c=1, g=1, max_epochs=50, tol_algo=1e-20, step=1, edges=None, costs=None,):
+    def _solver_signal_family(self, X, y, i, s, c=1, g=1, max_epochs=50, tol_algo=1e-20, step=1, edges=None, costs=None,
+                              methods=None, n_jobs=1, gradient='auto', stopping=None, recorder=None, warm_start=False):
         # s is the number of sparsity level, w is x_star in their codecase, gamma=0.5 control the noise
-        return sparse_learning_solver((i, X, y, edges, costs, s, g, max_epochs, tol_algo, step, c))
+        return sparse_learning_solver((i, X, y, edges, costs, s, g, max_epochs, tol_algo, step, c),
+                                      methods=methods, n_jobs=n_jobs, gradient=gradient,
+                                      stopping=stopping, recorder=recorder, warm_start=warm_start)
    
 
     def _single_runtime(self, model, X, y, k, c=1, L=None, A=None, i=None, rho=15.0, mu=0.1, rho1=0.5, rho2=0.5):
@@ -63,20 +83,40 @@ class Solver:
         return end_time - start_time
 
 
+    @staticmethod
+    def _graph_matrices(L, A):
+        # either of L and A may be None, it is then derived (sparse, cached) from the other
+        if L is None and A is not None:
+            L = get_graph(A).laplacian
+        elif A is None and L is not None:
+            A = get_graph(L, laplacian=True).adjacency
+        return L, A
+
+    def _trace(self, model, **meta):
+        if self.recorder is None:
+            return None
+        return self.recorder.trace(model, **meta)
+
     def solver(self, model, X, y, k, c=1, L=None, A=None, i=None, rho=15.0, mu=0.1, rho1=0.5, rho2=0.5):
+        L, A = self._graph_matrices(L, A)
         if model == "lasso":
-            return self._solver_lasso(X, y)
+            return self._solver_lasso(X, y, trace=self._trace(model, trial=i, k=k))
         elif model == "adaptive_grace":
-            return self._solver_adaptive_grace(X, y, L)
+            return self._solver_adaptive_grace(X, y, L, trace=self._trace(model, trial=i, k=k))
         elif model == "gfl_proximal":
-            return self._solver_gfl_proximal(X, y, A, i, rho1=rho1, rho2=rho2)
+            return self._solver_gfl_proximal(X, y, A, i, rho1=rho1, rho2=rho2, trace=self._trace(model, trial=i, k=k))
+        elif model == "gfl_proximal_native":
+            return self._solver_gfl_proximal_native(X, y, A, rho1=rho1, rho2=rho2, trace=self._trace(model, trial=i, k=k))
         elif model == "gfl_pqn":
-            return self._solver_gfl_pqn(X, y, L, i, k, rho=rho, mu=mu)
+            return self._solver_gfl_pqn(X, y, L, i, k, rho=rho, mu=mu, trace=self._trace(model, trial=i, k=k))
+        elif model == "gfl_pqn_native":
+            return self._solver_gfl_pqn_native(X, y, L, k, rho=rho, mu=mu, trace=self._trace(model, trial=i, k=k))
         elif model == "signal_family":
             edges, costs = A_to_edges(A)
-            return self._solver_signal_family(X, y, i=i, s=k, c=c, edges=edges, costs=costs)
+            return self._solver_signal_family(X, y, i=i, s=k, c=c, edges=edges, costs=costs, recorder=self.recorder,
+                                              warm_start=self.warm_start)
         else:   
-            raise ValueError(f"Unknown model: {model}. Supported models are: lasso, adaptive_grace, gfl_proximal, gfl_pqn, signal_family.")
+            raise ValueError(f"Unknown model: {model}. Supported models are: lasso, adaptive_grace, gfl_proximal, gfl_proximal_native, gfl_pqn, gfl_pqn_native, signal_family.")
         
 
     def fit(self, X, y, L, A, k, i=None, verbose=False):
@@ -99,3 +139,42 @@ class Solver:
 
         return self.res
 
+
+    def fit_path(self, X, y, L, A, grid, i=None, rho=15.0, mu=0.1, rho1=0.5, rho2=0.5, verbose=False):
+        """
+        Solve every model along a regularization grid in a single call. The grid holds
+        alpha for lasso, lambda1 for adaptive_grace, rho1 for gfl_proximal(_native) and the
+        sparsity level k for the models in K_MODELS. Points are visited from the most to the
+        least regularized and warm-started from the previous solution where the solver allows
+        it (lasso, adaptive_grace, gfl_pqn_native, gfl_proximal_native, signal_family); the
+        MATLAB models are refit at every point.
+        Returns {model (or signal family method): array of shape (len(grid), d)} in grid order.
+        """
+        self.n, self.d = X.shape
+        L, A = self._graph_matrices(L, A)
+        paths = {}
+        for model in self.models:
+            if verbose:
+                print(f"Running {model} path")
+            if model == "lasso":
+                paths[model] = lasso_path(X, y, grid)
+            elif model == "adaptive_grace":
+                paths[model] = adaptive_grace_path(X, y, L, grid)
+            elif model == "gfl_pqn_native":
+                paths[model] = gfl_pqn_native_path(X, y, L, grid, rho=rho, mu=mu)
+            elif model == "gfl_proximal_native":
+                paths[model] = gfl_proximal_native_path(X, y, A, grid, rho2=rho2)
+            elif model == "signal_family":
+                edges, costs = A_to_edges(A)
+                _, results = sparse_learning_path((i, X, y, edges, costs, grid, 1, 50, 1e-20, 1, self.c),
+                                                  warm_start=self.warm_start)
+                paths.update(results)
+            elif model == "gfl_pqn":
+                paths[model] = np.array([self.solver(model, X, y, k, L=L, A=A, i=i, rho=rho, mu=mu) for k in grid])
+            elif model == "gfl_proximal":
+                paths[model] = np.array([self.solver(model, X, y, self.k, L=L, A=A, i=i, rho1=g, rho2=rho2) for g in grid])
+            else:
+                raise ValueError(f"Unknown model: {model}. Supported models are: lasso, adaptive_grace, gfl_proximal, gfl_proximal_native, gfl_pqn, gfl_pqn_native, signal_family.")
+
+        return paths
+
@@ -1,7 +1,44 @@
 import numpy as np
+import scipy.sparse as sp
 from sklearn.linear_model import LinearRegression, ElasticNetCV
 
-def adaptive_grace(X, y, W, lambda1=1.0, lambda2=1.0, max_iter=1000, tol=1e-4):
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the kernel then runs as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+# sweeps over the nonzero coordinates between two full passes of the coordinate descent;
+# max_iter bounds the full passes, so a fit does at most max_iter * (1 + this) sweeps
+MAX_ACTIVE_SWEEPS = 100
+
+
+def adaptive_grace(X, y, W, lambda1=1.0, lambda2=1.0, max_iter=1000, tol=1e-4, trace=None):
+    # trace (utils.trace.Trace) records the least-squares loss after every full pass
+    X, y, Lstar = _grace_setup(X, y, W)
+    return _grace_cd(X, y, Lstar, lambda1, lambda2, max_iter, tol, trace=trace)
+
+
+def adaptive_grace_path(X, y, W, lambda1s, lambda2=1.0, max_iter=1000, tol=1e-4):
+    """
+    Solve adaptive grace for every lambda1 in `lambda1s`, from the largest to the smallest.
+    The standardization, initial estimate and Lstar are computed once and each fit is
+    warm-started from the previous solution.
+    Returns the coefficients with shape (len(lambda1s), p) in the order of `lambda1s`.
+    """
+    lambda1s = np.asarray(lambda1s, dtype=np.float64)
+    X, y, Lstar = _grace_setup(X, y, W)
+    path = np.zeros((len(lambda1s), X.shape[1]))
+    beta = None
+    for idx in np.argsort(-lambda1s):
+        beta = _grace_cd(X, y, Lstar, lambda1s[idx], lambda2, max_iter, tol, beta0=beta)
+        path[idx] = beta
+    return path
+
+
+def _grace_setup(X, y, W):
     # Standardize X and center y
     n, p = X.shape
     X_mean = X.mean(axis=0)
@@ -21,62 +58,89 @@ def adaptive_grace(X, y, W, lambda1=1.0, lambda2=1.0, max_iter=1000, tol=1e-4):
         enet.fit(X, y)
         beta_tilde = enet.coef_
 
-    # Construct modified Laplacian matrix Lstar
-    d = W.sum(axis=1).A1 if hasattr(W, 'A1') else W.sum(axis=1)  # handle sparse matrices
-    Lstar = np.zeros((p, p))
-    rows, cols = W.nonzero()
-    for i in range(len(rows)):
-        u, v = rows[i], cols[i]
-        if u >= v:
-            continue  # process each edge once
-        if d[u] == 0 or d[v] == 0:
-            Lstar[u, v] = Lstar[v, u] = 0
-        else:
-            sign_u = np.sign(beta_tilde[u]) if beta_tilde[u] != 0 else 0
-            sign_v = np.sign(beta_tilde[v]) if beta_tilde[v] != 0 else 0
-            weight = W[u, v] if isinstance(W, np.ndarray) else W.data[i]
-            Lstar_uv = -sign_u * sign_v * weight / np.sqrt(d[u] * d[v])
-            Lstar[u, v] = Lstar_uv
-            Lstar[v, u] = Lstar_uv
-    np.fill_diagonal(Lstar, 1 * (d > 0))  # set diagonal to 1 if degree > 0
-
-    # Precompute adjacency list
-    adjacency_list = [[] for _ in range(p)]
-    for u, v in zip(rows, cols):
-        if u != v:
-            adjacency_list[u].append(v)
+    # Construct modified Laplacian matrix Lstar (off-diagonal part, CSR)
+    Lstar = _modified_laplacian(W, beta_tilde)
+    X = np.asfortranarray(X)  # contiguous columns for the kernel
+    return X, y, Lstar
+
+
+def _grace_cd(X, y, Lstar, lambda1, lambda2, max_iter, tol, beta0=None, trace=None):
+    n, p = X.shape
 
     # Initialize beta and residual
-    beta = np.zeros(p)
-    residual = y.copy()
-    prev_beta = np.inf * np.ones(p)
+    if beta0 is None:
+        beta = np.zeros(p)
+        residual = y.copy()
+    else:
+        beta = np.array(beta0, dtype=np.float64)
+        residual = y - X @ beta
+    all_coords = np.arange(p)
     iter = 0
+    if trace is not None:
+        trace.start()
 
-    # Coordinate descent
-    while iter < max_iter and np.linalg.norm(beta - prev_beta) > tol:
-        prev_beta = beta.copy()
-        for u in range(p):
-            xu = X[:, u]
-            current_beta_u = beta[u]
-
-            # Compute xuTr and neighbor_sum
-            xuTr = xu @ residual
-            xuTr_plus = xuTr + n * current_beta_u  # since xu.T @ xu = n
-
-            neighbor_sum = 0
-            for v in adjacency_list[u]:
-                neighbor_sum += Lstar[u, v] * beta[v]
-
-            # Update beta_u
-            z = (xuTr_plus - lambda2 * neighbor_sum) / (n + lambda2)
-            threshold = lambda1 / (2 * (n + lambda2))
-            beta_u_new = np.sign(z) * max(abs(z) - threshold, 0)
-
-            # Update residual and beta
-            delta = beta_u_new - current_beta_u
-            residual -= xu * delta
-            beta[u] = beta_u_new
-
+    # Coordinate descent: a full pass, then sweeps over the nonzero coordinates only
+    # until they settle, then another full pass to check the other coordinates.
+    while iter < max_iter:
+        change = _cd_sweep(X, residual, beta, Lstar.indptr, Lstar.indices, Lstar.data,
+                           all_coords, n, lambda1, lambda2)
         iter += 1
+        if trace is not None:
+            trace.record(np.dot(residual, residual) / 2., beta)
+        if np.sqrt(change) <= tol:
+            break
+        active = np.flatnonzero(beta)
+        for _ in range(MAX_ACTIVE_SWEEPS):  # only full passes count towards max_iter
+            change = _cd_sweep(X, residual, beta, Lstar.indptr, Lstar.indices, Lstar.data,
+                               active, n, lambda1, lambda2)
+            if np.sqrt(change) <= tol:
+                break
+
+    return beta
+
+
+def _modified_laplacian(W, beta_tilde):
+    # Lstar[u, v] = -sign(b_u) sign(b_v) w_uv / sqrt(d_u d_v) for each edge u < v, mirrored.
+    # The unit diagonal is implicit in the (n + lambda2) denominator of the update.
+    W = sp.csr_matrix(W)
+    p = W.shape[0]
+    d = np.ravel(W.sum(axis=1))
+    W = W.tocoo()
+    upper = W.row < W.col  # process each edge once
+    u, v, weight = W.row[upper], W.col[upper], W.data[upper]
+    keep = (d[u] != 0) & (d[v] != 0)
+    u, v, weight = u[keep], v[keep], weight[keep]
+    sign = np.sign(beta_tilde)
+    vals = -sign[u] * sign[v] * weight / np.sqrt(d[u] * d[v])
+    Lstar = sp.csr_matrix((np.concatenate((vals, vals)), (np.concatenate((u, v)), np.concatenate((v, u)))),
+                          shape=(p, p))
+    Lstar.eliminate_zeros()
+    return Lstar
 
-    return beta
\ No newline at end of file
+
+@njit(cache=True)
+def _cd_sweep(X, residual, beta, indptr, indices, data, coords, n, lambda1, lambda2):
+    # one coordinate descent pass over coords, updating beta and residual in place;
+    # returns the squared norm of the change in beta
+    denom = n + lambda2
+    threshold = lambda1 / (2 * denom)
+    change = 0.
+    for u in coords:
+        xu = X[:, u]
+        current_beta_u = beta[u]
+        xuTr_plus = np.dot(xu, residual) + n * current_beta_u  # since xu.T @ xu = n
+
+        neighbor_sum = 0.
+        for jj in range(indptr[u], indptr[u + 1]):
+            neighbor_sum += data[jj] * beta[indices[jj]]
+
+        z = (xuTr_plus - lambda2 * neighbor_sum) / denom
+        beta_u_new = np.sign(z) * max(abs(z) - threshold, 0.)
+
+        delta = beta_u_new - current_beta_u
+        if delta != 0.:
+            for r in range(n):  # in place, no temporary n-vector per update
+                residual[r] -= xu[r] * delta
+            beta[u] = beta_u_new
+            change += delta * delta
+    return change
@@ -1,22 +1,32 @@
-import matlab.engine
-import os
-from utils.communication import save_data, read_result
+import numpy as np
+from utils.communication import save_data, read_result, to_matlab_double, to_matlab_triplets, exchange_files
+from utils.matlab_engine import get_engine_pool
 
 def call_matlab(datafile, resultfile, rho, mu, k=None):
-    eng = matlab.engine.start_matlab()
-    try:
-        eng.cd(os.path.abspath('./src/PQN/'))
-        eng.addpath(os.path.abspath('./src/PQN/'))
-        eng.addpath(eng.genpath(os.path.abspath('./src/PQN/')))
-        eng.addpath(eng.genpath(os.path.abspath('./src/PQN/minConF/')))
-        eng.gfl_pqn(datafile, resultfile, rho, mu, float(k), nargout=0)
-    finally:
-        eng.quit()
+    # engines in the pool already have src/PQN/ on their path
+    get_engine_pool('pqn').call('gfl_pqn', datafile, resultfile, rho, mu, float(k), nargout=0)
 
-def gfl_pqn(X, y, L, i, k=None, rho=None, mu=0.01, datafile=None, resultfile=None):
-    datafile_name = os.path.join(datafile, f'data_{i}.mat')
-    resultfile_name = os.path.join(resultfile, f'result_{i}.mat')
-    save_data(X=X, y=y, L=L, filename=datafile_name)
-    call_matlab(datafile_name, resultfile_name, rho, mu, k)
-    u, _ = read_result(resultfile_name)
-    return u.flatten()
\ No newline at end of file
+def call_matlab_inmem(X, y, L, rho, mu, k=None):
+    args = (to_matlab_double(X), to_matlab_double(y), *to_matlab_triplets(L))
+    beta, funcVal = get_engine_pool('pqn').call('gfl_pqn_inmem', *args, float(rho), float(mu), float(k), nargout=2)
+    return np.array(beta, dtype=np.float64), np.array(funcVal, dtype=np.float64)
+
+def gfl_pqn(X, y, L, i, k=None, rho=None, mu=0.01, datafile=None, resultfile=None, transport='memory', trace=None):
+    # transport='memory' passes X, y and L (as triplets) to the engine directly,
+    # 'file' goes through a pair of .mat files unique to the call and is used as the fallback
+    if transport == 'memory':
+        try:
+            u, funcVal = call_matlab_inmem(X, y, L, rho, mu, k)
+        except (TypeError, ValueError):
+            pass
+        else:
+            if trace is not None:
+                trace.extend(funcVal)
+            return u.flatten()
+    with exchange_files(datafile, resultfile, i) as (datafile_name, resultfile_name):
+        save_data(X=X, y=y, L=L, filename=datafile_name)
+        call_matlab(datafile_name, resultfile_name, rho, mu, k)
+        u, funcVal = read_result(resultfile_name)
+    if trace is not None:
+        trace.extend(funcVal)
+    return u.flatten()
@@ -0,0 +1,153 @@
+import numpy as np
+from scipy.linalg import solve, cho_factor, cho_solve
+from solvers.minconf import min_conf_pqn
+
+
+def generalized_fused_lasso(u, X, y, rho, L, mu):
+    """
+    Objective and gradient of the Boolean relaxation (GeneralizedFusedLasso in gfl_pqn.m):
+        f(u) = 1/2 y' inv((1/rho) X D_u X' + I) y + mu u' L u
+    Use GFLObjective directly to keep the cached quantities across calls.
+    """
+    return GFLObjective(X, y, rho, L, mu)(u)
+
+
+class GFLObjective:
+    """
+    Objective/gradient engine for the Boolean relaxation that never forms an explicit inverse.
+    With S = supp(u) and B = X_S D_u^{1/2}, M y is computed either by
+      - 'cholesky': factoring the n x n matrix I + (1/rho) B B', or
+      - 'woodbury': M y = y - B (rho I + B'B)^{-1} B'y, factoring an |S| x |S| matrix,
+    whichever is smaller. X'y, y'y and the squared row norms of X' are cached.
+    """
+    def __init__(self, X, y, rho, L, mu):
+        self.X = np.asarray(X, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64).ravel()
+        self.rho, self.L, self.mu = rho, L, mu
+        self.n, self.d = self.X.shape
+        self.xty = self.X.T @ self.y
+        self.yty = self.y @ self.y
+        self.col_sq_norms = np.einsum('ij,ij->j', self.X, self.X)
+        self.route = None
+        self._last_u = None
+        self._last_fg = None
+
+    def _loss_terms(self, u):
+        # returns (1/2) y'My and X'My
+        S = np.flatnonzero(u)
+        if len(S) == 0:
+            self.route = 'empty'
+            return 0.5 * self.yty, self.xty
+        uS = u[S]
+        if np.any(uS < 0):  # outside the feasible set, M is not guaranteed to be PD
+            self.route = 'dense'
+            XS = self.X[:, S]
+            K = (XS * uS) @ XS.T / self.rho
+            K[np.diag_indices(self.n)] += 1.
+            z = solve(K, self.y)
+            return 0.5 * (self.y @ z), self.X.T @ z
+        sqrt_u = np.sqrt(uS)
+        B = self.X[:, S] * sqrt_u
+        if len(S) < self.n:
+            self.route = 'woodbury'
+            C = B.T @ B
+            C[np.diag_indices(len(S))] = uS * self.col_sq_norms[S] + self.rho
+            bty = sqrt_u * self.xty[S]
+            w = cho_solve(cho_factor(C, lower=True, check_finite=False), bty, check_finite=False)
+            xtz = self.xty - self.X.T @ (B @ w)
+            return 0.5 * (self.yty - bty @ w), xtz
+        self.route = 'cholesky'
+        K = B @ B.T / self.rho
+        K[np.diag_indices(self.n)] += 1.
+        z = cho_solve(cho_factor(K, lower=True, check_finite=False), self.y, check_finite=False)
+        return 0.5 * (self.y @ z), self.X.T @ z
+
+    def __call__(self, u):
+        if self._last_u is not None and np.array_equal(u, self._last_u):
+            return self._last_fg
+        f_loss, xtz = self._loss_terms(u)
+        Lu = self.L @ u
+        f = f_loss + self.mu * (u @ Lu)
+        g = -(1. / (2. * self.rho)) * xtz ** 2 + 2. * self.mu * Lu
+        self._last_u = np.array(u, copy=True)
+        self._last_fg = (f, g)
+        return f, g
+
+
+def proj_capped_simplex(u, k):
+    """
+    Exact Euclidean projection onto {0 <= u <= 1, sum(u) <= k}.
+    The solution is clip(u - tau, 0, 1) where tau >= 0 is found by sorting the
+    breakpoints of the piecewise linear map tau -> sum(clip(u - tau, 0, 1)).
+    """
+    x = np.clip(u, 0., 1.)
+    if x.sum() <= k:
+        return x
+    if k <= 0:
+        return np.zeros_like(x)
+
+    d = len(u)
+    us = np.sort(u)
+    csum = np.concatenate(([0.], np.cumsum(us)))
+
+    def capped_sum(tau):
+        lo = np.searchsorted(us, tau, side='right')
+        hi = np.searchsorted(us, tau + 1., side='left')
+        return (d - hi) + (csum[hi] - csum[lo]) - (hi - lo) * tau
+
+    bp = np.concatenate(([0.], us, us - 1.))
+    bp = np.unique(bp[bp >= 0.])
+    vals = capped_sum(bp)
+    # vals is non-increasing, vals[0] > k and vals[-1] = 0 < k
+    j = np.searchsorted(-vals, -k, side='right') - 1
+    t0, t1 = bp[j], bp[j + 1]
+    s0, s1 = vals[j], vals[j + 1]
+    tau = t0 + (s0 - k) * (t1 - t0) / (s0 - s1)
+    return np.clip(u - tau, 0., 1.)
+
+
+def gfl_pqn_native(X, y, L, k, rho=None, mu=0.01, max_iter=1000, opt_tol=1e-6, spg_iters=100, u0=None,
+                   trace=None):
+    """
+    In-process port of src/PQN/gfl_pqn.m: minConF_PQN on the Boolean relaxation with the
+    Gurobi projection replaced by proj_capped_simplex.
+    trace (utils.trace.Trace) records the objective of every PQN iteration and the time
+    spent in the projection.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    n, d = X.shape
+    if rho is None:
+        rho = np.sqrt(n)
+    u0 = np.zeros(d) if u0 is None else np.asarray(u0, dtype=np.float64)
+
+    fun_obj = GFLObjective(X, y, rho, L, mu)
+    fun_proj = lambda u: proj_capped_simplex(u, k)
+    if trace is not None:
+        fun_proj = trace.timed(fun_proj)
+    u, _, _ = min_conf_pqn(fun_obj, u0, fun_proj, opt_tol=opt_tol, max_iter=max_iter, spg_iters=spg_iters,
+                           trace=trace)
+    return u
+
+
+def gfl_pqn_native_path(X, y, L, ks, rho=None, mu=0.01, max_iter=1000, opt_tol=1e-6, spg_iters=100):
+    """
+    gfl_pqn_native for every sparsity level in `ks`, visited in increasing order. Each solve
+    is warm-started from the previous solution (feasible since the constraint set grows
+    with k) and shares one GFLObjective.
+    Returns u with shape (len(ks), d) in the order of `ks`.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    n, d = X.shape
+    if rho is None:
+        rho = np.sqrt(n)
+    fun_obj = GFLObjective(X, y, rho, L, mu)
+    path = np.zeros((len(ks), d))
+    u = np.zeros(d)
+    for idx in np.argsort(ks):
+        fun_proj = lambda v, k=ks[idx]: proj_capped_simplex(v, k)
+        u, _, _ = min_conf_pqn(fun_obj, u, fun_proj, opt_tol=opt_tol, max_iter=max_iter, spg_iters=spg_iters)
+        path[idx] = u
+    return path
+
@@ -1,23 +1,33 @@
-import matlab.engine
-import os
-from utils.communication import save_data, read_result
+import numpy as np
+from utils.communication import save_data, read_result, to_matlab_double, to_matlab_triplets, exchange_files
+from utils.matlab_engine import get_engine_pool
 
 def call_matlab(datafile, resultfile, rho1, rho2):
-    eng = matlab.engine.start_matlab()
-    try:
-        eng.cd(os.path.abspath('./src/code_fgfl_aaai14/'))
-        eng.addpath(os.path.abspath('./src/code_fgfl_aaai14/GFL/'))
-        eng.addpath(eng.genpath(os.path.abspath('./code_fgfl_aaai14/')))
-        eng.gfl_proximal(datafile, resultfile, rho1, rho2, nargout=0)
-    finally:
-        eng.quit()
+    # engines in the pool already have src/code_fgfl_aaai14/ on their path
+    get_engine_pool('fgfl').call('gfl_proximal', datafile, resultfile, rho1, rho2, nargout=0)
 
 
-def gfl_proximal(X, y, A, i, rho1=0.5, rho2=0.5, datafile=None, resultfile=None):
-    datafile_name = os.path.join(datafile, f'data_{i}.mat')
-    resultfile_name = os.path.join(resultfile, f'result_{i}.mat')
-    save_data(X=X, y=y, A=A, filename=datafile_name)
-    call_matlab(datafile_name, resultfile_name, rho1, rho2)
-    u, _ = read_result(resultfile_name)
-    return u.flatten() # the original return a vector with shape (d,1), will not work with recovery_accuracy
+def call_matlab_inmem(X, y, A, rho1, rho2):
+    args = (to_matlab_double(X), to_matlab_double(y), *to_matlab_triplets(A))
+    beta, funcVal = get_engine_pool('fgfl').call('gfl_proximal_inmem', *args, float(rho1), float(rho2), nargout=2)
+    return np.array(beta, dtype=np.float64), np.array(funcVal, dtype=np.float64)
+
 
+def gfl_proximal(X, y, A, i, rho1=0.5, rho2=0.5, datafile=None, resultfile=None, transport='memory', trace=None):
+    # see gfl_pqn for the meaning of transport
+    if transport == 'memory':
+        try:
+            u, funcVal = call_matlab_inmem(X, y, A, rho1, rho2)
+        except (TypeError, ValueError):
+            pass
+        else:
+            if trace is not None:
+                trace.extend(funcVal)
+            return u.flatten()
+    with exchange_files(datafile, resultfile, i) as (datafile_name, resultfile_name):
+        save_data(X=X, y=y, A=A, filename=datafile_name)
+        call_matlab(datafile_name, resultfile_name, rho1, rho2)
+        u, funcVal = read_result(resultfile_name)
+    if trace is not None:
+        trace.extend(funcVal)
+    return u.flatten() # the original return a vector with shape (d,1), will not work with recovery_accuracy
@@ -0,0 +1,115 @@
+import numpy as np
+import scipy.sparse as sp
+
+from utils.design_cache import get_design_cache
+
+try:
+    from gfl_prox_module import FusedLassoProx
+except ImportError:
+    FusedLassoProx = None
+
+
+def fused_edges(A):
+    """
+    Undirected edges (i < j) and weights of the fused term of fast_gfl.m, which sums
+    w_ij |b_i - b_j| / 2 over the entries with A_ij > 0: every pair gets the weight
+    (A_ij + A_ji) / 2 of its positive entries, self-loops are dropped.
+    Returns edges as a C-contiguous int32 (m, 2) array and float64 weights (m,).
+    """
+    A = sp.csr_matrix(A, dtype=np.float64)
+    A = A.multiply(A > 0).tocsr()
+    upper = sp.triu((A + A.T) * 0.5, k=1).tocoo()
+    edges = np.column_stack((upper.row, upper.col)).astype(np.int32)
+    return np.ascontiguousarray(edges), upper.data.astype(np.float64)
+
+
+def _fista(X, y, fused, edges, weights, rho1, rho2, max_iter, tol, beta0, gamma, trace):
+    """ The FISTA loop of fast_gfl.m on the prox `fused` (FusedLassoProx); returns (beta, funcVal, gamma). """
+    prox = fused.prox if trace is None else trace.timed(fused.prox)
+    gamma_inc = 2.
+    beta_z = beta_zold = beta0
+    xb_z = xb_zold = X @ beta0
+    t, t_old = 1., 0.
+    func_val = []
+    for it in range(max_iter):
+        alpha = (t_old - 1.) / t
+        beta_s = (1. + alpha) * beta_z - alpha * beta_zold
+        r_s = (1. + alpha) * xb_z - alpha * xb_zold - y
+        g_s = X.T @ r_s
+        f_s = 0.5 * np.dot(r_s, r_s)
+        # gamma is kept across iterations, so it only grows while the local curvature is unknown
+        while True:
+            beta_zp = prox(beta_s - g_s / gamma, rho1 / gamma, rho2 * rho1 / gamma)
+            xb_zp = X @ beta_zp
+            r_zp = xb_zp - y
+            f_zp = 0.5 * np.dot(r_zp, r_zp)
+            delta = beta_zp - beta_s
+            r_sum = np.dot(delta, delta)
+            converged = r_sum <= 1e-20
+            if converged or f_zp <= f_s + np.dot(delta, g_s) + 0.5 * gamma * r_sum:
+                break
+            gamma *= gamma_inc
+        omega = np.abs(beta_zp).sum() + rho2 * np.dot(weights, np.abs(beta_zp[edges[:, 0]] - beta_zp[edges[:, 1]]))
+        func_val.append(f_zp + rho1 * omega)
+        if trace is not None:
+            trace.record(func_val[-1], beta_zp)
+        beta_zold, xb_zold = beta_z, xb_z
+        beta_z, xb_z = beta_zp, xb_zp
+        if converged:
+            break
+        if it >= 2 and abs(func_val[-1] - func_val[-2]) <= tol * func_val[-2]:
+            break
+        t_old = t
+        t = 0.5 * (1. + np.sqrt(1. + 4. * t * t))
+    return beta_z, np.array(func_val), gamma
+
+
+def _prepare(X, y, A):
+    if FusedLassoProx is None:
+        raise ImportError('\n'.join([
+            'cannot find the module: gfl_prox_module',
+            'try run: \'python setup.py build_ext --inplace\' in src/ first! ']))
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64).ravel()
+    edges, weights = fused_edges(A)
+    return X, y, FusedLassoProx(edges, weights, X.shape[1]), edges, weights
+
+
+def gfl_proximal_native(X, y, A, rho1=0.5, rho2=0.5, max_iter=1000, tol=1e-4, beta0=None, gamma=None,
+                        trace=None):
+    """
+    In-process port of src/code_fgfl_aaai14/fast_gfl.m (as called by gfl_proximal.m):
+        min_b 0.5 ||y - X b||^2 + rho1 (||b||_1 + rho2 sum_{A_ij > 0} A_ij |b_i - b_j| / 2)
+    by FISTA with backtracking. The prox of the penalty (mexEFLSA in MATLAB) is the
+    graph-cut solver of gfl_prox_module, built from the maxflow code in GFL/. Its flow
+    network is built once per fit, and every prox call repairs the residual flow of
+    the previous one instead of starting from scratch.
+    The backtracking starts from gamma (the inverse step size), by default the largest
+    eigenvalue of X'X from the shared DesignCache, so that fits on the same design
+    neither recompute it nor spend prox calls doubling gamma from 1 as fast_gfl.m does.
+    trace (utils.trace.Trace) records the objective of every iteration and the time
+    spent in the prox.
+    """
+    X, y, fused, edges, weights = _prepare(X, y, A)
+    beta0 = np.zeros(X.shape[1]) if beta0 is None else np.asarray(beta0, dtype=np.float64)
+    if gamma is None:
+        gamma = get_design_cache().lipschitz(X)
+    beta, _, _ = _fista(X, y, fused, edges, weights, rho1, rho2, max_iter, tol, beta0, gamma, trace)
+    return beta
+
+
+def gfl_proximal_native_path(X, y, A, rho1s, rho2=0.5, max_iter=1000, tol=1e-4):
+    """
+    gfl_proximal_native for every rho1 in `rho1s`, visited from the largest (sparsest)
+    to the smallest. Each solve is warm-started from the previous solution, step size and
+    prox flow network.
+    Returns beta with shape (len(rho1s), d) in the order of `rho1s`.
+    """
+    X, y, fused, edges, weights = _prepare(X, y, A)
+    path = np.zeros((len(rho1s), X.shape[1]))
+    beta = np.zeros(X.shape[1])
+    gamma = get_design_cache().lipschitz(X)
+    for idx in np.argsort(rho1s)[::-1]:
+        beta, _, gamma = _fista(X, y, fused, edges, weights, rho1s[idx], rho2, max_iter, tol, beta, gamma, None)
+        path[idx] = beta
+    return path
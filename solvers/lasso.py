@@ -1,10 +1,38 @@
+
+import numpy as np
 from sklearn.linear_model import Lasso
 
-def lasso(X, y, alpha=0.1):
+def lasso(X, y, alpha=0.1, trace=None):
     """
     Use sklearn's Lasso implementation to solve the Lasso problem.
+    sklearn exposes no iterations, so trace (utils.trace.Trace) gets a single row.
     """
+    if trace is not None:
+        trace.start()
     lasso_model = Lasso(alpha=alpha, max_iter=10000)
     lasso_model.fit(X, y)  
     u = lasso_model.coef_  
+    if trace is not None:
+        residual = y - lasso_model.predict(X)
+        trace.record(np.dot(residual, residual) / 2., u)
     return u 
+
+
+def lasso_path(X, y, alphas):
+    """
+    Solve the Lasso for every alpha in `alphas`, from the largest to the smallest,
+    warm-starting each fit from the previous one and reusing one Gram matrix.
+    Returns the coefficients with shape (len(alphas), d) in the order of `alphas`.
+    """
+    alphas = np.asarray(alphas, dtype=np.float64)
+    # center explicitly so that the precomputed Gram matches fit_intercept=True
+    Xc = X - X.mean(axis=0)
+    yc = y - y.mean()
+    gram = Xc.T @ Xc
+    lasso_model = Lasso(fit_intercept=False, precompute=gram, warm_start=True, max_iter=10000)
+    path = np.zeros((len(alphas), X.shape[1]))
+    for idx in np.argsort(-alphas):
+        lasso_model.set_params(alpha=alphas[idx])
+        lasso_model.fit(Xc, yc)
+        path[idx] = lasso_model.coef_
+    return path
@@ -0,0 +1,265 @@
+import numpy as np
+
+
+# Python port of minConF_PQN / minConF_SPG from src/PQN/minConF (Schmidt et al.)
+# Only the options used by src/PQN/gfl_pqn.m are exposed.
+
+def _is_legal(v):
+    return np.all(np.isfinite(v))
+
+
+def _polyinterp(t, f0, gtd0, f1, gtd1):
+    """
+    Minimum of the cubic interpolating (0, f0, gtd0) and (t, f1, gtd1),
+    clamped to [0, t]. Mirrors the two-point branch of polyinterp.m.
+    """
+    d1 = gtd0 + gtd1 - 3. * (f0 - f1) / (0. - t)
+    d2_sq = d1 ** 2 - gtd0 * gtd1
+    if d2_sq < 0:
+        return t / 2.
+    d2 = np.sqrt(d2_sq)
+    denom = gtd1 - gtd0 + 2. * d2
+    if denom == 0:
+        return t / 2.
+    min_pos = t - t * ((gtd1 + d2 - d1) / denom)
+    return min(max(min_pos, 0.), t)
+
+
+def _quadinterp(t, f0, gtd0, f1):
+    # minimum of the quadratic through f0, gtd0 at 0 and f1 at t
+    a = (f1 - f0 - gtd0 * t) / (t ** 2)
+    if a <= 0:
+        return t / 2.
+    return min(max(-gtd0 / (2. * a), 0.), t)
+
+
+def _lbfgs_update(y, s, corrections, S, Y, hdiag):
+    ys = y @ s
+    if ys > 1e-10:
+        if len(S) == corrections:
+            S.pop(0)
+            Y.pop(0)
+        S.append(s)
+        Y.append(y)
+        hdiag = ys / (y @ y)
+    return hdiag
+
+
+def _lbfgs_hv(S, Y, hdiag):
+    # compact representation of the L-BFGS Hessian approximation (lbfgsHvFunc2.m)
+    S_mat = np.column_stack(S)
+    Y_mat = np.column_stack(Y)
+    SY = S_mat.T @ Y_mat
+    L = np.tril(SY, -1)
+    N = np.hstack((S_mat / hdiag, Y_mat))
+    M = np.block([[S_mat.T @ S_mat / hdiag, L], [L.T, -np.diag(np.diag(SY))]])
+
+    def hv(v):
+        return v / hdiag - N @ np.linalg.solve(M, N.T @ v)
+    return hv
+
+
+def min_conf_spg(fun_obj, x, fun_proj, opt_tol=1e-6, max_iter=500, suff_dec=1e-4,
+                 memory=10, test_opt=True, feasible_init=False, verbose=0):
+    """
+    Spectral projected gradient for min fun_obj(x) s.t. x in C.
+    :return: x, f, number of function evaluations, number of projections
+    """
+    if not feasible_init:
+        x = fun_proj(x)
+    f, g = fun_obj(x)
+    projects = 1
+    fun_evals = 1
+
+    if test_opt:
+        projects += 1
+        if np.sum(np.abs(fun_proj(x - g) - x)) < opt_tol:
+            return x, f, fun_evals, projects
+
+    old_fvals = []
+    i = 1
+    while fun_evals <= max_iter:
+        if i == 1:
+            alpha = 1.
+        else:
+            y_ = g - g_old
+            s = x - x_old
+            alpha = (s @ s) / (s @ y_)
+            if not (1e-10 < alpha <= 1e10):
+                alpha = 1.
+        f_old, x_old, g_old = f, x, g
+
+        d = fun_proj(x - alpha * g) - x
+        projects += 1
+
+        gtd = g @ d
+        if gtd > -opt_tol:
+            if verbose >= 1:
+                print('Directional Derivative below optTol')
+            break
+
+        t = min(1., 1. / np.sum(np.abs(g))) if i == 1 else 1.
+
+        # non-monotone Armijo reference value
+        old_fvals.append(f)
+        if len(old_fvals) > memory:
+            old_fvals.pop(0)
+        fun_ref = max(old_fvals)
+
+        x_new = x + t * d
+        f_new, g_new = fun_obj(x_new)
+        fun_evals += 1
+
+        while f_new > fun_ref + suff_dec * (g @ (x_new - x)) or not _is_legal(f_new):
+            temp = t
+            if not _is_legal(f_new):
+                t = t / 2.
+            elif _is_legal(g_new):
+                t = _polyinterp(t, f, gtd, f_new, g_new @ d)
+            else:
+                t = _quadinterp(t, f, gtd, f_new)
+
+            if t < temp * 1e-3:
+                t = temp * 1e-3
+            elif t > temp * 0.6:
+                t = temp * 0.6
+
+            if np.sum(np.abs(t * d)) < opt_tol or t == 0:
+                t = 0.
+                f_new, g_new = f, g
+                x_new = x
+                break
+
+            x_new = x + t * d
+            f_new, g_new = fun_obj(x_new)
+            fun_evals += 1
+
+        x, f, g = x_new, f_new, g_new
+
+        if test_opt:
+            opt_cond = np.sum(np.abs(fun_proj(x - g) - x))
+            projects += 1
+            if opt_cond < opt_tol:
+                break
+        if np.sum(np.abs(t * d)) < opt_tol:
+            break
+        if abs(f - f_old) < opt_tol:
+            break
+        if fun_evals > max_iter:
+            break
+        i += 1
+    return x, f, fun_evals, projects
+
+
+def min_conf_pqn(fun_obj, x, fun_proj, opt_tol=1e-6, max_iter=500, max_project=100000,
+                 suff_dec=1e-4, corrections=10, bb_init=False, spg_opt_tol=1e-6,
+                 spg_iters=10, spg_test_opt=False, verbose=0, trace=None):
+    """
+    Limited-memory projected quasi-Newton for min fun_obj(x) s.t. x in C.
+    The quasi-Newton sub-problems are solved with min_conf_spg.
+    :param fun_obj:     callable returning (f, g) at x.
+    :param fun_proj:    callable returning the projection of x onto C.
+    :param trace:       utils.trace.Trace that records f and x after every iteration.
+    :return: x, f, number of function evaluations
+    """
+    if trace is not None:
+        trace.start()
+    x = fun_proj(x)
+    projects = 1
+    f, g = fun_obj(x)
+    fun_evals = 1
+
+    projects += 1
+    if np.sum(np.abs(fun_proj(x - g) - x)) < opt_tol:
+        if verbose >= 1:
+            print('First-Order Optimality Conditions Below optTol at Initial Point')
+        return x, f, fun_evals
+
+    S, Y, hdiag = [], [], 1.
+    i = 1
+    while fun_evals <= max_iter:
+        if i == 1:
+            p = fun_proj(x - g)
+            projects += 1
+        else:
+            hdiag = _lbfgs_update(g - g_old, x - x_old, corrections, S, Y, hdiag)
+            if S:
+                hv = _lbfgs_hv(S, Y, hdiag)
+            else:
+                hv = lambda v: v / hdiag
+
+            def sub_obj(p, x=x, g=g, hv=hv):
+                d = p - x
+                hd = hv(d)
+                return g @ d + 0.5 * (d @ hd), g + hd
+
+            if bb_init:
+                s, y_ = x - x_old, g - g_old
+                alpha = (s @ s) / (s @ y_)
+                if not (1e-10 < alpha <= 1e10):
+                    alpha = 1. / np.linalg.norm(g)
+                p, _, _, sub_projects = min_conf_spg(
+                    sub_obj, x - alpha * g, fun_proj, opt_tol=spg_opt_tol,
+                    max_iter=spg_iters, test_opt=spg_test_opt, feasible_init=False)
+            else:
+                p, _, _, sub_projects = min_conf_spg(
+                    sub_obj, x, fun_proj, opt_tol=spg_opt_tol,
+                    max_iter=spg_iters, test_opt=spg_test_opt, feasible_init=True)
+            projects += sub_projects
+        d = p - x
+        g_old, x_old = g, x
+
+        gtd = g @ d
+        if gtd > -opt_tol:
+            if verbose >= 1:
+                print('Directional Derivative below optTol')
+            break
+
+        t = min(1., 1. / np.sum(np.abs(g))) if i == 1 else 1.
+
+        x_new = x + t * d
+        f_new, g_new = fun_obj(x_new)
+        fun_evals += 1
+
+        f_old = f
+        while f_new > f + suff_dec * t * gtd or not _is_legal(f_new):
+            temp = t
+            if not _is_legal(f_new) or not _is_legal(g_new):
+                t = t / 2.
+            else:
+                t = _polyinterp(t, f, gtd, f_new, g_new @ d)
+
+            if t < temp * 1e-3:
+                t = temp * 1e-3
+            elif t > temp * 0.6:
+                t = temp * 0.6
+
+            if np.sum(np.abs(t * d)) < opt_tol or t == 0:
+                t = 0.
+                f_new, g_new = f, g
+                x_new = x
+                break
+
+            x_new = x + t * d
+            f_new, g_new = fun_obj(x_new)
+            fun_evals += 1
+
+        x, f, g = x_new, f_new, g_new
+
+        opt_cond = np.sum(np.abs(fun_proj(x - g) - x))
+        projects += 1
+        if trace is not None:
+            trace.record(f, x)
+        if verbose >= 2:
+            print(f'{i:10d} {fun_evals:10d} {projects:10d} {t:15.5e} {f:15.5e} {opt_cond:15.5e}')
+
+        if opt_cond < opt_tol:
+            break
+        if np.sum(np.abs(t * d)) < opt_tol:
+            break
+        if abs(f - f_old) < opt_tol:
+            break
+        if fun_evals > max_iter or projects > max_project:
+            break
+        i += 1
+    return x, f, fun_evals
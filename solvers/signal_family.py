@@ -1,5 +1,6 @@
 import os
 import sys
+import copy
 import time
 import pickle
 import multiprocessing
@@ -10,7 +11,6 @@ import numpy as np
 import scipy.io as sio
 from PIL import Image
 import matplotlib.pyplot as plt
-from scipy.linalg import eigh
 from collections import ChainMap, defaultdict
 import scipy.sparse as sp
 
@@ -18,6 +18,9 @@ import pickle as pkl
 from scipy.sparse import lil_matrix
 import logging
 
+from utils.design_cache import get_design_cache, choose_gradient, GramOperator
+from utils.lstsq import RestrictedLstsq
+
 try:
     import sparse_module
     try:
@@ -26,6 +29,15 @@ try:
         print('cannot find wrap_head_tail_bisearch method in sparse_module')
         sparse_module = None
         exit(0)
+    try:
+        # zero-copy binding that releases the GIL (older builds only have the list version)
+        from sparse_module import wrap_head_tail_bisearch_np
+    except ImportError:
+        wrap_head_tail_bisearch_np = None
+    try:
+        from sparse_module import Graph
+    except ImportError:
+        Graph = None
 except ImportError:
     print('\n'.join([
         'cannot find the module: sparse_module',
@@ -55,12 +67,122 @@ if not os.path.exists(root_p):
     os.mkdir(root_p)
 
 
+def build_graph(edges, costs, p):
+    """ Build the edges and costs of a graph on p nodes into a sparse_module.Graph
+    once, so that every projection of a fit reuses its PCST work buffers.
+    Returns edges unchanged if the module has no Graph or edges is already one.
+    """
+    if Graph is None or isinstance(edges, Graph):
+        return edges
+    return Graph(np.asarray(edges), np.ascontiguousarray(costs, dtype=np.float64), p)
+
+
+def design_terms(x_mat, y, xtx=None, xty=None, gradient='auto'):
+    """ x_mat.T @ x_mat and x_mat.T @ y, taken from the shared DesignCache unless given,
+    so that the methods, sparsity levels and fits on the same design compute them once.
+    :param gradient: 'gram' for the dense x_mat.T @ x_mat, 'matrix-free' for a GramOperator
+                     that applies it as x_mat.T @ (x_mat @ x), or 'auto' to choose from the
+                     shape of x_mat and the memory available (see choose_gradient).
+    """
+    cache = get_design_cache()
+    if xtx is None:
+        if gradient == 'auto':
+            gradient = choose_gradient(*x_mat.shape, max_bytes=cache.max_bytes)
+        if gradient == 'gram':
+            xtx = cache.gram(x_mat)
+        elif gradient == 'matrix-free':
+            xtx = GramOperator(x_mat)
+        else:
+            raise ValueError(f"Unknown gradient: {gradient}. Supported gradients are: auto, gram, matrix-free.")
+    if xty is None:
+        xty = cache.xty(x_mat, y)
+    return xtx, xty
+
+
+def least_squares_loss(x_mat, y, x_hat, xtx, xty, yty):
+    """ ||x_mat @ x_hat - y||^2 / 2 from the nonzeros S of x_hat. With a dense xtx and
+    |S| < n it is x_S'X_S'X_S x_S / 2 - x_S'(X'y)_S + y'y / 2 in O(|S|^2), accurate to
+    about eps * y'y; otherwise the residual is formed from the columns S of x_mat.
+    """
+    nonzero = np.flatnonzero(x_hat)
+    if isinstance(xtx, np.ndarray) and len(nonzero) < x_mat.shape[0]:
+        x_s = x_hat[nonzero]
+        loss = np.dot(x_s, xtx[np.ix_(nonzero, nonzero)] @ x_s) / 2. - np.dot(x_s, xty[nonzero]) + yty / 2.
+        return max(loss, 0.)
+    if 2 * len(nonzero) < len(x_hat):
+        residual = x_mat[:, nonzero] @ x_hat[nonzero] - y
+    else:
+        residual = x_mat @ x_hat - y
+    return np.dot(residual, residual) / 2.
+
+
+class LambdaBracket:
+    """ Carries the lambda of the head/tail bisection from one projection to the next
+    at the same step of a solver (e.g. the head projection of graph-iht), and records
+    the number of PCST runs of every projection. The lambda is kept relative to the sum
+    of the prizes, since scaling all prizes by a factor scales the right lambda by it.
+    """
+    def __init__(self, warm_start=False):
+        self.warm_start = warm_start
+        self.ratio = 0.
+        self.num_pcst = []
+
+
+class StoppingRule:
+    """ Stopping rules of the signal family loops, checked after every epoch on top of
+    max_epochs and tol_algo. A run stops as soon as one of them holds:
+    :param x_tol:            ||x_t - x_{t-1}|| <= x_tol * ||x_{t-1}||. The default 0. stops
+                             only at a fixed point, where the remaining epochs change nothing.
+                             dmo-acc-fw has no such fixed point (its projection depends on the
+                             step size of the epoch), so it ignores x_tol=0.; a positive x_tol
+                             applies to it as to the other methods.
+    :param support_patience: the support of x has not changed for this many epochs.
+    :param gap_tol:          Frank-Wolfe duality gap <grad, x - v> <= gap_tol (dmo-fw only:
+                             the v of dmo-acc-fw does not minimize <grad, v>, so it gives no gap).
+    :param time_budget:      wall-clock seconds since the start of the run.
+    Every run works on its own copy from start(), so one rule can be shared by the
+    methods of sparse_learning_solver.
+    """
+    def __init__(self, x_tol=0., support_patience=None, gap_tol=None, time_budget=None):
+        self.x_tol = x_tol
+        self.support_patience = support_patience
+        self.gap_tol = gap_tol
+        self.time_budget = time_budget
+
+    def start(self, start_time=None):
+        rule = copy.copy(self)
+        rule.start_time = time.time() if start_time is None else start_time
+        rule.prev_x = None
+        rule.prev_support = None
+        rule.num_stable = 0
+        return rule
+
+    def done(self, x_hat, gap=None):
+        stop = False
+        if self.prev_x is not None and self.x_tol is not None:
+            stop = np.linalg.norm(x_hat - self.prev_x) <= self.x_tol * np.linalg.norm(self.prev_x)
+        if self.support_patience is not None:
+            support = np.flatnonzero(x_hat)
+            if self.prev_support is not None and np.array_equal(support, self.prev_support):
+                self.num_stable += 1
+            else:
+                self.num_stable = 0
+            self.prev_support = support
+            stop = stop or self.num_stable >= self.support_patience
+        if self.gap_tol is not None and gap is not None:
+            stop = stop or gap <= self.gap_tol
+        if self.time_budget is not None:
+            stop = stop or time.time() - self.start_time >= self.time_budget
+        self.prev_x = np.copy(x_hat)
+        return bool(stop)
+
+
 def algo_head_tail_bisearch(
-        edges, x, costs, g, root, s_low, s_high, max_num_iter, verbose=0):
+        edges, x, costs, g, root, s_low, s_high, max_num_iter, verbose=0, bracket=None):
     """ This is the wrapper of head/tail-projection proposed in [2].
-    :param edges:           edges in the graph.
+    :param edges:           edges in the graph, or a Graph from build_graph.
     :param x:               projection vector x.
-    :param costs:           edge costs in the graph.
+    :param costs:           edge costs in the graph (ignored for a Graph).
     :param g:               the number of connected components.
     :param root:            root of subgraph. Usually, set to -1: no root.
     :param s_low:           the lower bound of the sparsity.
@@ -68,6 +190,7 @@ def algo_head_tail_bisearch(
     :param max_num_iter:    the maximum number of iterations used in
                             binary search procedure.
     :param verbose: print out some information.
+    :param bracket:         LambdaBracket to warm-start from and update (Graph only).
     :return:            1.  the support of the projected vector
                         2.  the projected vector
     """
@@ -76,16 +199,60 @@ def algo_head_tail_bisearch(
     # to avoid too large upper bound problem.
     if s_high >= len(prizes) - 1:
         s_high = len(prizes) - 1
-    re_nodes = wrap_head_tail_bisearch(
-        edges, prizes, costs, g, root, s_low, s_high, max_num_iter, verbose)
+    if Graph is not None and isinstance(edges, Graph):
+        total = prizes.sum()
+        lambda0 = bracket.ratio * total if bracket is not None and bracket.warm_start else 0.
+        re_nodes, lambda_, num_pcst = edges.head_tail_bisearch(
+            prizes, g, root, s_low, s_high, max_num_iter, verbose, lambda0)
+        if bracket is not None:
+            bracket.ratio = lambda_ / total if total > 0 else 0.
+            bracket.num_pcst.append(num_pcst)
+    elif wrap_head_tail_bisearch_np is not None:
+        re_nodes = wrap_head_tail_bisearch_np(
+            edges, prizes, costs, g, root, s_low, s_high, max_num_iter, verbose)
+    else:
+        re_nodes = np.asarray(wrap_head_tail_bisearch(
+            edges, prizes, costs, g, root, s_low, s_high, max_num_iter, verbose)[0], dtype=np.int32)
     proj_w = np.zeros_like(x)
-    proj_w[re_nodes[0]] = x[re_nodes[0]]
-    return re_nodes[0], proj_w
+    proj_w[re_nodes] = x[re_nodes]
+    return re_nodes, proj_w
+
+
+def algo_head_tail_bisearch_batch(
+        graph, x_mat, g, root, s_low, s_high, max_num_iter, verbose=0, brackets=None, num_threads=0):
+    """ Head/tail projection of every row of x_mat in one call on a Graph from build_graph.
+    The rows are projected in parallel by the OpenMP threads of sparse_module.
+    :param x_mat:           (B, p) matrix of the vectors to project.
+    :param brackets:        optional list of B LambdaBracket, one per row.
+    :param num_threads:     number of OpenMP threads, <= 0 uses all of them.
+    :return:            1.  list of the B supports
+                        2.  the (B, p) projected vectors
+    """
+    x_mat = np.atleast_2d(np.asarray(x_mat, dtype=np.float64))
+    prizes = np.ascontiguousarray(x_mat * x_mat)
+    if s_high >= prizes.shape[1] - 1:
+        s_high = prizes.shape[1] - 1
+    totals = prizes.sum(axis=1)
+    lambda0 = None
+    if brackets is not None:
+        lambda0 = np.array([b.ratio if b.warm_start else 0. for b in brackets]) * totals
+    indptr, indices, lambdas, num_pcst = graph.head_tail_bisearch_batch(
+        prizes, g, root, s_low, s_high, max_num_iter, verbose, lambda0, num_threads)
+    re_nodes = [indices[indptr[b]:indptr[b + 1]] for b in range(len(prizes))]
+    proj = np.zeros_like(x_mat)
+    for i, nodes in enumerate(re_nodes):
+        proj[i, nodes] = x_mat[i, nodes]
+    if brackets is not None:
+        for i, bracket in enumerate(brackets):
+            bracket.ratio = lambdas[i] / totals[i] if totals[i] > 0 else 0.
+            bracket.num_pcst.append(int(num_pcst[i]))
+    return re_nodes, proj
 
 
 def algo_graph_iht(
         x_mat, y, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s,
-        root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0):
+        root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0, xtx=None, xty=None,
+        warm_start=False, proj_stats=None, gradient='auto', stopping=None, trace=None):
     """
     :param x_mat: design matrix.
     :param y: response vector.
@@ -95,13 +262,25 @@ def algo_graph_iht(
     :param g: connected component
     :param s: sparsity level
     :param gamma: to control the range of the sparsity since it cannot be the exact value
+    :param xtx, xty: precomputed x_mat.T @ x_mat (an array or GramOperator) and x_mat.T @ y, taken from the DesignCache if None
+    :param gradient: 'auto', 'gram' or 'matrix-free', how xtx is formed if None (see design_terms)
+    :param warm_start: start the lambda bisection of each projection from the previous one. This needs
+                       fewer PCST runs, but can stop at a different feasible lambda and so change the
+                       support; off by default so that the estimates match the cold-start projections
+    :param proj_stats: dict filled with the number of PCST runs of every head and tail projection
+    :param stopping: StoppingRule checked after every epoch, StoppingRule() if None
+    :param trace: utils.trace.Trace that records every step with the time spent in projections
     :return:
     1. x_hat: the estimator of the vector
     """
     start_time = time.time()
     x_hat = np.copy(x0)
-    xtx = np.dot(np.transpose(x_mat), x_mat)
-    xty = np.dot(np.transpose(x_mat), y)
+    xtx, xty = design_terms(x_mat, y, xtx, xty, gradient)
+    yty = np.dot(y, y)
+    stop = (stopping or StoppingRule()).start(start_time)
+    project = algo_head_tail_bisearch if trace is None else trace.timed(algo_head_tail_bisearch)
+    if trace is not None:
+        trace.start()
 
     # graph projection para
     h_low = int(len(x0) / 2)
@@ -113,37 +292,49 @@ def algo_graph_iht(
     list_run_time = []
     list_loss = []
     list_est_err = []
-    p = len(x0)
-    beta = eigh(xtx, eigvals_only=True, subset_by_index=[p - 1, p - 1])[0]
+    beta = get_design_cache().lipschitz(x_mat)
     lr = 1. / beta
+    head, tail = LambdaBracket(warm_start), LambdaBracket(warm_start)
     for tt in range(max_epochs):
         num_epochs += 1
-        grad = -1. * (xty - np.dot(xtx, x_hat))
-        head_nodes, proj_gradient = algo_head_tail_bisearch(
+        grad = -1. * (xty - xtx @ x_hat)
+        head_nodes, proj_gradient = project(
             edges, grad, costs, g, root, h_low, h_high,
-            proj_max_num_iter, verbose)
+            proj_max_num_iter, verbose, bracket=head)
         bt = x_hat - lr * proj_gradient
-        tail_nodes, proj_bt = algo_head_tail_bisearch(
+        tail_nodes, proj_bt = project(
             edges, bt, costs, g, root, t_low, t_high,
-            proj_max_num_iter, verbose)
+            proj_max_num_iter, verbose, bracket=tail)
         x_hat = proj_bt
         if tt % step == 0:
-            loss = np.sum((x_mat @ x_hat - y) ** 2.) / 2.
+            loss = least_squares_loss(x_mat, y, x_hat, xtx, xty, yty)
             list_run_time.append(time.time() - start_time)
             list_loss.append(loss)
             list_est_err.append(np.linalg.norm(x_hat - x_star))
+            if trace is not None:
+                trace.record(loss, x_hat)
             if loss <= tol_algo or np.linalg.norm(x_hat) >= 1e5:
                 break
+        if stop.done(x_hat):
+            break
+    if proj_stats is not None:
+        proj_stats.update(head=head.num_pcst, tail=tail.num_pcst)
     return num_epochs, x_hat, list_run_time, list_loss, list_est_err
 
 
 def algo_graph_cosamp(
         x_mat, y, max_epochs, x_star, x0, tol_algo, step, edges, costs,
-        h_g, t_g, s, root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0):
+        h_g, t_g, s, root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0, xtx=None, xty=None,
+        warm_start=False, proj_stats=None, gradient='auto', stopping=None, trace=None):
     start_time = time.time()
-    x_hat = np.zeros_like(x0)
-    x_tr_t = np.transpose(x_mat)
-    xtx, xty = np.dot(x_tr_t, x_mat), np.dot(x_tr_t, y)
+    x_hat = np.copy(x0)
+    xtx, xty = design_terms(x_mat, y, xtx, xty, gradient)
+    yty = np.dot(y, y)
+    stop = (stopping or StoppingRule()).start(start_time)
+    project = algo_head_tail_bisearch if trace is None else trace.timed(algo_head_tail_bisearch)
+    if trace is not None:
+        trace.start()
+    lstsq = RestrictedLstsq(x_mat, y)
 
     h_low, h_high = int(2 * s), int(2 * s * (1.0 + gamma))
     t_low, t_high = int(s), int(s * (1.0 + gamma))
@@ -152,69 +343,92 @@ def algo_graph_cosamp(
     list_run_time = []
     list_loss = []
     list_est_err = []
+    head, tail = LambdaBracket(warm_start), LambdaBracket(warm_start)
     for tt in range(max_epochs):
         num_epochs += 1
-        grad = -2. * (np.dot(xtx, x_hat) - xty)  # proxy
-        head_nodes, proj_grad = algo_head_tail_bisearch(
+        grad = -2. * (xtx @ x_hat - xty)  # proxy
+        head_nodes, proj_grad = project(
             edges, grad, costs, h_g, root,
-            h_low, h_high, proj_max_num_iter, verbose)
+            h_low, h_high, proj_max_num_iter, verbose, bracket=head)
         gamma = np.union1d(x_hat.nonzero()[0], head_nodes)
         bt = np.zeros_like(x_hat)
-        bt[gamma] = np.dot(np.linalg.pinv(x_mat[:, gamma]), y)
-        tail_nodes, proj_bt = algo_head_tail_bisearch(
+        bt[gamma] = lstsq.solve(gamma)
+        tail_nodes, proj_bt = project(
             edges, bt, costs, t_g, root,
-            t_low, t_high, proj_max_num_iter, verbose)
+            t_low, t_high, proj_max_num_iter, verbose, bracket=tail)
         x_hat = proj_bt
         if tt % step == 0:
-            loss = np.sum((x_mat @ x_hat - y) ** 2.) / 2.
+            loss = least_squares_loss(x_mat, y, x_hat, xtx, xty, yty)
             list_run_time.append(time.time() - start_time)
             list_loss.append(loss)
             list_est_err.append(np.linalg.norm(x_hat - x_star))
+            if trace is not None:
+                trace.record(loss, x_hat)
             if loss <= tol_algo or np.linalg.norm(x_hat) >= 1e5:
                 break
+        if stop.done(x_hat):
+            break
+    if proj_stats is not None:
+        proj_stats.update(head=head.num_pcst, tail=tail.num_pcst)
     return num_epochs, x_hat, list_run_time, list_loss, list_est_err
 
 
 def algo_gen_mp(
         x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs,
-        g, s, root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0):
+        g, s, root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0, xtx=None, xty=None,
+        warm_start=False, proj_stats=None, gradient='auto', stopping=None, trace=None):
     start_time = time.time()
     h_low, h_high = int(s), int(s * (1.0 + gamma))
     x_hat = np.copy(x0)
-    x_tr_t = np.transpose(x_mat)
-    xtx, xty = np.dot(x_tr_t, x_mat), np.dot(x_tr_t, y)
-    p = len(x0)
-    beta = eigh(xtx, eigvals_only=True, subset_by_index=[p - 1, p - 1])[0]
+    xtx, xty = design_terms(x_mat, y, xtx, xty, gradient)
+    yty = np.dot(y, y)
+    stop = (stopping or StoppingRule()).start(start_time)
+    project = algo_head_tail_bisearch if trace is None else trace.timed(algo_head_tail_bisearch)
+    if trace is not None:
+        trace.start()
+    beta = get_design_cache().lipschitz(x_mat)
     num_epochs = 0
     list_run_time = []
     list_loss = []
     list_est_err = []
+    dmo = LambdaBracket(warm_start)
     for tt in range(max_epochs):
         num_epochs += 1
-        grad = np.dot(xtx, x_hat) - xty
-        dmo_nodes, proj_vec = algo_head_tail_bisearch(
-            edges, grad, costs, g, root, h_low, h_high, proj_max_num_iter, verbose)
+        grad = xtx @ x_hat - xty
+        dmo_nodes, proj_vec = project(
+            edges, grad, costs, g, root, h_low, h_high, proj_max_num_iter, verbose,
+            bracket=dmo)
         norm_vt = np.linalg.norm(proj_vec[dmo_nodes])
         vt = (-c / norm_vt) * proj_vec
         x_hat = x_hat - (np.dot(vt, grad) / beta) * vt
         if tt % step == 0:
-            loss = np.sum((x_mat @ x_hat - y) ** 2.) / 2.
+            loss = least_squares_loss(x_mat, y, x_hat, xtx, xty, yty)
             list_run_time.append(time.time() - start_time)
             list_loss.append(loss)
             list_est_err.append(np.linalg.norm(x_hat - x_star))
+            if trace is not None:
+                trace.record(loss, x_hat)
             if loss <= tol_algo or np.linalg.norm(x_hat) >= 1e5:
                 break
             # print(tt, loss, list_est_err[-1])
+        if stop.done(x_hat):
+            break
+    if proj_stats is not None:
+        proj_stats.update(dmo=dmo.num_pcst)
     return num_epochs, x_hat, list_run_time, list_loss, list_est_err
 
 
-def algo_cosamp(x_mat, y, max_epochs, x_star, x0, tol_algo, step, s):
+def algo_cosamp(x_mat, y, max_epochs, x_star, x0, tol_algo, step, s, xtx=None, xty=None, gradient='auto',
+                stopping=None, trace=None):
     start_time = time.time()
-    x_hat = np.zeros_like(x0)
-    x_tr_t = np.transpose(x_mat)
+    x_hat = np.copy(x0)
     m, p = x_mat.shape
-
-    xtx, xty = np.dot(x_tr_t, x_mat), np.dot(x_tr_t, y)
+    xtx, xty = design_terms(x_mat, y, xtx, xty, gradient)
+    yty = np.dot(y, y)
+    stop = (stopping or StoppingRule()).start(start_time)
+    if trace is not None:
+        trace.start()
+    lstsq = RestrictedLstsq(x_mat, y)
 
     num_epochs = 0
     list_run_time = []
@@ -222,113 +436,165 @@ def algo_cosamp(x_mat, y, max_epochs, x_star, x0, tol_algo, step, s):
     list_est_err = []
     for tt in range(max_epochs):
         num_epochs += 1
-        grad = -(2. / float(m)) * (np.dot(xtx, x_hat) - xty)  # proxy
+        grad = -(2. / float(m)) * (xtx @ x_hat - xty)  # proxy
         gamma = np.argsort(abs(grad))[-2 * s:]  # identify
         gamma = np.union1d(x_hat.nonzero()[0], gamma)
         bt = np.zeros_like(x_hat)
-        bt[gamma] = np.dot(np.linalg.pinv(x_mat[:, gamma]), y)
+        bt[gamma] = lstsq.solve(gamma)
         gamma = np.argsort(abs(bt))[-s:]
         x_hat = np.zeros_like(x_hat)
         x_hat[gamma] = bt[gamma]
         if tt % step == 0:
-            loss = np.sum((x_mat @ x_hat - y) ** 2.) / 2.
+            loss = least_squares_loss(x_mat, y, x_hat, xtx, xty, yty)
             list_run_time.append(time.time() - start_time)
             list_loss.append(loss)
             list_est_err.append(np.linalg.norm(x_hat - x_star))
+            if trace is not None:
+                trace.record(loss, x_hat)
             if loss <= tol_algo or np.linalg.norm(x_hat) >= 1e5:
                 break
+        if stop.done(x_hat):
+            break
     return num_epochs, x_hat, list_run_time, list_loss, list_est_err
 
 
 def algo_dmo_acc_fw(
         x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs,
-        g, s, root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0):
+        g, s, root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0, xtx=None, xty=None,
+        warm_start=False, proj_stats=None, gradient='auto', stopping=None, trace=None):
     start_time = time.time()
     h_low, h_high = int(s), int(s * (1.0 + gamma))
     x_hat = np.copy(x0)
-    x_tr_t = np.transpose(x_mat)
-    xtx, xty = np.dot(x_tr_t, x_mat), np.dot(x_tr_t, y)
+    xtx, xty = design_terms(x_mat, y, xtx, xty, gradient)
+    yty = np.dot(y, y)
+    stop = (stopping or StoppingRule()).start(start_time)
+    if stop.x_tol == 0.:
+        # x_t = x_{t-1} is no fixed point here, the next epoch projects with another eta_t
+        stop.x_tol = None
+    project = algo_head_tail_bisearch if trace is None else trace.timed(algo_head_tail_bisearch)
+    if trace is not None:
+        trace.start()
     num_epochs = 0
     list_run_time = []
     list_loss = []
     list_est_err = []
+    dmo = LambdaBracket(warm_start)
     for tt in range(max_epochs):
         num_epochs += 1
-        grad = np.dot(xtx, x_hat) - xty
+        grad = xtx @ x_hat - xty
         eta_t = 2. / (tt + 2.)
-        dmo_nodes, proj_vec = algo_head_tail_bisearch(
-            edges, -x_hat + grad / eta_t, costs, g, root, h_low, h_high, proj_max_num_iter, verbose)
+        dmo_nodes, proj_vec = project(
+            edges, -x_hat + grad / eta_t, costs, g, root, h_low, h_high, proj_max_num_iter, verbose,
+            bracket=dmo)
         norm_vt = np.linalg.norm(proj_vec[dmo_nodes])
 
         vt = (-c / norm_vt) * proj_vec
         x_hat += eta_t * (vt - x_hat)
         if tt % step == 0:
-            loss = np.sum((x_mat @ x_hat - y) ** 2.) / 2.
+            loss = least_squares_loss(x_mat, y, x_hat, xtx, xty, yty)
             list_run_time.append(time.time() - start_time)
             list_loss.append(loss)
             list_est_err.append(np.linalg.norm(x_hat - x_star))
+            if trace is not None:
+                trace.record(loss, x_hat)
             if loss <= tol_algo or np.linalg.norm(x_hat) >= 1e5:
                 break
+        if stop.done(x_hat):
+            break
+    if proj_stats is not None:
+        proj_stats.update(dmo=dmo.num_pcst)
     return num_epochs, x_hat, list_run_time, list_loss, list_est_err
 
 
 def algo_dmo_fw(
         x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs,
-        g, s, root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0):
+        g, s, root=-1, gamma=0.05, proj_max_num_iter=50, verbose=0, xtx=None, xty=None,
+        warm_start=False, proj_stats=None, gradient='auto', stopping=None, trace=None):
     start_time = time.time()
     h_low, h_high = int(s), int(s * (1.0 + gamma))
     x_hat = np.copy(x0)
-    x_tr_t = np.transpose(x_mat)
-    xtx, xty = np.dot(x_tr_t, x_mat), np.dot(x_tr_t, y)
+    xtx, xty = design_terms(x_mat, y, xtx, xty, gradient)
+    yty = np.dot(y, y)
+    stop = (stopping or StoppingRule()).start(start_time)
+    project = algo_head_tail_bisearch if trace is None else trace.timed(algo_head_tail_bisearch)
+    if trace is not None:
+        trace.start()
 
     num_epochs = 0
     list_run_time = []
     list_loss = []
     list_est_err = []
+    dmo = LambdaBracket(warm_start)
     for tt in range(max_epochs):
         num_epochs += 1
-        grad = np.dot(xtx, x_hat) - xty
+        grad = xtx @ x_hat - xty
         eta_t = 2. / (tt + 2.)
-        dmo_nodes, proj_vec = algo_head_tail_bisearch(
-            edges, grad, costs, g, root, h_low, h_high, proj_max_num_iter, verbose)
+        dmo_nodes, proj_vec = project(
+            edges, grad, costs, g, root, h_low, h_high, proj_max_num_iter, verbose,
+            bracket=dmo)
         norm_vt = np.linalg.norm(proj_vec[dmo_nodes])
         vt = (-c / norm_vt) * proj_vec
+        gap = np.dot(grad, x_hat - vt)
         x_hat += eta_t * (vt - x_hat)
         if tt % step == 0:
-            loss = np.sum((x_mat @ x_hat - y) ** 2.) / 2.
+            loss = least_squares_loss(x_mat, y, x_hat, xtx, xty, yty)
             list_run_time.append(time.time() - start_time)
             list_loss.append(loss)
             list_est_err.append(np.linalg.norm(x_hat - x_star))
+            if trace is not None:
+                trace.record(loss, x_hat)
             if loss <= tol_algo or np.linalg.norm(x_hat) >= 1e5:
                 break
+        if stop.done(x_hat, gap):
+            break
+    if proj_stats is not None:
+        proj_stats.update(dmo=dmo.num_pcst)
     return num_epochs, x_hat, list_run_time, list_loss, list_est_err
 
 
-def run_single_solver(para):
+def run_single_solver(para, x0=None, xtx=None, xty=None, gradient='auto', stopping=None, trace=None,
+                      warm_start=False):
+    # x0 warm-starts the method, xtx/xty are optional precomputed Gram quantities,
+    # gradient picks how xtx is formed if they are not given, stopping is a StoppingRule,
+    # trace a utils.trace.Trace and warm_start warm-starts the lambda bisection of the
+    # projections (see algo_graph_iht)
     method, img_name, trial_i, y, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c= para
     n, p = x_mat.shape
-    x0 = np.zeros(p, dtype=np.float64)
+    if x0 is None:
+        x0 = np.zeros(p, dtype=np.float64)
     # dummy x_star here
     x_star = np.zeros(p, dtype=np.float64)
 
     if method == 'graph-iht':
         num_epochs, x_hat, list_run_time, list_loss, list_est_err = algo_graph_iht(
-            x_mat, y, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s)
+            x_mat, y, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s,
+            xtx=xtx, xty=xty, gradient=gradient, stopping=stopping,
+            trace=trace, warm_start=warm_start)
     elif method == 'graph-cosamp':
         num_epochs, x_hat, list_run_time, list_loss, list_est_err = algo_graph_cosamp(
-            x_mat, y, max_epochs, x_star, x0, tol_algo, step, edges, costs, h_g=g, t_g=g, s=s)
+            x_mat, y, max_epochs, x_star, x0, tol_algo, step, edges, costs, h_g=g, t_g=g, s=s,
+            xtx=xtx, xty=xty, gradient=gradient, stopping=stopping,
+            trace=trace, warm_start=warm_start)
     elif method == 'dmo-fw':
         num_epochs, x_hat, list_run_time, list_loss, list_est_err = algo_dmo_fw(
-            x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s)
+            x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s,
+            xtx=xtx, xty=xty, gradient=gradient, stopping=stopping,
+            trace=trace, warm_start=warm_start)
     elif method == 'dmo-acc-fw':
         num_epochs, x_hat, list_run_time, list_loss, list_est_err = algo_dmo_acc_fw(
-            x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s)
+            x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s,
+            xtx=xtx, xty=xty, gradient=gradient, stopping=stopping,
+            trace=trace, warm_start=warm_start)
     elif method == 'cosamp':
         num_epochs, x_hat, list_run_time, list_loss, list_est_err = algo_cosamp(
-            x_mat, y, max_epochs, x_star, x0, tol_algo, step, s)
+            x_mat, y, max_epochs, x_star, x0, tol_algo, step, s,
+            xtx=xtx, xty=xty, gradient=gradient, stopping=stopping,
+            trace=trace)
     elif method == 'gen-mp':
         num_epochs, x_hat, list_run_time, list_loss, list_est_err = algo_gen_mp(
-            x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s)
+            x_mat, y, c, max_epochs, x_star, x0, tol_algo, step, edges, costs, g, s,
+            xtx=xtx, xty=xty, gradient=gradient, stopping=stopping,
+            trace=trace, warm_start=warm_start)
     else:
         print('something must wrong.')
         exit()
@@ -337,43 +603,85 @@ def run_single_solver(para):
     #       (method, trial_i, n, list_est_err[-1], num_epochs, list_run_time[-1]))
     return method, img_name, trial_i, list_est_err[-1], num_epochs, x_hat, list_run_time, list_loss, list_est_err
 
-def sparse_learning_solver(para):
+def sparse_learning_solver(para, methods=None, n_jobs=1, gradient='auto', stopping=None, recorder=None,
+                           warm_start=False):
     """
     What we need:
     read from the para;  
     
     run_single_test( ('gen-mp', img_name, trial_i, x_star, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c))
     method, img_name, _, x_err, num_epochs, x_hat, list_run_time, list_loss, list_est_err = re
+
+    X'X and X'y come from the shared DesignCache and the graph handle is built once for all methods.
+    :param methods: methods to run (a subset of METHODS), all of them if None.
+    :param n_jobs:  number of threads the methods are spread over. The projections release
+                    the GIL, so the methods run concurrently on the shared graph.
+    :param gradient: 'auto', 'gram' or 'matrix-free', how X'X is applied (see design_terms).
+    :param stopping: StoppingRule of every method, StoppingRule() if None.
+    :param recorder: utils.trace.TraceRecorder that gets a trace of every method, or None.
+    :param warm_start: warm-start the lambda bisection of the projections (see algo_graph_iht).
+    :return: trial_i, {method: [x_hat, list_run_time, list_loss, list_est_err]} in the order of methods
     """
     trial_i, x_mat, y, edges, costs, s, g, max_epochs, tol_algo, step, c = para
     np.random.seed(trial_i)
     img_name = 'dummy'
+    methods = METHODS if methods is None else list(methods)
+    unknown = [method for method in methods if method not in METHODS]
+    if unknown:
+        raise ValueError(f"Unknown signal family method(s): {unknown}. Supported methods are: {METHODS}.")
+    edges = build_graph(edges, costs, x_mat.shape[1])
+    xtx, xty = design_terms(x_mat, y, gradient=gradient)
+
+    def run(method):
+        trace = None if recorder is None else recorder.trace(method, trial=trial_i, k=s)
+        return run_single_solver(
+            (method, img_name, trial_i, y, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c),
+            xtx=xtx, xty=xty, stopping=stopping, trace=trace, warm_start=warm_start)
+
+    if n_jobs > 1 and len(methods) > 1:
+        with ThreadPool(min(n_jobs, len(methods))) as pool:
+            res = pool.map(run, methods)
+    else:
+        res = [run(method) for method in methods]
 
     results = {}
+    for method, img_name, _, x_err, num_epochs, x_hat, list_run_time, list_loss, list_est_err in res:
+        results[method] = [x_hat, list_run_time, list_loss, list_est_err]
+    return trial_i, results
 
-    re = run_single_solver(
-        ('gen-mp', img_name, trial_i, y, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c))
-    method, img_name, _, x_err, num_epochs, x_hat, list_run_time, list_loss, list_est_err = re
-    results['gen-mp'] = [x_hat, list_run_time, list_loss, list_est_err]
-
-    re = run_single_solver(
-        ('dmo-acc-fw', img_name, trial_i, y, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c))
-    method, img_name, _, x_err, num_epochs, x_hat, list_run_time, list_loss, list_est_err = re
-    results['dmo-acc-fw'] = [x_hat, list_run_time, list_loss, list_est_err]
-
-    re = run_single_solver(
-        ('graph-cosamp', img_name, trial_i, y, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c))
-    method, img_name, _, x_err, num_epochs, x_hat, list_run_time, list_loss, list_est_err = re
-    results['graph-cosamp'] = [x_hat, list_run_time, list_loss, list_est_err]
 
-    re = run_single_solver(
-        ('cosamp', img_name, trial_i, y, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c))
-    method, img_name, _, x_err, num_epochs, x_hat, list_run_time, list_loss, list_est_err = re
-    results['cosamp'] = [x_hat, list_run_time, list_loss, list_est_err]
+METHODS = ['gen-mp', 'dmo-acc-fw', 'graph-cosamp', 'cosamp', 'graph-iht']
 
-    re = run_single_solver(
-        ('graph-iht', img_name, trial_i, y, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c))
-    method, img_name, _, x_err, num_epochs, x_hat, list_run_time, list_loss, list_est_err = re
-    results['graph-iht'] = [x_hat, list_run_time, list_loss, list_est_err]
 
-    return trial_i, results
+def sparse_learning_path(para, gradient='auto', stopping=None, recorder=None, warm_start=False):
+    """
+    Same as sparse_learning_solver, but solves every method for each sparsity level in
+    s_grid. Levels are visited in increasing order, each warm-started from the solution
+    at the previous level, and the Gram matrix comes from the shared DesignCache.
+    :param gradient: 'auto', 'gram' or 'matrix-free', how X'X is applied (see design_terms).
+    :param stopping: StoppingRule of every method, StoppingRule() if None.
+    :param recorder: utils.trace.TraceRecorder that gets a trace of every method and level, or None.
+    :param warm_start: warm-start the lambda bisection of the projections (see algo_graph_iht).
+    :return: trial_i, {method: array of shape (len(s_grid), p) in the order of s_grid}
+    """
+    trial_i, x_mat, y, edges, costs, s_grid, g, max_epochs, tol_algo, step, c = para
+    np.random.seed(trial_i)
+    img_name = 'dummy'
+    p = x_mat.shape[1]
+    xtx, xty = design_terms(x_mat, y, gradient=gradient)
+    edges = build_graph(edges, costs, p)
+
+    paths = {}
+    for method in METHODS:
+        path = np.zeros((len(s_grid), p))
+        x_hat = None
+        for idx in np.argsort(s_grid):
+            s = int(s_grid[idx])
+            trace = None if recorder is None else recorder.trace(method, trial=trial_i, k=s)
+            re = run_single_solver(
+                (method, img_name, trial_i, y, max_epochs, tol_algo, step, x_mat, edges, costs, g, s, c),
+                x0=x_hat, xtx=xtx, xty=xty, stopping=stopping, trace=trace, warm_start=warm_start)
+            x_hat = re[5]
+            path[idx] = x_hat
+        paths[method] = path
+    return trial_i, paths
@@ -0,0 +1,15 @@
+function [beta, funcVal] = gfl_pqn_inmem(X, y, L_i, L_j, L_v, d, rho, mu, k)
+    % gfl_pqn_inmem: in-memory entry point of gfl_pqn for the MATLAB engine.
+    % The Laplacian is passed in triplet form (1-based indices) and rebuilt as a
+    % sparse matrix, so no .mat file is written or read.
+    %
+    % Inputs:
+    %   X             - Feature matrix (n x d)
+    %   y             - Target vector (n x 1)
+    %   L_i, L_j, L_v - Row indices, column indices and values of L
+    %   d             - Number of features
+    %   rho, mu, k    - See gfl_pqn
+
+    L = sparse(L_i, L_j, L_v, d, d);
+    [beta, funcVal] = gfl_pqn_solve(X, y, L, rho, mu, k);
+end
@@ -7,7 +7,6 @@
 // TODO Warning about the size of the buffer: 1. You need to change it if
 // your graph has huge number of nodes, say 10 millions.
 #define MAX_BUFFER_SIZE 100000
-PHNode *buffer[MAX_BUFFER_SIZE];
 
 // priority queue of bubble up
 static inline void pq_bubble_up(PriorityQueue *q, int i) {
@@ -103,7 +102,8 @@ static PHNode *ph_linking(PHNode *node1, PHNode *node2) {
     return smaller_node;
 }
 
-// Warning: When you do parallel, a lock needs to be added.
+// heap->buffer belongs to the pcst instance (see make_pcst), so instances
+// do not share any state.
 static bool ph_delete_min(PairingHeap *heap, double *value, int *payload) {
     if (heap->root == NULL) {
         return false;
@@ -216,7 +216,8 @@ PCST *make_pcst(const EdgePair *edges,
     // number of cluster queue is at most 2*n
     pcst->c_queue = malloc(sizeof(int) * left(n));
     pcst->final_comp_label = malloc(sizeof(int) * n);
-    pcst->final_comp = malloc(sizeof(Array) * g);
+    // g <= n; sized by n so that reset_pcst can change g
+    pcst->final_comp = malloc(sizeof(Array) * (g > n ? g : n));
     pcst->strong_parent = malloc(sizeof(KeyPair) * n);
     pcst->strong_pay = malloc(sizeof(double) * n);
     pcst->e_parts = malloc(sizeof(EdgePart) * left(m));
@@ -228,6 +229,7 @@ PCST *make_pcst(const EdgePair *edges,
     pcst->inact_merge_e = malloc(sizeof(InactiveMergeEvent) * left(n));
     pcst->p1_re = malloc(sizeof(int) * n);
     pcst->p2_re = malloc(sizeof(int) * n);
+    pcst->ph_buffer = malloc(sizeof(PHNode *) * MAX_BUFFER_SIZE);
     pcst->verbose = verbose;
     if (pcst->verbose > 0) {
         for (int ii = 0; ii < 79; ii++) { printf("%s", "-"); } // line
@@ -257,6 +259,22 @@ PCST *make_pcst(const EdgePair *edges,
     return pcst;
 }
 
+// to reuse a pcst instance with new prizes, costs, root and g
+void reset_pcst(PCST *pcst, const double *prizes, const double *costs,
+                int root, int g, int verbose) {
+    pcst->root = root;
+    pcst->g = g;
+    pcst->verbose = verbose;
+    for (int ii = 0; ii < pcst->n; ii++) {
+        pcst->prizes[ii] = prizes[ii];
+    }
+    if (costs != NULL) {
+        for (int ii = 0; ii < pcst->m; ii++) {
+            pcst->costs[ii] = costs[ii];
+        }
+    }
+}
+
 // to run pcst algorithm
 bool run_pcst(PCST *pcst,
               Array *result_nodes,
@@ -268,6 +286,9 @@ bool run_pcst(PCST *pcst,
     pcst->p1_re_size = 0;
     pcst->p2_re_size = 0;
     pcst->inact_m_e_len = 0;
+    // empty the queues left over from a previous run
+    pcst->c_deact->size = 1;
+    pcst->c_event->size = 1;
     for (int ii = 0; ii < pcst->n; ii++) {
         pcst->node_good[ii] = false;
         pcst->node_deleted[ii] = false;
@@ -281,7 +302,7 @@ bool run_pcst(PCST *pcst,
     for (int ii = 0; ii < 2 * pcst->n; ii++) {
         pcst->ph_heaps[ii].num_nodes = 0;
         pcst->ph_heaps[ii].root = NULL;
-        pcst->ph_heaps[ii].buffer = buffer;
+        pcst->ph_heaps[ii].buffer = pcst->ph_buffer;
     }
     // mark inactive_merge_event
     for (int ii = 0; ii < pcst->m; ii++) {
@@ -1087,6 +1108,8 @@ bool free_pcst(PCST *pcst) {
     pcst->c_deact->queue = NULL;
     free(pcst->c_deact);
     pcst->c_deact = NULL;
+    free(pcst->ph_buffer);
+    pcst->ph_buffer = NULL;
     free(pcst->p2_re);
     pcst->p2_re = NULL;
     free(pcst->p1_re);
@@ -172,6 +172,9 @@ typedef struct {
     // phase2_results
     int *p2_re;
     int p2_re_size;
+    // scratch space of ph_delete_min, one per instance so that instances
+    // can run concurrently
+    PHNode **ph_buffer;
 } PCST;
 
 /**
@@ -192,6 +195,15 @@ PCST *make_pcst(const EdgePair *edges, const double *prizes,
                 const double *costs, int root, int g, double eps,
                 PruningMethod pruning, int n, int m, int verbose);
 
+/**
+ * Reuse an instance made by make_pcst for new prizes, costs, root and g on
+ * the same edges, so that repeated runs skip the allocations of make_pcst.
+ * @param prizes: list of prizes (n). non-negative.
+ * @param costs: list of costs on edges (m). NULL keeps the current costs.
+ */
+void reset_pcst(PCST *pcst, const double *prizes, const double *costs,
+                int root, int g, int verbose);
+
 bool run_pcst(PCST *pcst, Array *result_nodes, Array *result_edges);
 
 void get_sum_on_edge_part(PCST *pcst, int edge_part_index, double *total_sum,
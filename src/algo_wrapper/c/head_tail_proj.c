@@ -12,6 +12,7 @@ GraphStat *make_graph_stat(int p, int m) {
     stat->re_nodes->size = 0;
     stat->re_nodes->array = malloc(sizeof(int) * p);
     stat->run_time = 0;
+    stat->lambda = 0.0;
     stat->costs = malloc(sizeof(double) * m);
     stat->prizes = malloc(sizeof(double) * p);
     return stat;
@@ -795,11 +796,26 @@ bool cluster_grid_pcst_bisearch(
 }
 
 
-bool head_tail_bisearch(
-        const EdgePair *edges, const double *costs, const double *prizes,
-        int n, int m, int target_num_clusters, int root, int sparsity_low,
-        int sparsity_high, int max_num_iter, PruningMethod pruning,
+// run pcst once with costs scaled by lambda, returns the number of nodes
+static int probe_lambda(
+        PCST *pcst, const double *costs, double *cur_costs,
+        const double *prizes, double lambda, int root, int target_num_clusters,
         int verbose, GraphStat *stat) {
+    for (int ii = 0; ii < pcst->m; ii++) {
+        cur_costs[ii] = lambda * costs[ii];
+    }
+    reset_pcst(pcst, prizes, cur_costs, root, target_num_clusters, verbose);
+    run_pcst(pcst, stat->re_nodes, stat->re_edges);
+    stat->num_pcst += 1;
+    return stat->re_nodes->size;
+}
+
+bool head_tail_bisearch_pcst(
+        PCST *pcst, const double *costs, const double *prizes,
+        int n, int m, int target_num_clusters, int root, int sparsity_low,
+        int sparsity_high, int max_num_iter, double lambda_init, int verbose,
+        GraphStat *stat) {
+    const EdgePair *edges = pcst->edges;
 
     // malloc: cur_costs, sorted_prizes, and sorted_indices
     // free: cur_costs, sorted_prizes, and sorted_indices
@@ -812,24 +828,27 @@ bool head_tail_bisearch(
     for (int ii = 0; ii < n; ii++) {
         sorted_prizes[ii] = prizes[ii];
     }
-    int guess_pos = n - sparsity_high;
-    arg_sort_descend(sorted_prizes, sorted_indices, n);
     double lambda_low = 0.0;
-    double lambda_high = 2.0 * sorted_prizes[sorted_indices[guess_pos]];
+    double lambda_high = lambda_init;
     bool using_sparsity_low = false;
     bool using_max_value = false;
-    if (lambda_high == 0.0) {
-        guess_pos = n - sparsity_low;
+    if (lambda_init <= 0.0) {
+        int guess_pos = n - sparsity_high;
+        arg_sort_descend(sorted_prizes, sorted_indices, n);
         lambda_high = 2.0 * sorted_prizes[sorted_indices[guess_pos]];
-        if (lambda_high != 0.0) {
-            using_sparsity_low = true;
-        } else {
-            using_max_value = true;
-            lambda_high = prizes[0];
-            for (int ii = 1; ii < n; ii++) {
-                lambda_high = fmax(lambda_high, prizes[ii]);
+        if (lambda_high == 0.0) {
+            guess_pos = n - sparsity_low;
+            lambda_high = 2.0 * sorted_prizes[sorted_indices[guess_pos]];
+            if (lambda_high != 0.0) {
+                using_sparsity_low = true;
+            } else {
+                using_max_value = true;
+                lambda_high = prizes[0];
+                for (int ii = 1; ii < n; ii++) {
+                    lambda_high = fmax(lambda_high, prizes[ii]);
+                }
+                lambda_high *= 2.0;
             }
-            lambda_high *= 2.0;
         }
     }
     if (verbose >= 1) {
@@ -837,7 +856,9 @@ bool head_tail_bisearch(
         const char *sparsity_high_text = "k_high";
         const char *max_value_text = "max value";
         const char *guess_text = sparsity_high_text;
-        if (using_sparsity_low) {
+        if (lambda_init > 0.0) {
+            guess_text = "the given lambda";
+        } else if (using_sparsity_low) {
             guess_text = sparsity_low_text;
         } else if (using_max_value) {
             guess_text = max_value_text;
@@ -848,47 +869,99 @@ bool head_tail_bisearch(
                lambda_low, lambda_high, max_num_iter, guess_text);
     }
     stat->num_iter = 0;
-    lambda_high /= 2.0;
+    stat->num_pcst = 0;
     int cur_k;
-    do {
+    bool grow = true;
+    if (lambda_init > 0.0) {
+        // warm start: probe the given lambda first, then double it (too many
+        // nodes) or halve it (too few) until the target sparsity is bracketed
         stat->num_iter += 1;
-        lambda_high *= 2.0;
-        for (int ii = 0; ii < m; ii++) {
-            cur_costs[ii] = lambda_high * costs[ii];
-        }
+        cur_k = probe_lambda(pcst, costs, cur_costs, prizes, lambda_init, root,
+                             target_num_clusters, verbose, stat);
         if (verbose >= 1) {
-            for (int ii = 0; ii < m; ii++) {
-                printf("E %d %d %.15f\n", edges[ii].first, edges[ii].second,
-                       cur_costs[ii]);
+            printf("warm start: l_init: %e  k: %d\n", lambda_init, cur_k);
+        }
+        if (sparsity_low <= cur_k && cur_k <= sparsity_high) {
+            stat->lambda = lambda_init;
+            free(cur_costs);
+            free(sorted_prizes);
+            free(sorted_indices);
+            return true;
+        }
+        if (cur_k > sparsity_high) {
+            lambda_low = lambda_init;
+            lambda_high = lambda_init;
+        } else {
+            grow = false;
+            double lambda_try = lambda_init;
+            while (cur_k < sparsity_low && stat->num_iter < max_num_iter) {
+                lambda_high = lambda_try;
+                lambda_try /= 2.0;
+                stat->num_iter += 1;
+                cur_k = probe_lambda(pcst, costs, cur_costs, prizes,
+                                     lambda_try, root, target_num_clusters,
+                                     verbose, stat);
+                if (verbose >= 1) {
+                    printf("decrease:   l_low: %e  k: %d\n", lambda_try, cur_k);
+                }
+                if (sparsity_low <= cur_k && cur_k <= sparsity_high) {
+                    stat->lambda = lambda_try;
+                    free(cur_costs);
+                    free(sorted_prizes);
+                    free(sorted_indices);
+                    return true;
+                }
             }
-            for (int ii = 0; ii < n; ii++) {
-                printf("N %d %.15f\n", ii, prizes[ii]);
+            if (cur_k > sparsity_high) {
+                lambda_low = lambda_try;
+            } else {
+                lambda_high = lambda_try;
             }
-            printf("\n");
-            printf("lambda_high: %f\n", lambda_high);
-            printf("target_num_clusters: %d\n", target_num_clusters);
         }
-        PCST *pcst = make_pcst(
-                edges, prizes, cur_costs, root, target_num_clusters,
-                1e-10, pruning, n, m, verbose);
-        run_pcst(pcst, stat->re_nodes, stat->re_edges);
-        free_pcst(pcst);
-        cur_k = stat->re_nodes->size;
+    } else {
+        lambda_high /= 2.0;
+    }
+    if (grow) {
+        do {
+            stat->num_iter += 1;
+            lambda_high *= 2.0;
+            for (int ii = 0; ii < m; ii++) {
+                cur_costs[ii] = lambda_high * costs[ii];
+            }
+            if (verbose >= 1) {
+                for (int ii = 0; ii < m; ii++) {
+                    printf("E %d %d %.15f\n", edges[ii].first, edges[ii].second,
+                           cur_costs[ii]);
+                }
+                for (int ii = 0; ii < n; ii++) {
+                    printf("N %d %.15f\n", ii, prizes[ii]);
+                }
+                printf("\n");
+                printf("lambda_high: %f\n", lambda_high);
+                printf("target_num_clusters: %d\n", target_num_clusters);
+            }
+            reset_pcst(pcst, prizes, cur_costs, root, target_num_clusters,
+                       verbose);
+            run_pcst(pcst, stat->re_nodes, stat->re_edges);
+            stat->num_pcst += 1;
+            cur_k = stat->re_nodes->size;
 
-        if (verbose >= 1) {
-            printf("increase:   l_high: %e  k: %d\n", lambda_high, cur_k);
-        }
-    } while (cur_k > sparsity_high && stat->num_iter < max_num_iter);
+            if (verbose >= 1) {
+                printf("increase:   l_high: %e  k: %d\n", lambda_high, cur_k);
+            }
+        } while (cur_k > sparsity_high && stat->num_iter < max_num_iter);
 
-    if (stat->num_iter < max_num_iter && cur_k >= sparsity_low) {
-        if (verbose >= 1) {
-            printf("Found good lambda in exponential "
-                   "increase phase, returning.\n");
+        if (stat->num_iter < max_num_iter && cur_k >= sparsity_low) {
+            if (verbose >= 1) {
+                printf("Found good lambda in exponential "
+                       "increase phase, returning.\n");
+            }
+            stat->lambda = lambda_high;
+            free(cur_costs);
+            free(sorted_prizes);
+            free(sorted_indices);
+            return true;
         }
-        free(cur_costs);
-        free(sorted_prizes);
-        free(sorted_indices);
-        return true;
     }
     double lambda_mid;
     while (stat->num_iter < max_num_iter) {
@@ -897,11 +970,10 @@ bool head_tail_bisearch(
         for (int ii = 0; ii < m; ii++) {
             cur_costs[ii] = lambda_mid * costs[ii];
         }
-        PCST *pcst = make_pcst(
-                edges, prizes, cur_costs, root, target_num_clusters, 1e-10,
-                pruning, n, m, verbose);
+        reset_pcst(pcst, prizes, cur_costs, root, target_num_clusters,
+                   verbose);
         run_pcst(pcst, stat->re_nodes, stat->re_edges);
-        free_pcst(pcst);
+        stat->num_pcst += 1;
         cur_k = stat->re_nodes->size;
         if (verbose >= 1) {
             for (int ii = 0; ii < m; ii++) {
@@ -920,6 +992,7 @@ bool head_tail_bisearch(
                 printf("Found good lambda in binary "
                        "search phase, returning.\n");
             }
+            stat->lambda = lambda_mid;
             free(cur_costs);
             free(sorted_prizes);
             free(sorted_indices);
@@ -931,13 +1004,14 @@ bool head_tail_bisearch(
             lambda_high = lambda_mid;
         }
     }
+    stat->lambda = lambda_high;
     for (int ii = 0; ii < m; ++ii) {
         cur_costs[ii] = lambda_high * costs[ii];
     }
-    PCST *pcst = make_pcst(edges, prizes, cur_costs, root, target_num_clusters,
-                           1e-10, pruning, n, m, verbose);
+    reset_pcst(pcst, prizes, cur_costs, root, target_num_clusters,
+               verbose);
     run_pcst(pcst, stat->re_nodes, stat->re_edges);
-    free_pcst(pcst);
+    stat->num_pcst += 1;
     if (verbose >= 1) {
         for (int ii = 0; ii < m; ii++) {
             printf("E %d %d %.15f\n", edges[ii].first, edges[ii].second,
@@ -956,4 +1030,19 @@ bool head_tail_bisearch(
     free(sorted_prizes);
     free(sorted_indices);
     return true;
-}
\ No newline at end of file
+}
+
+bool head_tail_bisearch(
+        const EdgePair *edges, const double *costs, const double *prizes,
+        int n, int m, int target_num_clusters, int root, int sparsity_low,
+        int sparsity_high, int max_num_iter, PruningMethod pruning,
+        int verbose, GraphStat *stat) {
+    // one pcst instance is shared by all of the lambda probes
+    PCST *pcst = make_pcst(edges, prizes, costs, root, target_num_clusters,
+                           1e-10, pruning, n, m, verbose);
+    bool re = head_tail_bisearch_pcst(
+            pcst, costs, prizes, n, m, target_num_clusters, root,
+            sparsity_low, sparsity_high, max_num_iter, 0.0, verbose, stat);
+    free_pcst(pcst);
+    return re;
+}
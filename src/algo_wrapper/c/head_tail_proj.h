@@ -22,7 +22,9 @@ typedef struct {
     Array *re_edges;
     double *prizes;
     double *costs;
+    // number of pcst runs and final lambda of the last head_tail_bisearch
     int num_pcst;
+    double lambda;
     double run_time;
     int num_iter;
 } GraphStat;
@@ -90,4 +92,20 @@ bool head_tail_bisearch(
         int sparsity_high, int max_num_iter, PruningMethod pruning,
         int verbose, GraphStat *stat);
 
+/**
+ * head_tail_bisearch on a pcst instance made by make_pcst on the same edges.
+ * The instance is reset for every lambda probe instead of being rebuilt, so
+ * one instance can serve many projections (see Graph in main_wrapper.c).
+ * @param costs: the unscaled edge costs (m).
+ * @param lambda_init: lambda to start the search from, typically the one found
+ * by the previous projection (stat->lambda). <= 0 starts from the guess of
+ * head_tail_bisearch. The lambda used and the number of pcst runs are stored
+ * in stat->lambda and stat->num_pcst.
+ */
+bool head_tail_bisearch_pcst(
+        PCST *pcst, const double *costs, const double *prizes,
+        int n, int m, int target_num_clusters, int root, int sparsity_low,
+        int sparsity_high, int max_num_iter, double lambda_init, int verbose,
+        GraphStat *stat);
+
 #endif //FAST_PCST_HEAD_TAIL_PROJ_H
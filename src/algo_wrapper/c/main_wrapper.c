@@ -1,7 +1,14 @@
 #include <Python.h>
+#include <structmember.h>
 #include <numpy/arrayobject.h>
 #include "head_tail_proj.h"
 
+#ifdef _OPENMP
+#include <omp.h>
+#else
+static int omp_get_thread_num(void) { return 0; }
+#endif
+
 static PyObject *wrap_head_tail_bisearch(PyObject *self, PyObject *args) {
     if (self == NULL) { printf("error: unknown error !!\n"); }
     head_tail_bisearch_para *para = malloc(sizeof(head_tail_bisearch_para));
@@ -44,9 +51,454 @@ static PyObject *wrap_head_tail_bisearch(PyObject *self, PyObject *args) {
     return results;
 }
 
+/* Node indices must lie in [0, p); checked on the caller's array before any
+ * conversion so that int64 values do not wrap around silently. */
+static int check_edge_range(PyArrayObject *edges_, int p) {
+    npy_intp m = PyArray_DIM(edges_, 0);
+    int is_int64 = PyArray_TYPE(edges_) == NPY_INT64;
+    for (npy_intp i = 0; i < m; i++) {
+        for (int j = 0; j < 2; j++) {
+            void *ptr = PyArray_GETPTR2(edges_, i, j);
+            long long v = is_int64 ? *(npy_int64 *) ptr : *(npy_int32 *) ptr;
+            if (v < 0 || v >= p) {
+                PyErr_Format(PyExc_ValueError,
+                             "edge %zd has node %lld outside [0, %d)",
+                             (Py_ssize_t) i, v, p);
+                return 0;
+            }
+        }
+    }
+    return 1;
+}
+
+/* A C-contiguous (m, 2) int32 array has the memory layout of EdgePair and is
+ * used in place (new reference to the same array). int64 edges are converted
+ * to int32 once per call. */
+static PyArrayObject *as_edge_pairs(PyArrayObject *edges_, int p) {
+    if (PyArray_NDIM(edges_) != 2 || PyArray_DIM(edges_, 1) != 2) {
+        PyErr_SetString(PyExc_ValueError, "edges must have shape (m, 2)");
+        return NULL;
+    }
+    if (PyArray_TYPE(edges_) != NPY_INT32 && PyArray_TYPE(edges_) != NPY_INT64) {
+        PyErr_SetString(PyExc_TypeError, "edges must be int32 or int64");
+        return NULL;
+    }
+    if (!PyArray_ISNOTSWAPPED(edges_)) {
+        PyErr_SetString(PyExc_TypeError, "edges must be in native byte order");
+        return NULL;
+    }
+    if (!check_edge_range(edges_, p)) { return NULL; }
+    if (PyArray_TYPE(edges_) == NPY_INT32 && PyArray_IS_C_CONTIGUOUS(edges_)
+        && PyArray_ISALIGNED(edges_) && sizeof(EdgePair) == 2 * sizeof(npy_int32)) {
+        Py_INCREF(edges_);
+        return edges_;
+    }
+    return (PyArrayObject *) PyArray_FROM_OTF(
+            (PyObject *) edges_, NPY_INT32, NPY_ARRAY_IN_ARRAY | NPY_ARRAY_FORCECAST);
+}
+
+static int check_double_vector(PyArrayObject *arr, npy_intp size, const char *name) {
+    if (PyArray_TYPE(arr) != NPY_DOUBLE || PyArray_NDIM(arr) != 1
+        || !PyArray_IS_C_CONTIGUOUS(arr) || !PyArray_ISALIGNED(arr)
+        || !PyArray_ISNOTSWAPPED(arr)) {
+        PyErr_Format(PyExc_TypeError,
+                     "%s must be a C-contiguous 1-d float64 array", name);
+        return 0;
+    }
+    if (size >= 0 && PyArray_DIM(arr, 0) != size) {
+        PyErr_Format(PyExc_ValueError, "%s must have length %zd",
+                     name, (Py_ssize_t) size);
+        return 0;
+    }
+    return 1;
+}
+
+/**
+ * Same projection as wrap_head_tail_bisearch, but
+ *  - edges are read in place when they are a C-contiguous int32 (m, 2) array
+ *    (int64 edges are converted once),
+ *  - dtype, shape and contiguity of all arrays are validated,
+ *  - the GIL is released while head_tail_bisearch runs,
+ *  - the selected nodes are returned as a 1-d int32 numpy array.
+ */
+static PyObject *wrap_head_tail_bisearch_np(PyObject *self, PyObject *args) {
+    (void) self;
+    PyArrayObject *edges_, *costs_, *prizes_;
+    int g, root, sparsity_low, sparsity_high, max_num_iter, verbose;
+    if (!PyArg_ParseTuple(args, "O!O!O!iiiiii",
+                          &PyArray_Type, &edges_,
+                          &PyArray_Type, &prizes_,
+                          &PyArray_Type, &costs_,
+                          &g, &root, &sparsity_low, &sparsity_high,
+                          &max_num_iter, &verbose)) { return NULL; }
+    if (!check_double_vector(prizes_, -1, "prizes")) { return NULL; }
+    int p = (int) PyArray_DIM(prizes_, 0);
+    PyArrayObject *edges = as_edge_pairs(edges_, p);
+    if (edges == NULL) { return NULL; }
+    int m = (int) PyArray_DIM(edges, 0);
+    if (!check_double_vector(costs_, m, "costs")) {
+        Py_DECREF(edges);
+        return NULL;
+    }
+    const EdgePair *edge_pairs = (const EdgePair *) PyArray_DATA(edges);
+    const double *prizes = (const double *) PyArray_DATA(prizes_);
+    const double *costs = (const double *) PyArray_DATA(costs_);
+
+    GraphStat *graph_stat = make_graph_stat(p, m);
+    Py_BEGIN_ALLOW_THREADS
+    head_tail_bisearch(
+            edge_pairs, costs, prizes, p, m, g, root, sparsity_low,
+            sparsity_high, max_num_iter, GWPruning, verbose, graph_stat);
+    Py_END_ALLOW_THREADS
+    Py_DECREF(edges);
+
+    npy_intp size = graph_stat->re_nodes->size;
+    PyArrayObject *re_nodes = (PyArrayObject *) PyArray_SimpleNew(1, &size, NPY_INT32);
+    if (re_nodes != NULL && size > 0) {
+        memcpy(PyArray_DATA(re_nodes), graph_stat->re_nodes->array,
+               sizeof(npy_int32) * size);
+    }
+    free_graph_stat(graph_stat);
+    return (PyObject *) re_nodes;
+}
+
+/**
+ * Graph(edges, costs, n): a graph on n nodes whose edges and costs are copied
+ * once, together with a stack of idle PCST instances (with their work
+ * buffers) that head_tail_bisearch reuses for every lambda probe of every
+ * projection instead of rebuilding them each time. A call takes an instance
+ * off the stack (making one if the stack is empty) and puts it back when it
+ * is done, so threads sharing a Graph project concurrently with the GIL
+ * released. The stack is only touched while holding the GIL. The lambda
+ * returned by a projection can be passed back as lambda0 to warm-start the
+ * next one.
+ */
+typedef struct {
+    PCST *pcst;
+    GraphStat *stat;
+} Workspace;
+
+typedef struct {
+    PyObject_HEAD
+    int n;
+    int m;
+    EdgePair *edges;
+    double *costs;
+    Workspace *idle;
+    int num_idle;
+    int max_idle;
+} GraphObject;
+
+static void Graph_dealloc(GraphObject *self) {
+    for (int i = 0; i < self->num_idle; i++) {
+        free_pcst(self->idle[i].pcst);
+        free_graph_stat(self->idle[i].stat);
+    }
+    free(self->idle);
+    free(self->edges);
+    free(self->costs);
+    Py_TYPE(self)->tp_free((PyObject *) self);
+}
+
+// take an idle workspace off the stack, or make a new one
+static int Graph_checkout(GraphObject *self, Workspace *ws) {
+    if (self->num_idle > 0) {
+        *ws = self->idle[--self->num_idle];
+        return 1;
+    }
+    double *prizes = calloc((size_t) self->n, sizeof(double));
+    if (prizes == NULL) {
+        PyErr_NoMemory();
+        return 0;
+    }
+    ws->pcst = make_pcst(self->edges, prizes, self->costs, -1, 1, 1e-10,
+                         GWPruning, self->n, self->m, 0);
+    ws->stat = make_graph_stat(self->n, self->m);
+    free(prizes);
+    return 1;
+}
+
+static void Graph_checkin(GraphObject *self, Workspace ws) {
+    if (self->num_idle == self->max_idle) {
+        int max_idle = self->max_idle == 0 ? 4 : 2 * self->max_idle;
+        Workspace *idle = realloc(self->idle, sizeof(Workspace) * max_idle);
+        if (idle == NULL) {
+            free_pcst(ws.pcst);
+            free_graph_stat(ws.stat);
+            return;
+        }
+        self->idle = idle;
+        self->max_idle = max_idle;
+    }
+    self->idle[self->num_idle++] = ws;
+}
+
+static int Graph_init(GraphObject *self, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {"edges", "costs", "n", NULL};
+    PyArrayObject *edges_, *costs_;
+    int n;
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O!i", kwlist,
+                                     &PyArray_Type, &edges_,
+                                     &PyArray_Type, &costs_, &n)) { return -1; }
+    if (self->edges != NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "Graph is already initialized");
+        return -1;
+    }
+    if (n <= 0) {
+        PyErr_SetString(PyExc_ValueError, "n must be positive");
+        return -1;
+    }
+    PyArrayObject *edges = as_edge_pairs(edges_, n);
+    if (edges == NULL) { return -1; }
+    int m = (int) PyArray_DIM(edges, 0);
+    if (!check_double_vector(costs_, m, "costs")) {
+        Py_DECREF(edges);
+        return -1;
+    }
+    self->n = n;
+    self->m = m;
+    self->edges = malloc(sizeof(EdgePair) * (m + 1));
+    self->costs = malloc(sizeof(double) * (m + 1));
+    if (self->edges == NULL || self->costs == NULL) {
+        Py_DECREF(edges);
+        PyErr_NoMemory();
+        return -1;
+    }
+    memcpy(self->edges, PyArray_DATA(edges), sizeof(EdgePair) * m);
+    memcpy(self->costs, PyArray_DATA(costs_), sizeof(double) * m);
+    Py_DECREF(edges);
+    // one workspace up front, the common single-threaded case never grows
+    Workspace ws;
+    if (!Graph_checkout(self, &ws)) { return -1; }
+    Graph_checkin(self, ws);
+    return 0;
+}
+
+static PyObject *Graph_head_tail_bisearch(GraphObject *self, PyObject *args) {
+    PyArrayObject *prizes_;
+    int g, root, sparsity_low, sparsity_high, max_num_iter, verbose;
+    double lambda_init = 0.0;
+    if (self->edges == NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "Graph is not initialized");
+        return NULL;
+    }
+    if (!PyArg_ParseTuple(args, "O!iiiiii|d", &PyArray_Type, &prizes_,
+                          &g, &root, &sparsity_low, &sparsity_high,
+                          &max_num_iter, &verbose, &lambda_init)) { return NULL; }
+    if (!check_double_vector(prizes_, self->n, "prizes")) { return NULL; }
+    const double *prizes = (const double *) PyArray_DATA(prizes_);
+
+    Workspace ws;
+    if (!Graph_checkout(self, &ws)) { return NULL; }
+    Py_BEGIN_ALLOW_THREADS
+    head_tail_bisearch_pcst(
+            ws.pcst, self->costs, prizes, self->n, self->m, g, root,
+            sparsity_low, sparsity_high, max_num_iter, lambda_init, verbose,
+            ws.stat);
+    Py_END_ALLOW_THREADS
+    double lambda = ws.stat->lambda;
+    int num_pcst = ws.stat->num_pcst;
+
+    npy_intp size = ws.stat->re_nodes->size;
+    PyArrayObject *re_nodes = (PyArrayObject *) PyArray_SimpleNew(1, &size, NPY_INT32);
+    if (re_nodes != NULL && size > 0) {
+        memcpy(PyArray_DATA(re_nodes), ws.stat->re_nodes->array,
+               sizeof(npy_int32) * size);
+    }
+    Graph_checkin(self, ws);
+    if (re_nodes == NULL) { return NULL; }
+    return Py_BuildValue("Ndi", re_nodes, lambda, num_pcst);
+}
+
+static PyObject *Graph_head_tail_bisearch_batch(GraphObject *self, PyObject *args,
+                                                PyObject *kwds) {
+    static char *kwlist[] = {"prizes", "g", "root", "s_low", "s_high", "max_num_iter",
+                             "verbose", "lambda0", "num_threads", NULL};
+    PyArrayObject *prizes_;
+    PyObject *lambda0_ = Py_None;
+    int g, root, sparsity_low, sparsity_high, max_num_iter, verbose = 0, num_threads = 0;
+    if (self->edges == NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "Graph is not initialized");
+        return NULL;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!iiiii|iOi", kwlist,
+                                     &PyArray_Type, &prizes_, &g, &root,
+                                     &sparsity_low, &sparsity_high, &max_num_iter,
+                                     &verbose, &lambda0_, &num_threads)) { return NULL; }
+    if (PyArray_TYPE(prizes_) != NPY_DOUBLE || PyArray_NDIM(prizes_) != 2
+        || !PyArray_IS_C_CONTIGUOUS(prizes_) || !PyArray_ISALIGNED(prizes_)
+        || !PyArray_ISNOTSWAPPED(prizes_)) {
+        PyErr_SetString(PyExc_TypeError,
+                        "prizes must be a C-contiguous 2-d float64 array");
+        return NULL;
+    }
+    if (PyArray_DIM(prizes_, 1) != self->n) {
+        PyErr_Format(PyExc_ValueError, "prizes must have shape (B, %d)", self->n);
+        return NULL;
+    }
+    npy_intp batch = PyArray_DIM(prizes_, 0);
+    PyArrayObject *lambda0 = NULL;
+    if (lambda0_ != Py_None) {
+        lambda0 = (PyArrayObject *) PyArray_FROM_OTF(lambda0_, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+        if (lambda0 == NULL) { return NULL; }
+        if (PyArray_NDIM(lambda0) != 1 || PyArray_DIM(lambda0, 0) != batch) {
+            PyErr_SetString(PyExc_ValueError, "lambda0 must have one entry per row of prizes");
+            Py_DECREF(lambda0);
+            return NULL;
+        }
+    }
+#ifdef _OPENMP
+    if (num_threads <= 0) { num_threads = omp_get_max_threads(); }
+#else
+    num_threads = 1;
+#endif
+    if (num_threads > batch) { num_threads = (int) batch; }
+    if (num_threads < 1) { num_threads = 1; }
+
+    PyArrayObject *lambdas = (PyArrayObject *) PyArray_SimpleNew(1, &batch, NPY_DOUBLE);
+    PyArrayObject *num_pcst = (PyArrayObject *) PyArray_SimpleNew(1, &batch, NPY_INT32);
+    int **nodes = calloc((size_t) batch + 1, sizeof(int *));
+    int *sizes = calloc((size_t) batch + 1, sizeof(int));
+    if (lambdas == NULL || num_pcst == NULL || nodes == NULL || sizes == NULL) {
+        Py_XDECREF(lambdas);
+        Py_XDECREF(num_pcst);
+        Py_XDECREF(lambda0);
+        free(nodes);
+        free(sizes);
+        return PyErr_NoMemory();
+    }
+
+    // one workspace per thread, all of them back on the stack afterwards
+    Workspace *ws = malloc(sizeof(Workspace) * num_threads);
+    int num_ws = 0;
+    while (ws != NULL && num_ws < num_threads && Graph_checkout(self, ws + num_ws)) {
+        num_ws++;
+    }
+    if (num_ws < num_threads) {
+        for (int t = 0; t < num_ws; t++) { Graph_checkin(self, ws[t]); }
+        free(ws);
+        Py_DECREF(lambdas);
+        Py_DECREF(num_pcst);
+        Py_XDECREF(lambda0);
+        free(nodes);
+        free(sizes);
+        return PyErr_Occurred() ? NULL : PyErr_NoMemory();
+    }
+    const double *prizes = (const double *) PyArray_DATA(prizes_);
+    const double *lambda_init = lambda0 == NULL ? NULL : (const double *) PyArray_DATA(lambda0);
+    double *lambda_out = (double *) PyArray_DATA(lambdas);
+    npy_int32 *num_pcst_out = (npy_int32 *) PyArray_DATA(num_pcst);
+    // set by any thread that fails to allocate its row, the rows after it are skipped
+    int out_of_memory = 0;
+    Py_BEGIN_ALLOW_THREADS
+#pragma omp parallel for num_threads(num_threads) schedule(dynamic, 1)
+    for (npy_intp b = 0; b < batch; b++) {
+        int failed;
+#pragma omp atomic read
+        failed = out_of_memory;
+        if (failed) { continue; }
+        Workspace *w = ws + omp_get_thread_num();
+        GraphStat *stat = w->stat;
+        head_tail_bisearch_pcst(
+                w->pcst, self->costs, prizes + b * self->n, self->n, self->m, g, root,
+                sparsity_low, sparsity_high, max_num_iter,
+                lambda_init == NULL ? 0.0 : lambda_init[b], verbose, stat);
+        nodes[b] = malloc(sizeof(int) * (stat->re_nodes->size + 1));
+        if (nodes[b] == NULL) {
+#pragma omp atomic write
+            out_of_memory = 1;
+            continue;
+        }
+        sizes[b] = stat->re_nodes->size;
+        memcpy(nodes[b], stat->re_nodes->array, sizeof(int) * sizes[b]);
+        lambda_out[b] = stat->lambda;
+        num_pcst_out[b] = stat->num_pcst;
+    }
+    Py_END_ALLOW_THREADS
+    for (int t = 0; t < num_ws; t++) { Graph_checkin(self, ws[t]); }
+    free(ws);
+    Py_XDECREF(lambda0);
+    if (out_of_memory) {
+        for (npy_intp b = 0; b < batch; b++) { free(nodes[b]); }
+        free(nodes);
+        free(sizes);
+        Py_DECREF(lambdas);
+        Py_DECREF(num_pcst);
+        return PyErr_NoMemory();
+    }
+
+    // ragged result in CSR form: the nodes of row b are indices[indptr[b]:indptr[b + 1]]
+    npy_intp num_rows = batch + 1, total = 0;
+    PyArrayObject *indptr = (PyArrayObject *) PyArray_SimpleNew(1, &num_rows, NPY_INT64);
+    if (indptr != NULL) {
+        npy_int64 *ptr = (npy_int64 *) PyArray_DATA(indptr);
+        ptr[0] = 0;
+        for (npy_intp b = 0; b < batch; b++) {
+            total += sizes[b];
+            ptr[b + 1] = total;
+        }
+    }
+    PyArrayObject *indices = (PyArrayObject *) PyArray_SimpleNew(1, &total, NPY_INT32);
+    if (indices != NULL) {
+        npy_int32 *out = (npy_int32 *) PyArray_DATA(indices);
+        for (npy_intp b = 0; b < batch; b++) {
+            memcpy(out, nodes[b], sizeof(npy_int32) * sizes[b]);
+            out += sizes[b];
+        }
+    }
+    for (npy_intp b = 0; b < batch; b++) { free(nodes[b]); }
+    free(nodes);
+    free(sizes);
+    if (indptr == NULL || indices == NULL) {
+        Py_XDECREF(indptr);
+        Py_XDECREF(indices);
+        Py_DECREF(lambdas);
+        Py_DECREF(num_pcst);
+        return NULL;
+    }
+    return Py_BuildValue("NNNN", indptr, indices, lambdas, num_pcst);
+}
+
+static PyMethodDef Graph_methods[] = {
+        {"head_tail_bisearch", (PyCFunction) Graph_head_tail_bisearch, METH_VARARGS,
+                "head_tail_bisearch(prizes, g, root, s_low, s_high, max_num_iter, verbose, lambda0=0.)"
+                " -> (int32 array of the selected nodes, lambda used, number of pcst runs)."
+                " lambda0 > 0 starts the lambda search there instead of from scratch."},
+        {"head_tail_bisearch_batch", (PyCFunction) (void (*)(void)) Graph_head_tail_bisearch_batch,
+                METH_VARARGS | METH_KEYWORDS,
+                "head_tail_bisearch_batch(prizes, g, root, s_low, s_high, max_num_iter, verbose=0,"
+                " lambda0=None, num_threads=0) -> (indptr, indices, lambdas, num_pcst)."
+                " Projects every row of the (B, n) prizes matrix, in parallel over OpenMP threads"
+                " (num_threads <= 0 uses all of them). The nodes of row b are"
+                " indices[indptr[b]:indptr[b + 1]]."},
+        {NULL, NULL, 0, NULL}};
+
+static PyMemberDef Graph_members[] = {
+        {"n", T_INT, offsetof(GraphObject, n), READONLY, "number of nodes"},
+        {"m", T_INT, offsetof(GraphObject, m), READONLY, "number of edges"},
+        {NULL, 0, 0, 0, NULL}};
+
+static PyTypeObject GraphType = {
+        PyVarObject_HEAD_INIT(NULL, 0)
+        .tp_name = "sparse_module.Graph",
+        .tp_doc = "Graph(edges, costs, n): reusable graph and PCST work buffers "
+                  "for head/tail projections",
+        .tp_basicsize = sizeof(GraphObject),
+        .tp_itemsize = 0,
+        .tp_flags = Py_TPFLAGS_DEFAULT,
+        .tp_new = PyType_GenericNew,
+        .tp_init = (initproc) Graph_init,
+        .tp_dealloc = (destructor) Graph_dealloc,
+        .tp_methods = Graph_methods,
+        .tp_members = Graph_members,
+};
+
 static PyMethodDef sparse_methods[] = {
         {"wrap_head_tail_bisearch", wrap_head_tail_bisearch,
                                           METH_VARARGS, "wrap_head_tail_bisearch docs"},
+        {"wrap_head_tail_bisearch_np", wrap_head_tail_bisearch_np,
+                                          METH_VARARGS, "head/tail projection on numpy edges, "
+                                                        "releases the GIL, returns the nodes as an int32 array"},
         {NULL,                      NULL, 0,            NULL}};
 
 /** Works only for Python3.0 */
@@ -59,7 +511,16 @@ static struct PyModuleDef moduledef = {
 PyMODINIT_FUNC PyInit_sparse_module(void) {
     Py_Initialize();
     import_array()
-    return PyModule_Create(&moduledef);
+    if (PyType_Ready(&GraphType) < 0) { return NULL; }
+    PyObject *module = PyModule_Create(&moduledef);
+    if (module == NULL) { return NULL; }
+    Py_INCREF(&GraphType);
+    if (PyModule_AddObject(module, "Graph", (PyObject *) &GraphType) < 0) {
+        Py_DECREF(&GraphType);
+        Py_DECREF(module);
+        return NULL;
+    }
+    return module;
 }
 
 int main() {
@@ -0,0 +1,479 @@
+#include <Python.h>
+#include <structmember.h>
+#include <numpy/arrayobject.h>
+#include <algorithm>
+#include <vector>
+#include "graph.h"
+
+/*
+ * Prox of the generalized fused lasso penalty (the fused lasso signal approximator)
+ *      min_w  0.5 * ||w - z||^2 + lambda1 * ||w||_1 + lambda2 * sum_{(i,j)} w_ij |w_i - w_j|
+ * over undirected edges (i, j). The total variation part is solved exactly by
+ * divide and conquer with minimum cuts (BK maxflow of graph.cpp / maxflow.cpp):
+ * for a group G of nodes and a threshold t, the minimum cut of
+ *      sum_{i in S} (t - z_i) + lambda2 * cut(S)
+ * is the set S of nodes whose solution lies above t. Edges between S and G \ S
+ * shift the inputs of their endpoints by -/+ lambda2 * w_ij and both halves are
+ * solved recursively with t the mean of their inputs; a group that does not split
+ * at its mean is fused there. The l1 part is a soft-thresholding of the result
+ * (Friedman et al., 2007).
+ */
+
+typedef Graph<double, double, double> GraphType;
+
+struct TVProx {
+    int n, m;
+    std::vector<int> edges, indptr, adj, adj_e, local;
+    std::vector<double> weights, cap, shifted, excess, edge_flow;
+    /* the cut of the whole graph, kept with its residual flows and search trees
+     * (Kohli and Torr, 2005) so that the next call only repairs the flow */
+    GraphType *root;
+    std::vector<int> root_edges;
+    /* adjacency entries of the arcs of the last graph of a subgroup */
+    std::vector<int> arc_edges;
+    long num_calls, num_warm;
+
+    TVProx(int n_, int m_, const npy_int32 *edges_, const double *weights_)
+            : n(n_), m(m_), edges(edges_, edges_ + 2 * (size_t) m_), indptr(n_ + 1, 0),
+              adj(2 * (size_t) m_), adj_e(2 * (size_t) m_), local(n_, -1),
+              weights(weights_, weights_ + m_), cap(m_), shifted(n_), excess(n_), edge_flow(m_),
+              root(NULL), num_calls(0), num_warm(0) {
+        /* adjacency in CSR form, adj_e[q] is the edge of entry q */
+        for (int e = 0; e < m; e++) {
+            indptr[edges[2 * e] + 1]++;
+            indptr[edges[2 * e + 1] + 1]++;
+        }
+        for (int i = 0; i < n; i++) { indptr[i + 1] += indptr[i]; }
+        std::vector<int> fill(indptr.begin(), indptr.end() - 1);
+        for (int e = 0; e < m; e++) {
+            int i = edges[2 * e], j = edges[2 * e + 1];
+            adj[fill[i]] = j;
+            adj_e[fill[i]++] = e;
+            adj[fill[j]] = i;
+            adj_e[fill[j]++] = e;
+        }
+    }
+
+    ~TVProx() { delete root; }
+
+    /* flow from i to adj[q] on the edge of entry q */
+    double flow_from(int i, int q) const {
+        int e = adj_e[q];
+        return edges[2 * e] == i ? edge_flow[e] : -edge_flow[e];
+    }
+
+    /* Graph of the cut of group at threshold t. It starts from the flow in edge_flow,
+     * the maximum flow of the parent group restricted to group, which is feasible and
+     * leaves only the terminal residuals of the parent and the change of threshold to
+     * route. Flow is then routed greedily along the paths source -> i -> j -> sink;
+     * on dense graphs this leaves little for the maxflow. Neither changes the minimum
+     * cut. arcs gets the adjacency entry of every edge in the order of the arcs. */
+    GraphType *build(const std::vector<int> &group, double t, std::vector<int> &arcs) {
+        int size = (int) group.size();
+        for (int k = 0; k < size; k++) { local[group[k]] = k; }
+        int num_edges = 0;
+        for (int k = 0; k < size; k++) {
+            int i = group[k];
+            excess[k] = shifted[i] - t;   /* > 0: capacity from the source, < 0: to the sink */
+            for (int q = indptr[i]; q < indptr[i + 1]; q++) {
+                if (local[adj[q]] < 0) { continue; }
+                excess[k] -= flow_from(i, q);
+                num_edges++;
+            }
+        }
+        for (int k = 0; k < size; k++) {
+            int i = group[k];
+            for (int q = indptr[i]; q < indptr[i + 1] && excess[k] > 0; q++) {
+                int j = adj[q], e = adj_e[q];
+                if (local[j] < 0 || excess[local[j]] >= 0) { continue; }
+                double f = std::min(std::min(excess[k], -excess[local[j]]), cap[e] - flow_from(i, q));
+                if (f <= 0) { continue; }
+                edge_flow[e] += edges[2 * e] == i ? f : -f;
+                excess[k] -= f;
+                excess[local[j]] += f;
+            }
+        }
+        GraphType *graph = new GraphType(size, num_edges / 2 + 1);
+        graph->add_node(size);
+        arcs.clear();
+        for (int k = 0; k < size; k++) {
+            int i = group[k];
+            graph->add_tweights(k, std::max(excess[k], 0.), std::max(-excess[k], 0.));
+            for (int q = indptr[i]; q < indptr[i + 1]; q++) {
+                int j = adj[q];
+                if (j <= i || local[j] < 0) { continue; }
+                /* residual capacities after the flow from i to j */
+                double f = flow_from(i, q);
+                graph->add_edge(k, local[j], cap[adj_e[q]] - f, cap[adj_e[q]] + f);
+                arcs.push_back(q);
+            }
+        }
+        return graph;
+    }
+
+    /* reads the flow of every edge of graph back into edge_flow */
+    void store_flows(GraphType *graph, const std::vector<int> &arcs) {
+        GraphType::arc_id a = graph->get_first_arc();
+        for (size_t p = 0; p < arcs.size(); p++) {
+            GraphType::arc_id rev = graph->get_next_arc(a);
+            int q = arcs[p], e = adj_e[q];
+            /* a runs to adj[q] */
+            double f = 0.5 * (graph->get_rcap(rev) - graph->get_rcap(a));
+            f = std::max(std::min(f, cap[e]), -cap[e]);
+            edge_flow[e] = edges[2 * e + 1] == adj[q] ? f : -f;
+            a = graph->get_next_arc(rev);
+        }
+    }
+
+    /* Moves the root graph to the new inputs: the flow of every edge is kept as far as
+     * the new capacities allow, the terminal capacities absorb the difference and flow
+     * is routed greedily as in build(). Nodes whose residual status changed are marked
+     * for maxflow(reuse_trees=true). */
+    void rewarm(double t) {
+        std::vector<double> &tr = excess;
+        for (int i = 0; i < n; i++) { tr[i] = shifted[i] - t; }
+        GraphType::arc_id a = root->get_first_arc();
+        for (size_t p = 0; p < root_edges.size(); p++) {
+            GraphType::arc_id rev = root->get_next_arc(a);
+            int q = root_edges[p], e = adj_e[q];
+            int i, j;
+            root->get_arc_ends(a, i, j);
+            double f = 0.5 * (root->get_rcap(rev) - root->get_rcap(a));
+            f = std::max(std::min(f, cap[e]), -cap[e]);
+            tr[i] -= f;
+            tr[j] += f;
+            edge_flow[e] = edges[2 * e] == i ? f : -f;
+            a = root->get_next_arc(rev);
+        }
+        a = root->get_first_arc();
+        for (size_t p = 0; p < root_edges.size(); p++) {
+            GraphType::arc_id rev = root->get_next_arc(a);
+            int q = root_edges[p], e = adj_e[q];
+            int i, j;
+            root->get_arc_ends(a, i, j);
+            double f = flow_from(i, q);
+            double push = 0.;
+            if (tr[i] > 0 && tr[j] < 0) {
+                push = std::min(std::min(tr[i], -tr[j]), cap[e] - f);
+            } else if (tr[j] > 0 && tr[i] < 0) {
+                push = -std::min(std::min(tr[j], -tr[i]), cap[e] + f);
+            }
+            f += push;
+            tr[i] -= push;
+            tr[j] += push;
+            double r = cap[e] - f, r_rev = cap[e] + f;
+            if ((root->get_rcap(a) > 0) != (r > 0) || (root->get_rcap(rev) > 0) != (r_rev > 0)) {
+                root->mark_node(i);
+                root->mark_node(j);
+            }
+            root->set_rcap(a, r);
+            root->set_rcap(rev, r_rev);
+            a = root->get_next_arc(rev);
+        }
+        for (int i = 0; i < n; i++) {
+            double old = root->get_trcap(i);
+            if ((old > 0) != (tr[i] > 0) || (old < 0) != (tr[i] < 0)) { root->mark_node(i); }
+            root->set_trcap(i, tr[i]);
+        }
+    }
+
+    /* Splits group at threshold t into the nodes above (upper) and below (lower) and
+     * shifts the inputs across the cut; returns false if the cut is trivial. */
+    bool split(const std::vector<int> &group, double t, bool is_root, bool warm,
+               std::vector<int> &upper, std::vector<int> &lower) {
+        int size = (int) group.size();
+        GraphType *graph;
+        if (is_root && warm && root != NULL) {
+            for (int k = 0; k < size; k++) { local[group[k]] = k; }
+            rewarm(t);
+            root->maxflow(true);
+            graph = root;
+            num_warm++;
+        } else {
+            if (is_root) { std::fill(edge_flow.begin(), edge_flow.end(), 0.); }
+            graph = build(group, t, arc_edges);
+            graph->maxflow();
+            if (is_root) {
+                delete root;
+                root = graph;
+                root_edges.swap(arc_edges);
+            }
+        }
+        /* the flow within upper and lower starts the cuts of both halves */
+        store_flows(graph, graph == root ? root_edges : arc_edges);
+        upper.clear();
+        lower.clear();
+        for (int k = 0; k < size; k++) {
+            if (graph->what_segment(k) == GraphType::SOURCE) {
+                upper.push_back(group[k]);
+            } else {
+                lower.push_back(group[k]);
+            }
+        }
+        bool nontrivial = !upper.empty() && !lower.empty();
+        if (nontrivial) {
+            /* edges across the cut pull both endpoints towards each other */
+            for (size_t k = 0; k < upper.size(); k++) {
+                int i = upper[k];
+                for (int q = indptr[i]; q < indptr[i + 1]; q++) {
+                    int j = adj[q];
+                    if (local[j] >= 0 && graph->what_segment(local[j]) != GraphType::SOURCE) {
+                        shifted[i] -= cap[adj_e[q]];
+                        shifted[j] += cap[adj_e[q]];
+                    }
+                }
+            }
+        }
+        for (int k = 0; k < size; k++) { local[group[k]] = -1; }
+        if (graph != root) { delete graph; }
+        return nontrivial;
+    }
+
+    /* TV prox of z with weight lambda into out; warm reuses the root graph of the last call */
+    void solve(const double *z, double lambda, double *out, bool warm) {
+        for (int e = 0; e < m; e++) { cap[e] = lambda * weights[e]; }
+        std::copy(z, z + n, shifted.begin());
+        std::vector<std::vector<int> > stack(1, std::vector<int>(n));
+        for (int i = 0; i < n; i++) { stack[0][i] = i; }
+        std::vector<int> group, upper, lower;
+        bool is_root = true;
+        while (!stack.empty()) {
+            group.swap(stack.back());
+            stack.pop_back();
+            int size = (int) group.size();
+            double mean = 0.;
+            for (int k = 0; k < size; k++) { mean += shifted[group[k]]; }
+            mean /= size;
+            bool nontrivial = size > 1 && split(group, mean, is_root, warm, upper, lower);
+            is_root = false;
+            if (!nontrivial) {
+                for (int k = 0; k < size; k++) { out[group[k]] = mean; }
+                continue;
+            }
+            stack.push_back(std::vector<int>());
+            stack.back().swap(upper);
+            stack.push_back(std::vector<int>());
+            stack.back().swap(lower);
+        }
+        num_calls++;
+    }
+};
+
+static void flsa(TVProx *tv, const double *z, double lambda1, double lambda2, double *w, bool warm) {
+    if (lambda2 > 0 && tv->m > 0 && tv->n > 0) {
+        tv->solve(z, lambda2, w, warm);
+    } else {
+        std::copy(z, z + tv->n, w);
+    }
+    for (int i = 0; i < tv->n; i++) {
+        w[i] = w[i] > lambda1 ? w[i] - lambda1 : (w[i] < -lambda1 ? w[i] + lambda1 : 0.);
+    }
+}
+
+static int check_double_vector(PyArrayObject *arr, npy_intp size, const char *name) {
+    if (PyArray_TYPE(arr) != NPY_DOUBLE || PyArray_NDIM(arr) != 1
+        || !PyArray_IS_C_CONTIGUOUS(arr) || !PyArray_ISALIGNED(arr)
+        || !PyArray_ISNOTSWAPPED(arr)) {
+        PyErr_Format(PyExc_TypeError, "%s must be a C-contiguous 1-d float64 array", name);
+        return 0;
+    }
+    if (size >= 0 && PyArray_DIM(arr, 0) != size) {
+        PyErr_Format(PyExc_ValueError, "%s must have length %zd", name, (Py_ssize_t) size);
+        return 0;
+    }
+    return 1;
+}
+
+static int check_edges(PyArrayObject *edges_, int n) {
+    if (PyArray_TYPE(edges_) != NPY_INT32 || PyArray_NDIM(edges_) != 2
+        || PyArray_DIM(edges_, 1) != 2 || !PyArray_IS_C_CONTIGUOUS(edges_)
+        || !PyArray_ISALIGNED(edges_) || !PyArray_ISNOTSWAPPED(edges_)) {
+        PyErr_SetString(PyExc_TypeError, "edges must be a C-contiguous int32 array of shape (m, 2)");
+        return 0;
+    }
+    const npy_int32 *edges = (const npy_int32 *) PyArray_DATA(edges_);
+    npy_intp m = PyArray_DIM(edges_, 0);
+    for (npy_intp e = 0; e < 2 * m; e++) {
+        if (edges[e] < 0 || edges[e] >= n) {
+            PyErr_Format(PyExc_ValueError, "edge %zd has node %d outside [0, %d)",
+                         (Py_ssize_t) (e / 2), (int) edges[e], n);
+            return 0;
+        }
+    }
+    return 1;
+}
+
+static int check_lambdas(double lambda1, double lambda2) {
+    if (lambda1 < 0 || lambda2 < 0) {
+        PyErr_SetString(PyExc_ValueError, "lambda1 and lambda2 must be nonnegative");
+        return 0;
+    }
+    return 1;
+}
+
+/**
+ * flsa(z, edges, weights, lambda1, lambda2) -> w
+ * edges: C-contiguous int32 (m, 2) array listing every undirected edge once,
+ * weights: float64 (m,) nonnegative edge weights. The GIL is released while the
+ * cuts are computed. Use FusedLassoProx for repeated calls on the same graph.
+ */
+static PyObject *wrap_flsa(PyObject *self, PyObject *args) {
+    (void) self;
+    PyArrayObject *z_, *edges_, *weights_;
+    double lambda1, lambda2;
+    if (!PyArg_ParseTuple(args, "O!O!O!dd",
+                          &PyArray_Type, &z_,
+                          &PyArray_Type, &edges_,
+                          &PyArray_Type, &weights_,
+                          &lambda1, &lambda2)) { return NULL; }
+    if (!check_double_vector(z_, -1, "z")) { return NULL; }
+    int n = (int) PyArray_DIM(z_, 0);
+    if (!check_edges(edges_, n)) { return NULL; }
+    int m = (int) PyArray_DIM(edges_, 0);
+    if (!check_double_vector(weights_, m, "weights")) { return NULL; }
+    if (!check_lambdas(lambda1, lambda2)) { return NULL; }
+    npy_intp dims[1] = {n};
+    PyArrayObject *w_ = (PyArrayObject *) PyArray_SimpleNew(1, dims, NPY_DOUBLE);
+    if (w_ == NULL) { return NULL; }
+    const double *z = (const double *) PyArray_DATA(z_);
+    const npy_int32 *edges = (const npy_int32 *) PyArray_DATA(edges_);
+    const double *weights = (const double *) PyArray_DATA(weights_);
+    double *w = (double *) PyArray_DATA(w_);
+    Py_BEGIN_ALLOW_THREADS
+    TVProx tv(n, m, edges, weights);
+    flsa(&tv, z, lambda1, lambda2, w, false);
+    Py_END_ALLOW_THREADS
+    return (PyObject *) w_;
+}
+
+typedef struct {
+    PyObject_HEAD
+    TVProx *tv;
+    int busy;   /* a call holds tv without the GIL */
+} FusedLassoProxObject;
+
+static void FusedLassoProx_dealloc(FusedLassoProxObject *self) {
+    delete self->tv;
+    Py_TYPE(self)->tp_free((PyObject *) self);
+}
+
+static int FusedLassoProx_init(FusedLassoProxObject *self, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {(char *) "edges", (char *) "weights", (char *) "n", NULL};
+    PyArrayObject *edges_, *weights_;
+    int n;
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!O!i", kwlist,
+                                     &PyArray_Type, &edges_,
+                                     &PyArray_Type, &weights_, &n)) { return -1; }
+    if (self->tv != NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "FusedLassoProx is already initialized");
+        return -1;
+    }
+    if (n <= 0) {
+        PyErr_SetString(PyExc_ValueError, "n must be positive");
+        return -1;
+    }
+    if (!check_edges(edges_, n)) { return -1; }
+    int m = (int) PyArray_DIM(edges_, 0);
+    if (!check_double_vector(weights_, m, "weights")) { return -1; }
+    self->tv = new TVProx(n, m, (const npy_int32 *) PyArray_DATA(edges_),
+                          (const double *) PyArray_DATA(weights_));
+    return 0;
+}
+
+/**
+ * prox(z, lambda1, lambda2, warm=True) -> w, the same prox as flsa on the graph of
+ * the object. With warm the cut of the whole graph starts from the residual flow and
+ * search trees of the previous call. A concurrent call on the same object solves on
+ * a graph of its own.
+ */
+static PyObject *FusedLassoProx_call(FusedLassoProxObject *self, PyObject *args, PyObject *kwds) {
+    static char *kwlist[] = {(char *) "z", (char *) "lambda1", (char *) "lambda2", (char *) "warm", NULL};
+    PyArrayObject *z_;
+    double lambda1, lambda2;
+    int warm = 1;
+    if (self->tv == NULL) {
+        PyErr_SetString(PyExc_RuntimeError, "FusedLassoProx is not initialized");
+        return NULL;
+    }
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O!dd|p", kwlist,
+                                     &PyArray_Type, &z_, &lambda1, &lambda2, &warm)) { return NULL; }
+    if (!check_double_vector(z_, self->tv->n, "z")) { return NULL; }
+    if (!check_lambdas(lambda1, lambda2)) { return NULL; }
+    npy_intp dims[1] = {self->tv->n};
+    PyArrayObject *w_ = (PyArrayObject *) PyArray_SimpleNew(1, dims, NPY_DOUBLE);
+    if (w_ == NULL) { return NULL; }
+    const double *z = (const double *) PyArray_DATA(z_);
+    double *w = (double *) PyArray_DATA(w_);
+    TVProx *tv = self->tv;
+    int shared = !self->busy;
+    self->busy = 1;
+    Py_BEGIN_ALLOW_THREADS
+    if (shared) {
+        flsa(tv, z, lambda1, lambda2, w, warm);
+    } else {
+        TVProx own(tv->n, tv->m, (const npy_int32 *) tv->edges.data(), tv->weights.data());
+        flsa(&own, z, lambda1, lambda2, w, false);
+    }
+    Py_END_ALLOW_THREADS
+    if (shared) { self->busy = 0; }
+    return (PyObject *) w_;
+}
+
+static PyObject *FusedLassoProx_get(FusedLassoProxObject *self, void *closure) {
+    if (self->tv == NULL) { return PyLong_FromLong(0); }
+    switch ((int) (Py_ssize_t) closure) {
+        case 0: return PyLong_FromLong(self->tv->n);
+        case 1: return PyLong_FromLong(self->tv->m);
+        case 2: return PyLong_FromLong(self->tv->num_calls);
+        default: return PyLong_FromLong(self->tv->num_warm);
+    }
+}
+
+static PyGetSetDef FusedLassoProx_getset[] = {
+        {(char *) "n", (getter) FusedLassoProx_get, NULL, (char *) "number of nodes", (void *) 0},
+        {(char *) "m", (getter) FusedLassoProx_get, NULL, (char *) "number of edges", (void *) 1},
+        {(char *) "num_calls", (getter) FusedLassoProx_get, NULL,
+                (char *) "number of prox evaluations", (void *) 2},
+        {(char *) "num_warm", (getter) FusedLassoProx_get, NULL,
+                (char *) "number of evaluations that repaired the flow of the previous one", (void *) 3},
+        {NULL, NULL, NULL, NULL, NULL}};
+
+static PyMethodDef FusedLassoProx_methods[] = {
+        {"prox", (PyCFunction) (void (*)(void)) FusedLassoProx_call, METH_VARARGS | METH_KEYWORDS,
+                "prox(z, lambda1, lambda2, warm=True) -> w"},
+        {NULL, NULL, 0, NULL}};
+
+static PyTypeObject FusedLassoProxType = {PyVarObject_HEAD_INIT(NULL, 0)};
+
+static PyMethodDef gfl_prox_methods[] = {
+        {"flsa", (PyCFunction) wrap_flsa, METH_VARARGS,
+                "flsa(z, edges, weights, lambda1, lambda2): prox of the generalized fused lasso penalty"},
+        {NULL, NULL, 0, NULL}};
+
+static struct PyModuleDef moduledef = {
+        PyModuleDef_HEAD_INIT, "gfl_prox_module", "Graph-cut prox of the generalized fused lasso",
+        -1, gfl_prox_methods, NULL, NULL, NULL, NULL};
+
+PyMODINIT_FUNC PyInit_gfl_prox_module(void) {
+    import_array();
+    FusedLassoProxType.tp_name = "gfl_prox_module.FusedLassoProx";
+    FusedLassoProxType.tp_doc = "FusedLassoProx(edges, weights, n): prox of the generalized fused lasso "
+                                "penalty on a fixed graph, built once and reused across calls";
+    FusedLassoProxType.tp_basicsize = sizeof(FusedLassoProxObject);
+    FusedLassoProxType.tp_flags = Py_TPFLAGS_DEFAULT;
+    FusedLassoProxType.tp_new = PyType_GenericNew;
+    FusedLassoProxType.tp_init = (initproc) FusedLassoProx_init;
+    FusedLassoProxType.tp_dealloc = (destructor) FusedLassoProx_dealloc;
+    FusedLassoProxType.tp_methods = FusedLassoProx_methods;
+    FusedLassoProxType.tp_getset = FusedLassoProx_getset;
+    if (PyType_Ready(&FusedLassoProxType) < 0) { return NULL; }
+    PyObject *module = PyModule_Create(&moduledef);
+    if (module == NULL) { return NULL; }
+    Py_INCREF(&FusedLassoProxType);
+    if (PyModule_AddObject(module, "FusedLassoProx", (PyObject *) &FusedLassoProxType) < 0) {
+        Py_DECREF(&FusedLassoProxType);
+        Py_DECREF(module);
+        return NULL;
+    }
+    return module;
+}
@@ -0,0 +1,7 @@
+function [beta, funcVal] = gfl_proximal_inmem(X, y, A_i, A_j, A_v, d, rho1, rho2)
+    % In-memory entry point of gfl_proximal for the MATLAB engine.
+    % The adjacency matrix is passed in triplet form (1-based indices) and rebuilt
+    % as a sparse matrix, so no .mat file is written or read.
+    AdjMat = sparse(A_i, A_j, A_v, d, d);
+    [beta, funcVal] = gfl_proximal_solve(X, y, AdjMat, rho1, rho2);
+end
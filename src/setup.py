@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 """
 This is a wrapper of head and tail projection. To generate sparse_module.so
-file, please use the following command (suppose you have Linux/MacOS/MacBook):
+(and gfl_prox_module.so, the graph-cut prox used by gfl_proximal_native) file,
+please use the following command (suppose you have Linux/MacOS/MacBook):
     python setup.py build_ext --inplace
 I didn't know how to use GCC compiler under Windows. But if you have a C
 compile, you can definitely generate above mentioned file in some way.
@@ -18,7 +19,11 @@ src_files = ['algo_wrapper/c/main_wrapper.c',
              'algo_wrapper/c/head_tail_proj.c',
              'algo_wrapper/c/fast_pcst.c',
              'algo_wrapper/c/sort.c']
-compile_args = ['-shared', '-Wall', '-g', '-O3', '-fPIC', '-std=c11', '-lpython2.7', '-lm']
+compile_args = ['-shared', '-Wall', '-g', '-O3', '-fPIC', '-std=c11', '-fopenmp', '-lpython2.7', '-lm']
+# graph-cut prox of the generalized fused lasso (solvers/gfl_proximal_native.py)
+gfl_prox_files = ['code_fgfl_aaai14/GFL/gfl_prox_wrapper.cpp',
+                  'code_fgfl_aaai14/GFL/graph.cpp',
+                  'code_fgfl_aaai14/GFL/maxflow.cpp']
 # calling the setup function
 setup(
     name='sparse_module',
@@ -42,5 +47,11 @@ setup(
                            sources=src_files,
                            language="C",
                            extra_compile_args=compile_args,
-                           include_dirs=[numpy.get_include()])],
+                           extra_link_args=['-fopenmp'],
+                           include_dirs=[numpy.get_include()]),
+                 Extension('gfl_prox_module',
+                           sources=gfl_prox_files,
+                           language="c++",
+                           extra_compile_args=['-O3', '-fPIC', '-DNDEBUG'],
+                           include_dirs=[numpy.get_include(), 'code_fgfl_aaai14/GFL'])],
     keywords='sparse learning, structure sparsity, head/tail projection')
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the modules are imported from the project root, sparse_module.so from src/
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from solver import Solver
+from utils.graph import generate_graph, get_graph
+
+
+@pytest.mark.parametrize("fmt", [sp.csr_matrix, sp.coo_matrix])
+def test_get_graph_from_plain_laplacian(fmt):
+    L, A = generate_graph(60, 6, 0.9, 0.05, seed=0)
+    # a copy that does not belong to the graph generate_graph built
+    plain = fmt(L.toarray())
+    graph = get_graph(plain, laplacian=True)
+    assert abs(graph.adjacency - A).max() == 0
+    assert abs(graph.laplacian - L).max() == 0
+    assert get_graph(plain, laplacian=True) is graph
+
+
+def test_solver_fit_without_adjacency(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    L, A = generate_graph(40, 5, 0.9, 0.05, seed=1)
+    rng = np.random.default_rng(1)
+    X = rng.standard_normal((30, 40))
+    y = X[:, :5].sum(axis=1)
+    models = ["lasso", "adaptive_grace"]
+    from_L = Solver(models).fit(X, y, sp.csr_matrix(L.toarray()), None, 5)
+    from_A = Solver(models).fit(X, y, L, A, 5)
+    for model in models:
+        np.testing.assert_allclose(from_L[model], from_A[model])
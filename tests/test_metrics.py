@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from utils.metrics import support_metrics, top_k_support
+
+
+def _argsort_recovery(u, k):
+    # the recovery accuracy RandomEnsemble computed before support_metrics; the sort is made
+    # stable because the default kind orders tied magnitudes differently across numpy builds
+    selected_features_pred = np.argsort(np.abs(u), kind='stable')[-k:]
+    return len(np.intersect1d(np.arange(k), selected_features_pred)) / k
+
+
+@pytest.mark.parametrize("d, k", [(20, 5), (200, 10), (1000, 50)])
+def test_recovery_matches_argsort(d, k):
+    rng = np.random.default_rng(d)
+    coefs = rng.standard_normal((500, d))
+    coefs[rng.random(coefs.shape) < 0.9] = 0.           # fewer than k nonzeros in many rows
+    coefs[::7] = np.round(coefs[::7])                   # ties between nonzero magnitudes
+    coefs[::11] *= -1
+    coefs[::13] = 0.                                    # all-zero rows
+    expected = [_argsort_recovery(u, k) for u in coefs]
+    np.testing.assert_array_equal(support_metrics(coefs, k)["recovery"], expected)
+    np.testing.assert_array_equal(top_k_support(coefs, k).sum(axis=-1), k)
+
+
+def test_all_zero_selects_nothing_true():
+    assert support_metrics(np.zeros(100), 5)["recovery"] == 0.
+    assert support_metrics(np.zeros((3, 2, 100)), 5)["recovery"].shape == (3, 2)
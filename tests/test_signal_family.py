@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from solvers import signal_family as sf
+from utils.communication import A_to_edges
+from utils.graph import generate_graph
+
+pytestmark = pytest.mark.skipif(getattr(sf, 'Graph', None) is None,
+                                reason='sparse_module with the Graph type is not built')
+
+
+@pytest.fixture(scope='module')
+def graph():
+    _, A = generate_graph(60, 6, 0.9, 0.05, seed=0)
+    edges, costs = A_to_edges(A)
+    return sf.build_graph(edges, costs, 60)
+
+
+@pytest.mark.parametrize("rows", [0, 1, 3])
+def test_batch_projection_has_one_result_per_row(graph, rows):
+    x_mat = np.random.default_rng(rows).standard_normal((rows, 60))
+    re_nodes, proj = sf.algo_head_tail_bisearch_batch(graph, x_mat, 1, -1, 6, 7, 50)
+    assert len(re_nodes) == rows
+    assert proj.shape == (rows, 60)
+    for x, nodes, row in zip(x_mat, re_nodes, proj):
+        single, _ = sf.algo_head_tail_bisearch(graph, x, None, 1, -1, 6, 7, 50)
+        np.testing.assert_array_equal(np.sort(nodes), np.sort(single))
+        np.testing.assert_array_equal(row[nodes], x[nodes])
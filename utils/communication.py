@@ -1,9 +1,21 @@
+import os
+import uuid
+from contextlib import contextmanager
+
 import scipy.io as sio
 import scipy.sparse as sp
 import numpy as np
 
+from utils.graph import get_graph, lookup_graph
+
+try:
+    import matlab
+except ImportError:
+    matlab = None
+
 
-# save the data to .mat file so that the matlab code of gfl_pqn or gfl_proximal can use it
+# save the data to .mat file so that the matlab code of gfl_pqn or gfl_proximal can use it;
+# sparse L / A are written as MATLAB sparse matrices, never densified
 def save_data(X, y, L=None, A=None, filename=None):
     if y.ndim == 1:
         y = y[:, np.newaxis]
@@ -11,28 +23,71 @@ def save_data(X, y, L=None, A=None, filename=None):
         data = {
             "X": X,
             "y": y,
-            "L": L.toarray() if sp.issparse(L) else L,  
+            "L": _to_mat_sparse(L),
         }
     elif A is not None: # save the data for gfl_proximal
         data = {
             "X": X,
             "y": y,
-            "AdjMat": A.toarray() if sp.issparse(A) else A,  #
+            "AdjMat": _to_mat_sparse(A),
         }
     sio.savemat(filename, data)
 
 
+def _to_mat_sparse(M):
+    # savemat stores sparse matrices as CSC, MATLAB only reads double sparse matrices
+    if not sp.issparse(M):
+        return M
+    return sp.csc_matrix(M, dtype=np.float64)
+
+
+# names of the .mat files of one MATLAB call, unique per call so that concurrent runs sharing
+# the data directories (threads, worker processes, other experiments) never read each other's
+# files; both files are removed afterwards
+@contextmanager
+def exchange_files(datafile, resultfile, i):
+    token = f"{i}_{os.getpid()}_{uuid.uuid4().hex[:12]}"
+    names = (os.path.join(datafile, f'data_{token}.mat'), os.path.join(resultfile, f'result_{token}.mat'))
+    try:
+        yield names
+    finally:
+        for name in names:
+            try:
+                os.remove(name)
+            except FileNotFoundError:
+                pass
+
+
 # read the result of gfl_pqn or gfl_proximal
 def read_result(resultfile):
     result = sio.loadmat(resultfile)
     beta, funcVal = result['beta'], result['funcVal']
     return beta, funcVal
 
-# convert adjacency matrix to edges and costs for signal family
+# in-memory transport: convert arrays to matlab.double without going through a .mat file
+def to_matlab_double(a):
+    if matlab is None:
+        raise ImportError('the MATLAB engine for Python (matlab.engine) is not installed.')
+    a = np.asarray(a, dtype=np.float64)
+    if a.ndim == 1:
+        a = a[:, np.newaxis]  # MATLAB expects column vectors
+    return matlab.double(np.ascontiguousarray(a))
+
+
+# sparse matrix -> (rows, cols, vals, d) with 1-based indices, rebuilt by sparse(...) in MATLAB;
+# the triplets of a matrix of a SparseGraph are computed once and cached by the graph
+def to_matlab_triplets(M):
+    graph, kind = lookup_graph(M)
+    if graph is not None:
+        rows, cols, vals = graph.triplets(kind)
+        return to_matlab_double(rows), to_matlab_double(cols), to_matlab_double(vals), float(graph.d)
+    M = sp.coo_matrix(M)
+    return (to_matlab_double(M.row + 1.), to_matlab_double(M.col + 1.),
+            to_matlab_double(M.data), float(M.shape[0]))
+
+
+# convert adjacency matrix to edges and costs for signal family: every undirected edge once (i < j)
+# as C-contiguous int32 (m, 2) and float64 costs, the layout sparse_module reads without copying;
+# computed and validated once per adjacency matrix by its SparseGraph (the arrays are read-only)
 def A_to_edges(A):
-    if not sp.issparse(A):
-        A = sp.csr_matrix(A)
-    A_coo = A.tocoo()
-    edges = np.vstack((A_coo.row, A_coo.col)).T
-    costs = A_coo.data.astype(np.float64)
-    return edges, costs
\ No newline at end of file
+    return get_graph(A).edges
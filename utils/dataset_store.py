@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import pickle
+import random
+import shutil
+import uuid
+
+import numpy as np
+import scipy.sparse as sp
+
+from utils.graph import SparseGraph
+
+# bump when the layout of a replication changes, so that old shards are not read
+_FORMAT = 1
+_ARRAYS = ("X", "y", "w", "A_data", "A_indices", "A_indptr")
+
+
+class DatasetStore:
+    """
+    On-disk store of the replications of an experiment. Each replication is written once
+    under root/<config hash>/<seed>/ as one .npy shard per array: X, y, w and the CSR arrays
+    of the adjacency A, plus the numpy / random states the generator left behind.
+    Loading memory-maps the shards (mmap_mode, read-only by default), so workers and
+    repeated experiments share the pages of the same files instead of regenerating and
+    copying the data. L is derived from A. Restoring the generator states makes a run on
+    stored data draw the same random numbers afterwards as the run that generated it.
+    Shards are written to a temporary directory and renamed into place, so concurrent
+    writers of the same replication never expose a partial one.
+    """
+    def __init__(self, root, mmap_mode="r"):
+        self.root = os.path.abspath(root)
+        self.mmap_mode = mmap_mode
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def config_hash(config):
+        text = json.dumps({"format": _FORMAT, **config}, sort_keys=True, default=str)
+        return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+    def path(self, config, seed):
+        return os.path.join(self.root, self.config_hash(config), str(seed))
+
+    def __contains__(self, key):
+        config, seed = key
+        return os.path.isdir(self.path(config, seed))
+
+    def get(self, config, seed, generate):
+        """
+        The replication of `config` with `seed` as (L, w, X, y, A), generated by
+        generate() -> (L, w, X, y, A) and written to the store if it is not there yet.
+        """
+        path = self.path(config, seed)
+        if not os.path.isdir(path):
+            L, w, X, y, A = generate()
+            self.put(config, seed, X, y, w, A)
+        return self.load(config, seed)
+
+    def put(self, config, seed, X, y, w, A):
+        path = self.path(config, seed)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        config_file = os.path.join(parent, "config.json")
+        if not os.path.exists(config_file):
+            with open(config_file, "w") as f:
+                json.dump(config, f, indent=1, sort_keys=True, default=str)
+        A = sp.csr_matrix(A)
+        arrays = {"X": X, "y": y, "w": w, "A_data": A.data, "A_indices": A.indices, "A_indptr": A.indptr}
+        tmp = os.path.join(parent, f".{seed}.{os.getpid()}.{uuid.uuid4().hex}")
+        os.makedirs(tmp)
+        try:
+            for name, a in arrays.items():
+                np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(a))
+            with open(os.path.join(tmp, "shape.json"), "w") as f:
+                json.dump(A.shape, f)
+            with open(os.path.join(tmp, "rng_state.pkl"), "wb") as f:
+                pickle.dump((np.random.get_state(), random.getstate()), f)
+            os.rename(tmp, path)
+        except OSError:
+            # another writer got there first, its shards are the same replication
+            if not os.path.isdir(path):
+                raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def load(self, config, seed):
+        """ (L, w, X, y, A) of a stored replication; also restores the generator states. """
+        path = self.path(config, seed)
+        a = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=self.mmap_mode) for name in _ARRAYS}
+        with open(os.path.join(path, "shape.json")) as f:
+            shape = tuple(json.load(f))
+        with open(os.path.join(path, "rng_state.pkl"), "rb") as f:
+            np_state, py_state = pickle.load(f)
+        np.random.set_state(np_state)
+        random.setstate(py_state)
+        graph = SparseGraph(sp.csr_matrix((a["A_data"], a["A_indices"], a["A_indptr"]), shape=shape))
+        return graph.laplacian, a["w"], a["X"], a["y"], graph.adjacency
@@ -0,0 +1,210 @@
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from scipy.sparse.linalg import eigsh, ArpackNoConvergence
+
+
+class DesignCache:
+    """
+    LRU cache of the quantities the solvers derive from a design matrix X: the Gram
+    matrix X'X, X'y for the responses seen with X, and the Lipschitz constant of the
+    least-squares gradient, lambda_max(X'X).
+    Entries are keyed by the identity of X (key="id", the array must stay alive and
+    unmodified while it is cached) or by a hash of its contents (key="hash"). The
+    least recently used entries are evicted once the cached arrays exceed max_bytes.
+    Cached arrays are read-only.
+    """
+    def __init__(self, max_bytes=2 ** 30, key="id"):
+        if key not in ("id", "hash"):
+            raise ValueError(f"Unknown key: {key}. Supported keys are: id, hash.")
+        self.max_bytes = max_bytes
+        self.key = key
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, a):
+        a = np.asarray(a)
+        if self.key == "hash":
+            h = hashlib.blake2b(np.ascontiguousarray(a).view(np.uint8), digest_size=16)
+            return ("hash", a.shape, a.dtype.str, h.hexdigest())
+        return ("id", id(a), a.shape, a.dtype.str)
+
+    def _entry(self, X):
+        key = self._key(X)
+        entry = self._entries.get(key)
+        if entry is not None and key[0] == "id" and entry["ref"]() is not X:
+            # the id was reused by a new array
+            self._evict(key)
+            entry = None
+        if entry is None:
+            entry = {"ref": lambda: None, "gram": None, "xty": {}, "lipschitz": None, "nbytes": 0}
+            if key[0] == "id":
+                try:
+                    entry["ref"] = weakref.ref(X, lambda _, key=key: self._drop(key))
+                except TypeError:
+                    entry["ref"] = lambda X=X: X
+            self._entries[key] = entry
+        self._entries.move_to_end(key)
+        return key, entry
+
+    def _drop(self, key):
+        with self._lock:
+            self._evict(key)
+
+    def _evict(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._nbytes -= entry["nbytes"]
+
+    def _store(self, key, entry, array):
+        array.setflags(write=False)
+        entry["nbytes"] += array.nbytes
+        self._nbytes += array.nbytes
+        while self._nbytes > self.max_bytes and len(self._entries) > 1:
+            oldest = next(iter(self._entries))
+            if oldest == key:
+                break
+            self._evict(oldest)
+        return array
+
+    def gram(self, X):
+        """ X'X """
+        with self._lock:
+            key, entry = self._entry(X)
+            if entry["gram"] is not None:
+                self.hits += 1
+                return entry["gram"]
+            self.misses += 1
+            X = np.asarray(X, dtype=np.float64)
+            entry["gram"] = self._store(key, entry, X.T @ X)
+            return entry["gram"]
+
+    def xty(self, X, y):
+        """ X'y """
+        with self._lock:
+            key, entry = self._entry(X)
+            y_key = self._key(y)
+            cached = entry["xty"].get(y_key)
+            if cached is not None and (y_key[0] == "hash" or cached[0]() is y):
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            xty = self._store(key, entry, np.asarray(X, dtype=np.float64).T @ np.asarray(y, dtype=np.float64))
+            try:
+                ref = weakref.ref(y)
+            except TypeError:
+                ref = lambda y=y: y
+            entry["xty"][y_key] = (ref, xty)
+            return xty
+
+    def lipschitz(self, X, tol=1e-8):
+        """
+        lambda_max(X'X), the Lipschitz constant of the gradient of 1/2 ||Xw - y||^2,
+        from a few Lanczos iterations (eigsh). They run on the Gram matrix if it is cached
+        or p <= n, and otherwise on the smaller XX' (same nonzero eigenvalues), which is
+        not cached. Falls back to a dense eigensolve for tiny problems or if Lanczos
+        does not converge.
+        """
+        with self._lock:
+            key, entry = self._entry(X)
+            if entry["lipschitz"] is not None:
+                self.hits += 1
+                return entry["lipschitz"]
+            n, p = np.shape(X)
+            if entry["gram"] is not None or p <= n:
+                gram = self.gram(X)
+            else:
+                X = np.asarray(X, dtype=np.float64)
+                gram = X @ X.T
+            p = gram.shape[0]
+            if p <= 2:
+                value = float(np.linalg.eigvalsh(gram)[-1])
+            else:
+                try:
+                    value = float(eigsh(gram, k=1, which="LA", tol=tol, return_eigenvectors=False,
+                                        v0=np.ones(p))[0])
+                except ArpackNoConvergence:
+                    value = float(np.linalg.eigvalsh(gram)[-1])
+            entry["lipschitz"] = value
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class GramOperator:
+    """
+    X'X applied matrix-free, x -> X'(Xx), for designs with p >> n where the p x p Gram
+    matrix does not pay off or fit in memory. Xx only touches the columns of the
+    nonzeros of x, which are few for the sparse iterates of the signal family methods.
+    Supports `@` like the dense Gram matrix it replaces.
+    """
+    def __init__(self, X):
+        self.X = np.asarray(X, dtype=np.float64)
+        self.shape = (self.X.shape[1], self.X.shape[1])
+
+    def __matmul__(self, x):
+        nonzero = np.flatnonzero(x)
+        if 2 * len(nonzero) < len(x):
+            xv = self.X[:, nonzero] @ x[nonzero]
+        else:
+            xv = self.X @ x
+        return self.X.T @ xv
+
+    dot = __matmul__
+
+
+def available_memory():
+    """ Free physical memory in bytes, or inf where the OS does not report it. """
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return float("inf")
+
+
+def choose_gradient(n, p, max_bytes=None):
+    """
+    Gradient mode of the signal family methods for an n x p design: "gram" (dense X'X,
+    O(p^2) per gradient) unless p > n, where the matrix-free X'(Xx) costs O(np) per
+    gradient and never forms X'X, or the Gram matrix would not fit in max_bytes and
+    the free memory.
+    """
+    budget = available_memory()
+    if max_bytes is not None:
+        budget = min(budget, max_bytes)
+    if p > n or 8 * p * p > budget:
+        return "matrix-free"
+    return "gram"
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_design_cache():
+    """
+    Process-wide DesignCache shared by the solvers. The memory budget defaults to the
+    GFL_DESIGN_CACHE_MB environment variable (1024 MB if unset).
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            max_mb = float(os.environ.get("GFL_DESIGN_CACHE_MB", 1024))
+            _default_cache = DesignCache(max_bytes=int(max_mb * 2 ** 20))
+        return _default_cache
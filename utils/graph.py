@@ -1,43 +1,204 @@
 import numpy as np
 import scipy.sparse as sp
 
-def generate_graph(d, k, p, q):
-    # here we generate the adjacency matrix and laplacian of the graph
-    selected_features = np.arange(k)
-    non_selected_features = np.arange(k, d)
-
-    # adjacency matrix
-    A = sp.lil_matrix((d, d))
-    
-    selected_block = (np.random.rand(k, k) < p).astype(int)
-    np.fill_diagonal(selected_block, 0) # no self-loop
-    selected_block = np.triu(selected_block) + np.triu(selected_block, 1).T # make it symmetric
-    for i, node_i in enumerate(selected_features):
-        for j, node_j in enumerate(selected_features):
-            A[node_i, node_j] = selected_block[i, j]
-
-    non_selected_block = (np.random.rand(d-k, d-k) < p).astype(int)
-    np.fill_diagonal(non_selected_block, 0)
-    non_selected_block = np.triu(non_selected_block) + np.triu(non_selected_block, 1).T 
-    for i, node_i in enumerate(non_selected_features):
-        for j, node_j in enumerate(non_selected_features):
-            A[node_i, node_j] = non_selected_block[i, j]
-
-
-    # generate the connections between selected and non-selected features
-    inter_block = (np.random.rand(k, d - k) < q).astype(int)
-    for i, node_i in enumerate(selected_features):
-        for j, node_j in enumerate(non_selected_features):
-            A[node_i, node_j] = inter_block[i, j]
-            A[node_j, node_i] = inter_block[i, j]
-
-    # degree matrix
-    D = sp.diags(np.ravel(A.sum(axis=1)))
-
-    # laplacian matrix
-    L = D - A
-    
-    return L, A
+# chunk size for the dense Bernoulli branch, keeps the temporary buffer small
+_CHUNK = 1 << 22
+
+
+def _bernoulli_indices(num, prob, rng):
+    # indices of the successes among num i.i.d. Bernoulli(prob) trials
+    if num <= 0 or prob <= 0:
+        return np.empty(0, dtype=np.int64)
+    if prob >= 1:
+        return np.arange(num, dtype=np.int64)
+    if prob > 0.25:
+        # dense regime: geometric skipping would not save anything
+        return np.concatenate([start + np.flatnonzero(rng.random(min(_CHUNK, num - start)) < prob)
+                               for start in range(0, num, _CHUNK)]).astype(np.int64)
+    # sparse regime: the gaps between consecutive successes are Geometric(prob),
+    # so only O(num * prob) random numbers are drawn
+    batch = int(num * prob + 5 * np.sqrt(num * prob)) + 16
+    idx = np.cumsum(rng.geometric(prob, size=batch)) - 1
+    while idx[-1] < num:
+        idx = np.concatenate((idx, idx[-1] + np.cumsum(rng.geometric(prob, size=batch))))
+    return idx[idx < num]
+
+
+def _triu_pairs(m, idx):
+    # map linear indices over the strict upper triangle of an m x m block (row-major) to (i, j)
+    offset = lambda i: i * (2 * m - i - 1) // 2
+    b = 2 * m - 1
+    i = ((b - np.sqrt(b * b - 8. * idx)) // 2).astype(np.int64)
+    # correct floating point rounding of the closed form
+    i -= (offset(i) > idx)
+    i += (offset(i + 1) <= idx)
+    j = idx - offset(i) + i + 1
+    return i, j
+
+
+def generate_graph(d, k, p, q, seed=None):
+    """
+    Stochastic block model on d nodes: the first k (selected) features and the remaining
+    d - k features are each connected with probability p, and pairs across the two blocks
+    with probability q. Edges are sampled directly in COO form.
+    :param seed: seed or np.random.Generator; if None, the global np.random state is used.
+    :return: Laplacian L and adjacency A, both as float64 CSR matrices of one SparseGraph
+             (get_graph(L) and get_graph(A) return it).
+    """
+    rng = np.random if seed is None else np.random.default_rng(seed)
+
+    # selected block
+    i, j = _triu_pairs(k, _bernoulli_indices(k * (k - 1) // 2, p, rng))
+    rows, cols = [i], [j]
+
+    # non-selected block
+    m = d - k
+    i, j = _triu_pairs(m, _bernoulli_indices(m * (m - 1) // 2, p, rng))
+    rows.append(i + k)
+    cols.append(j + k)
+
+    # connections between selected and non-selected features
+    idx = _bernoulli_indices(k * m, q, rng)
+    rows.append(idx // m)
+    cols.append(idx % m + k)
+
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    A = sp.csr_matrix((np.ones(2 * len(rows)), (np.concatenate((rows, cols)), np.concatenate((cols, rows)))),
+                      shape=(d, d))
+
+    # degree matrix and laplacian L = D - A, both L and A belong to the same SparseGraph
+    graph = SparseGraph(A)
+    return graph.laplacian, graph.adjacency
+
+
+def _canonical_csr(M):
+    # float64 CSR with sorted, summed, nonzero entries and int32 indices where they fit;
+    # a matrix already in that form keeps its arrays (e.g. memory-mapped ones)
+    if (sp.isspmatrix_csr(M) and M.dtype == np.float64 and M.indices.dtype == np.int32
+            and M.has_canonical_format and M.data.all()):
+        return sp.csr_matrix(M)
+    M = sp.csr_matrix(M, dtype=np.float64, copy=True)
+    M.sum_duplicates()
+    M.eliminate_zeros()
+    if M.nnz < np.iinfo(np.int32).max:
+        M.indices = M.indices.astype(np.int32, copy=False)
+        M.indptr = M.indptr.astype(np.int32, copy=False)
+    return M
+
+
+def _read_only(*arrays):
+    for a in arrays:
+        a.flags.writeable = False
+    return arrays if len(arrays) > 1 else arrays[0]
+
+
+class SparseGraph:
+    """
+    Canonical form of an undirected weighted graph on d nodes, shared by every backend:
+    the adjacency A as float64 CSR (sorted, no duplicates, explicit zeros or self-loops,
+    int32 indices), and, derived on first use and cached, the degree vector, the
+    Laplacian D - A (same format), the edge list (i < j) with its costs and the triplets
+    of A or L that the MATLAB solvers rebuild with sparse(...). Nothing is ever
+    densified. Cached arrays are read-only, and the matrices must not be modified.
+    """
+    def __init__(self, A):
+        A = _canonical_csr(A)
+        if A.shape[0] != A.shape[1]:
+            raise ValueError(f"the adjacency matrix must be square, got shape {A.shape}.")
+        if not np.isfinite(A.data).all() or (A.data < 0).any():
+            raise ValueError("the edge weights of the adjacency matrix must be finite and nonnegative.")
+        if A.diagonal().any():
+            A = _canonical_csr(sp.triu(A, k=1) + sp.tril(A, k=-1))
+        self._A = A
+        self._views = {}
+        _register(A, self, "adjacency")
+
+    @classmethod
+    def from_laplacian(cls, L):
+        """ The graph of a Laplacian D - A (the diagonal is recomputed from A). """
+        M = sp.csr_matrix(L)
+        graph = cls(-(sp.triu(M, k=1) + sp.tril(M, k=-1)))   # the diagonal D is dropped first
+        _register(L, graph, "laplacian")
+        return graph
+
+    @property
+    def d(self):
+        return self._A.shape[0]
+
+    @property
+    def adjacency(self):
+        return self._A
+
+    @property
+    def degree(self):
+        if "degree" not in self._views:
+            self._views["degree"] = _read_only(np.ravel(self._A.sum(axis=1)))
+        return self._views["degree"]
+
+    @property
+    def laplacian(self):
+        if "laplacian" not in self._views:
+            L = _canonical_csr(sp.diags(self.degree) - self._A)
+            self._views["laplacian"] = L
+            _register(L, self, "laplacian")
+        return self._views["laplacian"]
+
+    @property
+    def edges(self):
+        """
+        (edges, costs): every undirected edge once as (i, j) with i < j, in row-major order,
+        as C-contiguous int32 (m, 2) and float64 (m,). An edge stored in one triangle of A
+        only counts as well; an edge stored in both must have the same weight in both.
+        """
+        if "edges" not in self._views:
+            upper = sp.triu(self._A, k=1).tocsr()
+            lower = sp.triu(self._A.T, k=1).tocsr()
+            both = upper.multiply(lower > 0)
+            if both.nnz and abs(both - lower.multiply(upper > 0)).max() > 0:
+                raise ValueError("the adjacency matrix is not symmetric: some edges have two different weights.")
+            if lower.nnz > both.nnz:
+                upper = upper.maximum(lower)   # edges given in the lower triangle only
+            upper = upper.tocoo()
+            edges = np.ascontiguousarray(np.column_stack((upper.row, upper.col)), dtype=np.int32)
+            self._views["edges"] = _read_only(edges, upper.data.astype(np.float64))
+        return self._views["edges"]
+
+    def triplets(self, kind="adjacency"):
+        """ (rows, cols, vals) of the adjacency or laplacian as float64, with 1-based indices for MATLAB. """
+        if kind not in ("adjacency", "laplacian"):
+            raise ValueError(f"Unknown kind: {kind}. Supported kinds are: adjacency, laplacian.")
+        key = ("triplets", kind)
+        if key not in self._views:
+            M = (self._A if kind == "adjacency" else self.laplacian).tocoo()
+            self._views[key] = _read_only(M.row + 1., M.col + 1., M.data.astype(np.float64))
+        return self._views[key]
+
+
+def _register(M, graph, kind):
+    # the graph lives as long as any of its matrices, get_graph finds it from them
+    try:
+        M._sparse_graph = (graph, kind)
+    except AttributeError:
+        pass
+
+
+def lookup_graph(M):
+    """ (graph, kind) of a matrix that belongs to a live SparseGraph, else (None, None). """
+    if isinstance(M, SparseGraph):
+        return M, "adjacency"
+    return getattr(M, "_sparse_graph", (None, None))
+
+
+def get_graph(M, laplacian=False):
+    """
+    SparseGraph of the adjacency matrix M (or of the Laplacian M with laplacian=True).
+    Matrices returned by generate_graph or by a SparseGraph map to their graph, so its
+    cached views are shared by every caller; any other matrix gets a new graph.
+    """
+    graph, _ = lookup_graph(M)
+    if graph is not None:
+        return graph
+    return SparseGraph.from_laplacian(M) if laplacian else SparseGraph(M)
 
 
 # get the normalized laplacian matrix from the laplacian matrix
@@ -0,0 +1,76 @@
+import numpy as np
+from scipy.linalg import qr, qr_insert, qr_delete, solve_triangular
+
+
+class RestrictedLstsq:
+    """
+    Least squares min_b ||x_mat[:, support] b - y|| restricted to a support that changes
+    by a few columns between calls, as in the estimation step of (graph-)CoSaMP.
+    Keeps an economic QR of x_mat[:, support] and updates it by column deletions and
+    insertions (scipy.linalg.qr_delete / qr_insert), so a call costs O(n |support|) per
+    changed column plus a triangular solve instead of the SVD of np.linalg.pinv.
+    The QR is recomputed from scratch when more than refactor_ratio * |support| columns
+    change or after max_updates updates (to bound the accumulated rounding). For
+    rank-deficient supports (|support| > n or a tiny pivot of R) it falls back to the
+    minimum-norm pinv solution, so the result always matches pinv(x_mat[:, support]) @ y.
+    """
+    def __init__(self, x_mat, y, refactor_ratio=0.5, max_updates=64):
+        self.x_mat = np.asarray(x_mat, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.refactor_ratio = refactor_ratio
+        self.max_updates = max_updates
+        self.columns = np.zeros(0, dtype=np.intp)
+        self.q = None
+        self.r = None
+        self.num_updates = 0
+        self.num_refactors = 0
+        self.num_fallbacks = 0
+
+    def _refactor(self, support):
+        self.q, self.r = qr(self.x_mat[:, support], mode='economic')
+        self.columns = np.array(support, dtype=np.intp)
+        self.num_updates = 0
+        self.num_refactors += 1
+
+    def _update(self, support):
+        keep = np.isin(self.columns, support)
+        for pos in np.flatnonzero(~keep)[::-1]:
+            self.q, self.r = qr_delete(self.q, self.r, pos, which='col', overwrite_qr=True)
+        columns = self.columns[keep]
+        added = np.setdiff1d(support, columns, assume_unique=True)
+        for col in added:
+            self.q, self.r = qr_insert(self.q, self.r, self.x_mat[:, col], len(columns), which='col')
+            columns = np.append(columns, col)
+        self.columns = columns
+        self.num_updates += int(np.count_nonzero(~keep)) + len(added)
+
+    def solve(self, support):
+        """
+        :param support: unique column indices.
+        :return: the least-squares coefficients in the order of support.
+        """
+        support = np.asarray(support, dtype=np.intp)
+        n, k = self.x_mat.shape[0], len(support)
+        if k == 0:
+            return np.zeros(0)
+        if k > n:
+            return self._fallback(support)
+        changed = len(np.setxor1d(self.columns, support, assume_unique=True))
+        if self.q is None or changed > self.refactor_ratio * k or self.num_updates + changed > self.max_updates:
+            self._refactor(support)
+        elif changed > 0:
+            self._update(support)
+        diag = np.abs(np.diag(self.r))
+        if diag.min() <= max(n, k) * np.finfo(np.float64).eps * diag.max():
+            return self._fallback(support)
+        coef = solve_triangular(self.r, self.q.T @ self.y, check_finite=False)
+        # the columns of the QR are in insertion order
+        out = np.empty(k)
+        out[np.argsort(support)] = coef[np.argsort(self.columns)]
+        return out
+
+    def _fallback(self, support):
+        self.q = self.r = None
+        self.columns = np.zeros(0, dtype=np.intp)
+        self.num_fallbacks += 1
+        return np.dot(np.linalg.pinv(self.x_mat[:, support]), self.y)
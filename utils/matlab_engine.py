@@ -0,0 +1,185 @@
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import matlab.engine
+except ImportError:
+    matlab = None
+
+
+# path setup for each MATLAB code base, run once when an engine is started
+def _setup_pqn(eng):
+    eng.cd(os.path.abspath('./src/PQN/'))
+    eng.addpath(os.path.abspath('./src/PQN/'))
+    eng.addpath(eng.genpath(os.path.abspath('./src/PQN/')))
+    eng.addpath(eng.genpath(os.path.abspath('./src/PQN/minConF/')))
+
+
+def _setup_fgfl(eng):
+    eng.cd(os.path.abspath('./src/code_fgfl_aaai14/'))
+    eng.addpath(os.path.abspath('./src/code_fgfl_aaai14/GFL/'))
+    eng.addpath(eng.genpath(os.path.abspath('./code_fgfl_aaai14/')))
+
+
+TOOLBOXES = {
+    'pqn': _setup_pqn,
+    'fgfl': _setup_fgfl,
+}
+
+
+class EnginePool:
+    """
+    A pool of at most `size` warm MATLAB engines sharing one path setup.
+    Engines are started lazily and checked out with `with pool.engine() as eng:`.
+    An engine that no longer answers after a failed call is discarded and
+    replaced on the next check-out.
+    """
+    def __init__(self, setup, size=1):
+        if matlab is None:
+            raise ImportError('the MATLAB engine for Python (matlab.engine) is not installed.')
+        self.setup = setup
+        self.size = max(1, int(size))
+        # guards _idle, _engines and _closed; notified whenever an engine or a slot frees up
+        self._cond = threading.Condition()
+        self._idle = []
+        self._engines = []
+        self._closed = False
+
+    def _start(self):
+        eng = matlab.engine.start_matlab()
+        try:
+            self.setup(eng)
+        except Exception:
+            eng.quit()
+            raise
+        return eng
+
+    def _acquire(self):
+        # an idle engine, else a free slot to start one in, else wait for either
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError('the engine pool has been shut down.')
+                if self._idle:
+                    return self._idle.pop()
+                if len(self._engines) < self.size:
+                    self._engines.append(None)  # reserve a slot while starting
+                    break
+                self._cond.wait()
+        try:
+            eng = self._start()
+        except Exception:
+            with self._cond:
+                self._engines.remove(None)
+                self._cond.notify()
+            raise
+        with self._cond:
+            started = not self._closed and None in self._engines
+            if started:
+                self._engines[self._engines.index(None)] = eng
+        if not started:
+            self._quit(eng)
+            raise RuntimeError('the engine pool has been shut down.')
+        return eng
+
+    def _release(self, eng):
+        with self._cond:
+            keep = not self._closed and eng in self._engines
+            if keep:
+                self._idle.append(eng)
+                self._cond.notify()
+        if not keep:
+            # the pool was shut down while the engine was checked out
+            self._quit(eng)
+
+    def _discard(self, eng):
+        with self._cond:
+            if eng in self._engines:
+                self._engines.remove(eng)
+            self._cond.notify()  # a waiter may start a replacement in the freed slot
+        self._quit(eng)
+
+    @staticmethod
+    def _quit(eng):
+        try:
+            eng.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _alive(eng):
+        try:
+            eng.eval('1;', nargout=0)
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def engine(self):
+        eng = self._acquire()
+        try:
+            yield eng
+        except BaseException:
+            if not self._alive(eng):
+                self._discard(eng)
+                eng = None
+            raise
+        finally:
+            if eng is not None:
+                self._release(eng)
+
+    def call(self, func, *args, nargout=0, retries=1):
+        """
+        Run `func` on a pooled engine. If the engine crashed during the call, the
+        call is retried on a freshly started engine up to `retries` times.
+        """
+        for attempt in range(retries + 1):
+            eng = None
+            try:
+                with self.engine() as eng:
+                    return getattr(eng, func)(*args, nargout=nargout)
+            except Exception:
+                crashed = eng is not None and eng not in self._engines
+                if attempt < retries and crashed:
+                    continue
+                raise
+
+    def shutdown(self):
+        # idle engines are quit now, checked-out ones when they are returned
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._engines = []
+            self._cond.notify_all()
+        for eng in idle:
+            self._quit(eng)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_engine_pool(toolbox, size=None):
+    """
+    Process-wide engine pool for `toolbox` ('pqn' or 'fgfl'). The pool size defaults to
+    the GFL_MATLAB_ENGINES environment variable (1 if unset).
+    """
+    with _pools_lock:
+        pool = _pools.get(toolbox)
+        if pool is None:
+            if size is None:
+                size = int(os.environ.get('GFL_MATLAB_ENGINES', 1))
+            pool = EnginePool(TOOLBOXES[toolbox], size=size)
+            _pools[toolbox] = pool
+        return pool
+
+
+@atexit.register
+def shutdown_engine_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown()
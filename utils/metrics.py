@@ -0,0 +1,102 @@
+import numpy as np
+from scipy.stats import t
+
+# the keys of support_metrics, in the order it returns them
+METRICS = ("recovery", "precision", "recall", "f1", "hamming")
+
+
+def top_k_support(coefs, k):
+    """
+    Boolean mask of the k largest |coefs| along the last axis, in linear time (a partition
+    finds the k-th largest magnitude, nothing is sorted). Ties at the k-th magnitude go to
+    the largest indices, which is the selection of np.argsort(|coefs|)[-k:] with a stable
+    sort, so e.g. an all-zero vector selects its last k entries.
+    """
+    coefs = np.abs(np.asarray(coefs, dtype=np.float64))
+    d = coefs.shape[-1]
+    k = min(int(k), d)
+    if k == 0:
+        return np.zeros(coefs.shape, dtype=bool)
+    kth = np.partition(coefs, d - k, axis=-1)[..., d - k:d - k + 1]
+    pred = coefs > kth
+    tied = coefs == kth
+    # number of tied entries at or after each index, the last `missing` of them are taken
+    missing = k - np.count_nonzero(pred, axis=-1, keepdims=True)
+    from_end = np.cumsum(tied[..., ::-1], axis=-1)[..., ::-1]
+    return pred | (tied & (from_end <= missing))
+
+
+def support_metrics(coefs, k, true_support=None):
+    """
+    Support-recovery metrics for a stack of coefficient vectors in one vectorized pass.
+    :param coefs:        array of shape (..., d), e.g. (replications, models, d).
+    :param k:            number of selected features (top-k by magnitude).
+    :param true_support: boolean mask broadcastable to coefs, or None for the first k
+                         features (the convention of RandomEnsemble).
+    :return: dict metric -> array of shape coefs.shape[:-1] with
+             recovery  |S_true & S_pred| / k (RandomEnsemble._recovery_accuracy),
+             precision, recall, f1 and hamming (|S_true ^ S_pred|).
+    """
+    pred = top_k_support(coefs, k)
+    if true_support is None:
+        true = np.zeros(pred.shape[-1], dtype=bool)
+        true[:k] = True
+    else:
+        true = np.asarray(true_support, dtype=bool)
+    true = np.broadcast_to(true, pred.shape)
+
+    tp = np.count_nonzero(pred & true, axis=-1)
+    n_pred = np.count_nonzero(pred, axis=-1)
+    n_true = np.count_nonzero(true, axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(n_pred > 0, tp / n_pred, 0.)
+        recall = np.where(n_true > 0, tp / n_true, 0.)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.)
+    return {
+        "recovery": tp / k if k > 0 else np.zeros(tp.shape),
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "hamming": np.count_nonzero(pred ^ true, axis=-1),
+    }
+
+
+def recovery_table(coefs, model_names, k, metric="recovery", true_support=None):
+    """
+    Metric values in the layout utils.visualization.support_recovery_analysis takes:
+    one dict {model: values over replications} per sample size.
+    :param coefs: array of shape (sample_sizes, replications, models, d), or a list of
+                  (replications, models, d) arrays when the number of replications differs.
+    :param metric: one of METRICS.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"unknown metric {metric!r}, expected one of {METRICS}")
+    table = []
+    for block in coefs:
+        values = support_metrics(block, k, true_support)[metric]
+        table.append({model: values[:, j] for j, model in enumerate(model_names)})
+    return table
+
+
+def confidence_intervals(table, level=0.95):
+    """
+    Mean and half-width of the Student t confidence interval of every model at every
+    sample size, for a table as returned by recovery_table.
+    :return: (mean_dict, ci_dict), both {model: [one value per sample size]}
+    """
+    model_names = list(table[0].keys())
+    mean_dict = {model: [] for model in model_names}
+    ci_dict = {model: [] for model in model_names}
+    for row in table:
+        for model in model_names:
+            values = np.asarray(row[model], dtype=np.float64)
+            n = len(values)
+            if n > 1:
+                sem = np.std(values, ddof=1) / np.sqrt(n)
+                ci = t.ppf(0.5 + level / 2., df=n - 1) * sem
+            else:
+                # no confidence interval if n <= 1
+                ci = 0
+            mean_dict[model].append(np.mean(values))
+            ci_dict[model].append(ci)
+    return mean_dict, ci_dict
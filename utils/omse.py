@@ -8,11 +8,16 @@ def compute_omse(X, y, w, L, A, model, k_values, i, num_replications):
         X, y, test_size=0.3, random_state=i
     )
     solver = Solver(models=[model])
+    if model in Solver.K_MODELS:
+        # solve the original problem using only the training data, along the whole k grid
+        path = solver.fit_path(X_train, y_train, L, A, grid=k_values, i=i)[model]
+    else:
+        # the fit does not depend on k, solve once and only change the selection below
+        u = solver.fit(X_train, y_train, L, A, k=k_values[0], i=i)[model]
     omse = {}
-    for k in k_values:
-        # solve the original problem using only the training data
-        res = solver.fit(X_train, y_train, L, A, k=k, i=i)
-        u = res[model]
+    for idx, k in enumerate(k_values):
+        if model in Solver.K_MODELS:
+            u = path[idx]
         # select top-k features based on absolute value of u
         selected_features = np.argsort(np.abs(u))[-k:]
 
@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import random
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+_BLAS_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+             "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def replication_seeds(seed, num_replications):
+    # one independent seed per replication, independent of the order they run in
+    children = np.random.SeedSequence(seed).spawn(num_replications)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+# seed of the replication running in this process, None when it is not seeded
+_current_seed = None
+
+
+def current_seed():
+    return _current_seed
+
+
+def seed_replication(seed):
+    # the data generators draw from the global numpy and random states
+    np.random.seed(seed)
+    random.seed(seed)
+
+
+# shared flags of the pool this worker belongs to, set when a replication starts
+_started = None
+
+
+def _init_worker(blas_threads, started=None):
+    global _started
+    _started = started
+    for var in _BLAS_ENV:
+        os.environ[var] = str(blas_threads)
+    if threadpool_limits is not None:
+        threadpool_limits(blas_threads)
+
+
+def _run_one(fn, i, seed, args):
+    global _current_seed
+    if _started is not None:
+        _started[i] = 1
+    _current_seed = seed
+    if seed is not None:
+        seed_replication(seed)
+    try:
+        return fn(i, *args)
+    finally:
+        _current_seed = None
+
+
+def run_replications(fn, num_replications, args=(), n_jobs=1, seed=None, blas_threads=1, max_retries=1):
+    """
+    Run fn(i, *args) for every replication i and yield (i, result, error) as they finish.
+    :param n_jobs:       number of worker processes; 1 runs in the calling process.
+    :param seed:         root of the per-replication seeds (np.random.SeedSequence). With a seed,
+                         the serial and the parallel runs give identical results. Without one the
+                         serial run keeps using the current global state, while the parallel run
+                         draws a fresh root seed.
+    :param blas_threads: BLAS/OpenMP threads per worker.
+    :param max_retries:  times a replication is resubmitted after a worker process died.
+    A replication that raises is yielded with its exception and does not stop the others.
+    """
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = os.cpu_count()
+    if seed is None and n_jobs > 1:
+        seed = np.random.SeedSequence().entropy
+    seeds = replication_seeds(seed, num_replications) if seed is not None else [None] * num_replications
+
+    if n_jobs == 1:
+        for i in range(num_replications):
+            try:
+                yield i, _run_one(fn, i, seeds[i], args), None
+            except Exception as e:
+                yield i, None, e
+        return
+
+    pending = list(range(num_replications))
+    suspects = []
+    attempts = defaultdict(int)
+    while pending or suspects:
+        # replications that were running when a worker died are rerun one per pool, so a crash
+        # only takes down the replication that caused it; the others share a fresh pool
+        batches = [[i] for i in suspects] + ([pending] if pending else [])
+        pending, suspects = [], []
+        for batch in batches:
+            # written directly to shared memory, so it survives a worker killed mid-replication
+            started = multiprocessing.RawArray('b', num_replications)
+            broken = []
+            with ProcessPoolExecutor(max_workers=min(n_jobs, len(batch)), initializer=_init_worker,
+                                     initargs=(blas_threads, started)) as executor:
+                futures = {executor.submit(_run_one, fn, i, seeds[i], args): i for i in batch}
+                for future in as_completed(futures):
+                    i = futures[future]
+                    try:
+                        yield i, future.result(), None
+                    except BrokenProcessPool as e:
+                        broken.append((i, e))
+                    except Exception as e:
+                        yield i, None, e
+            running = {i for i, _ in broken if started[i]} or {i for i, _ in broken}
+            for i, e in broken:
+                if i not in running:
+                    # still queued when the pool broke, not to blame
+                    pending.append(i)
+                    continue
+                attempts[i] += 1
+                if attempts[i] <= max_retries:
+                    suspects.append(i)
+                else:
+                    yield i, None, e
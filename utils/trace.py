@@ -0,0 +1,120 @@
+import json
+import threading
+from time import perf_counter
+
+import numpy as np
+
+COLUMNS = ("loss", "step_time", "support_size", "proj_time")
+
+
+class Trace:
+    """
+    Convergence trace of one solver run, one row per recorded iteration, kept in
+    preallocated ring buffers (the last `capacity` rows survive). Columns:
+        loss          objective reported by the backend (least-squares loss for the
+                      signal family methods and adaptive grace, funcVal for MATLAB)
+        step_time     seconds since the previous row (or start())
+        support_size  number of nonzeros of the iterate
+        proj_time     seconds spent in functions wrapped with timed() since the previous row
+    Unknown values are NaN. `callback(trace, iteration)` is called after every row.
+    Solvers take trace=None and then skip all bookkeeping.
+    """
+    def __init__(self, capacity=1024, callback=None):
+        self.capacity = capacity
+        self.callback = callback
+        self.buffers = {name: np.full(capacity, np.nan) for name in COLUMNS}
+        self.count = 0
+        self._mark = None
+        self._proj_time = 0.
+
+    def start(self):
+        self._mark = perf_counter()
+        self._proj_time = 0.
+
+    def record(self, loss, x=None):
+        now = perf_counter()
+        i = self.count % self.capacity
+        self.buffers["loss"][i] = loss
+        self.buffers["step_time"][i] = np.nan if self._mark is None else now - self._mark
+        self.buffers["support_size"][i] = np.nan if x is None else np.count_nonzero(x)
+        self.buffers["proj_time"][i] = self._proj_time
+        self.count += 1
+        self._proj_time = 0.
+        if self.callback is not None:
+            self.callback(self, self.count - 1)
+        self._mark = perf_counter()
+
+    def extend(self, loss):
+        """
+        Append a whole loss history at once (e.g. funcVal of a MATLAB solver), calling the
+        callback after each row. Values that would be overwritten anyway are skipped but
+        still counted, so the retained rows keep their iteration numbers.
+        """
+        values = np.ravel(np.asarray(loss, dtype=np.float64))
+        dropped = max(len(values) - self.capacity, 0)
+        self.count += dropped
+        for value in values[dropped:]:
+            i = self.count % self.capacity
+            for name in COLUMNS:
+                self.buffers[name][i] = np.nan
+            self.buffers["loss"][i] = value
+            self.count += 1
+            if self.callback is not None:
+                self.callback(self, self.count - 1)
+
+    def timed(self, fn):
+        """ fn wrapped to add its run time to the proj_time of the current row. """
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._proj_time += perf_counter() - start
+        return wrapper
+
+    def columns(self):
+        """ {"iteration", *COLUMNS}: the retained rows in chronological order. """
+        size = len(self)
+        iteration = np.arange(self.count - size, self.count)
+        columns = {"iteration": iteration}
+        columns.update({name: buffer[iteration % self.capacity] for name, buffer in self.buffers.items()})
+        return columns
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+
+class TraceRecorder:
+    """
+    Collects the traces of all runs of an experiment, e.g. Solver(models, recorder=TraceRecorder()),
+    and saves them as one columnar .npz file: the columns of Trace.columns() concatenated
+    over runs plus a "run" column indexing into "names" and "meta" (JSON per run).
+    """
+    def __init__(self, capacity=1024, callback=None):
+        self.capacity = capacity
+        self.callback = callback
+        self.runs = []
+        self._lock = threading.Lock()
+
+    def trace(self, name, **meta):
+        trace = Trace(self.capacity, self.callback)
+        with self._lock:
+            self.runs.append((name, meta, trace))
+        return trace
+
+    def columns(self):
+        with self._lock:
+            runs = list(self.runs)
+        blocks = [trace.columns() for _, _, trace in runs]
+        blocks.append({"run": np.zeros(0, dtype=np.int32), "iteration": np.zeros(0, dtype=np.int64),
+                       **{name: np.zeros(0) for name in COLUMNS}})
+        for j, block in enumerate(blocks[:-1]):
+            block["run"] = np.full(len(block["iteration"]), j, dtype=np.int32)
+        columns = {name: np.concatenate([block[name] for block in blocks])
+                   for name in ("run", "iteration") + COLUMNS}
+        columns["names"] = np.array([name for name, _, _ in runs], dtype=str)
+        columns["meta"] = np.array([json.dumps(meta, default=str) for _, meta, _ in runs], dtype=str)
+        return columns
+
+    def save(self, path):
+        np.savez(path, **self.columns())
@@ -1,32 +1,15 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.stats import t
+from utils.metrics import confidence_intervals
 
 def support_recovery_analysis(accuracy, sample_sizes=None, file_name=None):
     if sample_sizes is None:
         sample_sizes = np.arange(50, 300, 100)
 
-    # automatically detect model names from the first entry
-    model_names = list(accuracy[0].keys())  
-    acc_dict = {model: [] for model in model_names}
-    ci_dict = {model: [] for model in model_names}
-
-    for i in range(len(accuracy)):
-        for model in model_names:
-            values = accuracy[i][model]
-            n = len(values)
-            if n > 1:
-                std = np.std(values, ddof=1)
-                sem = std / np.sqrt(n)
-                ci = t.ppf(0.975, df=n-1) * sem  # 95% CI
-            else: 
-                # no confidence interval if n <= 1
-                std = 0
-                sem = 0
-                ci = 0  
-
-            acc_dict[model].append(np.mean(values))
-            ci_dict[model].append(ci)
+    # accuracy: one dict {model: values over replications} per sample size,
+    # e.g. from utils.metrics.recovery_table
+    model_names = list(accuracy[0].keys())
+    acc_dict, ci_dict = confidence_intervals(accuracy)
 
     plt.figure(figsize=(6, 5))
 